@@ -0,0 +1,227 @@
+import asyncio
+import re
+import time
+from datetime import date as dt_date, timedelta
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from backend.rag.faq_intents import compile_keywords
+from backend.utils.metrics import Counter
+
+
+APPOINTMENT_TYPE_WORDS = {
+    "physical": "physical",
+    "check-up": "physical",
+    "checkup": "physical",
+    "follow-up": "followup",
+    "followup": "followup",
+    "follow up": "followup",
+    "specialist": "specialist",
+    "consultation": "consultation"
+}
+# The check_availability tool's own default
+DEFAULT_APPOINTMENT_TYPE = "consultation"
+
+# Asking what is open, as opposed to confirming a booking or asking about the clinic
+AVAILABILITY_KEYWORDS = [
+    "available", "availability", "open", "opening", "openings", "slot", "slots", "free",
+    "come in", "book", "appointment", "schedule", "see the doctor", "any time", "what times"
+]
+AVAILABILITY_PATTERN = compile_keywords(AVAILABILITY_KEYWORDS)
+TIME_PATTERN = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b|\b(1[0-2]|[1-9])\s*(am|pm)\b", re.IGNORECASE)
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+
+_MONTH = (r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?")
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+MONTH_DAY_PATTERN = re.compile(rf"\b{_MONTH}\s+{_DAY}\b")
+DAY_MONTH_PATTERN = re.compile(rf"\b{_DAY}\s+(?:of\s+)?{_MONTH}")
+# Words after "1/2" that make it a fraction rather than January 2
+_FRACTION_UNITS = (r"(?:an?\s+)?(?:hours?|hrs?|minutes?|mins?|days?|weeks?|months?|years?|of|cups?|"
+                   r"glass(?:es)?|doses?|tablets?|pills?|tsp|tbsp|teaspoons?|tablespoons?|mg|ml|"
+                   r"miles?|inch(?:es)?|lbs?|pounds?)\b")
+# A year makes the date unambiguous; without one, "1 1/2" and "1/2 hour" are fractions
+NUMERIC_DATE_PATTERN = re.compile(
+    rf"(?<!\d\s)\b(\d{{1,2}})/(\d{{1,2}})"
+    rf"(?:/(\d{{4}}|\d{{2}})(?![\d/])|(?![\d/])(?!\s*{_FRACTION_UNITS}))"
+)
+WEEKDAY_PATTERN = re.compile(rf"\b(this\s+|next\s+)?({'|'.join(WEEKDAYS)})\b")
+
+
+def find_appointment_type(text: str) -> Optional[str]:
+    lowered = text.lower()
+    for word, appointment_type in APPOINTMENT_TYPE_WORDS.items():
+        if word in lowered:
+            return appointment_type
+    return None
+
+
+def _future_date(month: int, day: int, year: Optional[int], today: dt_date) -> Optional[dt_date]:
+    try:
+        candidate = dt_date(year or today.year, month, day)
+        # "March 3" said in December means next March
+        if year is None and candidate < today:
+            candidate = candidate.replace(year=today.year + 1)
+        return candidate
+    except ValueError:
+        return None
+
+
+def find_date(text: str, today: Optional[dt_date] = None) -> Optional[str]:
+    """First date mentioned in ``text`` as YYYY-MM-DD, or None.
+
+    Understands ISO dates, "November 25th" and "25 Nov", US-style "11/25",
+    "today", "tomorrow" and weekday names. A bare or "this" weekday is its
+    next occurrence from today; "next" adds a week when that is this week.
+    """
+    today = today or dt_date.today()
+    lowered = text.lower()
+
+    match = ISO_DATE_PATTERN.search(lowered)
+    if match:
+        found = _future_date(int(match.group(2)), int(match.group(3)), int(match.group(1)), today)
+        return found.isoformat() if found else None
+
+    match = MONTH_DAY_PATTERN.search(lowered)
+    if match:
+        found = _future_date(MONTHS[match.group(1)[:3]], int(match.group(2)), None, today)
+        if found:
+            return found.isoformat()
+    match = DAY_MONTH_PATTERN.search(lowered)
+    if match:
+        found = _future_date(MONTHS[match.group(2)[:3]], int(match.group(1)), None, today)
+        if found:
+            return found.isoformat()
+
+    match = NUMERIC_DATE_PATTERN.search(lowered)
+    if match:
+        year = match.group(3)
+        if year is not None and len(year) == 2:
+            year = f"20{year}"
+        found = _future_date(int(match.group(1)), int(match.group(2)), int(year) if year else None, today)
+        if found:
+            return found.isoformat()
+
+    if "tomorrow" in lowered:
+        return (today + timedelta(days=1)).isoformat()
+    if "today" in lowered:
+        return today.isoformat()
+
+    match = WEEKDAY_PATTERN.search(lowered)
+    if match:
+        days_ahead = (WEEKDAYS.index(match.group(2)) - today.weekday()) % 7
+        if match.group(1) and match.group(1).strip() == "next" and days_ahead < 7 - today.weekday():
+            days_ahead += 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+    return None
+
+
+def extract_availability_query(user_message: str, conversation_history: List[Dict[str, str]],
+                               today: Optional[dt_date] = None) -> Optional[Dict[str, Any]]:
+    """Date and appointment type the next ``check_availability`` call is likely to use.
+
+    The date must be in the current message. The type comes from the
+    message, else the most recent user message naming one, else the
+    tool's default; ``type_source`` records which.
+    """
+    found_date = find_date(user_message, today)
+    if found_date is None:
+        return None
+
+    appointment_type = find_appointment_type(user_message)
+    type_source = "message"
+    if appointment_type is None:
+        type_source = "default"
+        for msg in reversed(conversation_history[-6:]):
+            if msg["role"] == "user" and find_appointment_type(msg["content"]):
+                appointment_type = find_appointment_type(msg["content"])
+                type_source = "history"
+                break
+    return {
+        "date": found_date,
+        "appointment_type": appointment_type or DEFAULT_APPOINTMENT_TYPE,
+        "type_source": type_source
+    }
+
+
+def preinjection_decision(user_message: str, query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Whether availability can be fetched up front so one LLM call answers the turn.
+
+    Only unambiguous availability questions qualify: the message names a
+    date and asks what is open, the appointment type was stated by the
+    patient, and no time was picked yet (picking a time leads to booking).
+    """
+    if query is None:
+        reason = "no_date"
+    elif query["type_source"] == "default":
+        reason = "type_not_stated"
+    elif not AVAILABILITY_PATTERN.search(user_message.lower()):
+        reason = "no_availability_intent"
+    elif TIME_PATTERN.search(user_message):
+        reason = "time_given"
+    else:
+        return {"preinject": True, "reason": "unambiguous_availability"}
+    return {"preinject": False, "reason": reason}
+
+
+class AvailabilityPrefetch:
+    """An availability lookup started before the model asks for it.
+
+    The ``check_availability`` tool runs alongside the first LLM call.
+    When the model then requests the same date and type, ``take`` returns
+    the prefetched result; otherwise the lookup is cancelled by ``finish``
+    and counted as wasted. Outcomes: ``hit``, ``miss`` (the model checked
+    other arguments) and ``unused`` (it didn't check availability).
+    """
+
+    def __init__(self, query: Dict[str, Any], run_tool: Callable[[Dict[str, Any]], Awaitable[str]]):
+        self.query = query
+        self.outcome = "unused"
+        self.recorded = False
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.task = asyncio.ensure_future(run_tool({
+            "date": query["date"], "appointment_type": query["appointment_type"]
+        }))
+        self.task.add_done_callback(self._mark_finished)
+
+    def _mark_finished(self, task: asyncio.Future) -> None:
+        self.finished = time.perf_counter()
+
+    def matches(self, tool_args: Dict[str, Any]) -> bool:
+        requested_type = str(tool_args.get("appointment_type") or DEFAULT_APPOINTMENT_TYPE).strip().lower()
+        return (str(tool_args.get("date", "")).strip() == self.query["date"]
+                and requested_type == self.query["appointment_type"])
+
+    async def take(self, tool_args: Dict[str, Any]) -> Optional[str]:
+        """The prefetched result if it answers this tool call, else None."""
+        if self.outcome == "hit":
+            return None
+        if not self.matches(tool_args):
+            self.outcome = "miss"
+            return None
+        self.outcome = "hit"
+        return await self.task
+
+    def finish(self) -> str:
+        if self.recorded:
+            return self.outcome
+        self.recorded = True
+        PREFETCH_OUTCOMES.labels(self.outcome, self.query["type_source"]).inc()
+        if self.outcome != "hit":
+            if not self.task.done():
+                self.task.cancel()
+            PREFETCH_WASTED_SECONDS.inc((self.finished or time.perf_counter()) - self.started)
+        return self.outcome
+
+
+PREFETCH_OUTCOMES = Counter(
+    "availability_prefetch", "Speculative availability lookups by outcome and appointment type source",
+    ("outcome", "type_source"))
+PREFETCH_WASTED_SECONDS = Counter(
+    "availability_prefetch_wasted_seconds", "Time spent on prefetched lookups the model did not use")
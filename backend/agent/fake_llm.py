@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import random
+import re
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend.agent.availability_prefetch import TIME_PATTERN, find_appointment_type
+
+
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+PHONE_PATTERN = re.compile(r"\+?1?[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}")
+NAME_PATTERN = re.compile(r"(?:my name is|i am|i'm|name:)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)", re.IGNORECASE)
+REASON_PATTERN = re.compile(r"(?:reason(?: for (?:the )?visit)?(?: is)?:?|because)\s+(.{5,120}?)(?:[.!\n]|$)", re.IGNORECASE)
+
+CONTEXT_MARKERS = ("\n\nRelevant Clinic Information:", "\n\nNote:")
+
+
+class ServiceUnavailable(Exception):
+    """Injected provider failure, named like the real one so it is retried."""
+
+
+def _user_text(message: HumanMessage) -> str:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    # Drop the appended FAQ context
+    for marker in CONTEXT_MARKERS:
+        content = content.split(marker)[0]
+    return content.strip()
+
+
+def _find_date(text: str) -> Optional[str]:
+    match = ISO_DATE_PATTERN.search(text)
+    if match:
+        return match.group(1)
+    lowered = text.lower()
+    if "tomorrow" in lowered:
+        return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    if "today" in lowered:
+        return datetime.now().strftime("%Y-%m-%d")
+    return None
+
+
+def _find_time(text: str) -> Optional[str]:
+    match = TIME_PATTERN.search(text)
+    if not match:
+        return None
+    if match.group(1):
+        return f"{int(match.group(1)):02d}:{match.group(2)}"
+    hour = int(match.group(3)) % 12 + (12 if match.group(4).lower() == "pm" else 0)
+    return f"{hour:02d}:00"
+
+
+class FakeChatModel:
+    """Deterministic, offline stand-in for the chat model (``LLM_PROVIDER=fake``).
+
+    It follows the booking conversation with simple rules: a message with a
+    date asks for ``check_availability``; a message with a time, once the
+    conversation has a name, email and phone, asks for ``book_appointment``;
+    tool results are turned into a short reply. Each call sleeps for a
+    time-to-first-token latency plus output tokens at a fixed token rate, so
+    load tests see realistic timing without the network.
+    """
+
+    def __init__(self, latency_ms: Optional[float] = None, tokens_per_second: Optional[float] = None,
+                 jitter: Optional[float] = None, error_rate: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("FAKE_LLM_LATENCY_MS", "50"))
+        self.tokens_per_second = tokens_per_second or float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "200"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("FAKE_LLM_JITTER", "0.2"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+        self.random = random.Random(seed if seed is not None else int(os.getenv("FAKE_LLM_SEED", "0")))
+        self.tool_names: List[str] = []
+        self.calls = 0
+
+    def bind_tools(self, tools: List[Any]) -> "FakeChatModel":
+        self.tool_names = [tool.name for tool in tools]
+        return self
+
+    def _tool_call(self, name: str, args: Dict[str, Any]) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{self.calls}"}])
+
+    def _reply_to_tool(self, message: ToolMessage) -> str:
+        try:
+            result = json.loads(message.content)
+        except (TypeError, ValueError):
+            return "Sorry, I couldn't complete that request. Could you try again?"
+
+        if "available_slots" in result:
+            slots = ", ".join(result["available_slots"][:5])
+            return f"On {result['date']} I have these times available: {slots}. Which one works best for you?"
+        if result.get("success"):
+            return (f"Your appointment is booked! Your confirmation code is "
+                    f"{result.get('confirmation_code')}.")
+        if "error" in result:
+            return f"Sorry, that didn't work: {result['error']}. Would you like to try another time?"
+        return result.get("message", "Is there another date that works for you?")
+
+    def _respond(self, messages: List[Any]) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=self._reply_to_tool(last))
+
+        user_texts = [_user_text(m) for m in messages if isinstance(m, HumanMessage)]
+        current = user_texts[-1] if user_texts else ""
+        conversation = "\n".join(user_texts)
+
+        email = EMAIL_PATTERN.search(conversation)
+        name = NAME_PATTERN.search(conversation)
+        phone = PHONE_PATTERN.search(EMAIL_PATTERN.sub(" ", conversation))
+        start_time = _find_time(current)
+        date = _find_date(current) or _find_date(conversation)
+        appointment_type = find_appointment_type(conversation) or "consultation"
+
+        if "book_appointment" in self.tool_names and start_time and date and email and name and phone:
+            reason = REASON_PATTERN.search(conversation)
+            return self._tool_call("book_appointment", {
+                "appointment_type": appointment_type,
+                "date": date,
+                "start_time": start_time,
+                "patient_name": name.group(1),
+                "patient_email": email.group(0),
+                "patient_phone": phone.group(0).strip(),
+                "reason": reason.group(1).strip() if reason else f"{appointment_type.capitalize()} visit"
+            })
+
+        if "check_availability" in self.tool_names and _find_date(current):
+            return self._tool_call("check_availability", {
+                "date": _find_date(current),
+                "appointment_type": appointment_type
+            })
+
+        raw = last.content if isinstance(last.content, str) else ""
+        if "Relevant Clinic Information:" in raw:
+            context = raw.split("Relevant Clinic Information:")[-1].strip()
+            facts = [line.split(". ", 1)[-1] for line in context.splitlines() if line[:1].isdigit()]
+            if facts:
+                return AIMessage(content=f"Here's what I found: {facts[0]}")
+
+        if date and start_time:
+            return AIMessage(content="Great. To book that, I'll need your full name, email and phone number.")
+        return AIMessage(content="I'd be happy to help you schedule an appointment. What date works best for you?")
+
+    async def ainvoke(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        self.calls += 1
+        response = self._respond(messages)
+
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        output_tokens = max(len(str(response.content)) // 4, 8 if response.tool_calls else 1)
+        response.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+
+        delay = self.latency_ms / 1000 + output_tokens / self.tokens_per_second
+        delay *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(0.0, delay))
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise ServiceUnavailable("Injected fake LLM failure")
+        return response
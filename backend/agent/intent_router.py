@@ -0,0 +1,157 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+from backend.rag.faq_intents import classify_intents, compile_keywords
+
+
+# Any of these means the patient wants to act, not just know something; such
+# turns always go to the LLM with its tools.
+BOOKING_KEYWORDS = [
+    "book", "booking", "schedule", "scheduling", "reschedule", "make an appointment",
+    "set up an appointment", "availability", "available slot", "available time",
+    "any openings", "slot", "slots", "tomorrow", "next week", "this week"
+]
+
+BOOKING_PATTERN = compile_keywords(BOOKING_KEYWORDS)
+
+CLOSING_LINE = "Is there anything else I can help you with, such as scheduling an appointment?"
+
+
+def _join_list(items: List[str]) -> str:
+    if len(items) <= 1:
+        return "".join(items)
+    return ", ".join(items[:-1]) + f", and {items[-1]}"
+
+
+def _render_hours(data: Dict[str, Any]) -> str:
+    hours = data["clinic_details"]["hours"]
+    lines = [f"- {day.title()}: {value}" for day, value in hours.items()]
+    return "Our clinic hours are:\n" + "\n".join(lines)
+
+
+def _render_location(data: Dict[str, Any]) -> str:
+    details = data["clinic_details"]
+    return (
+        f"We're located at {details['address']}. "
+        f"You can reach us at {details['phone']} or {details['email']}."
+    )
+
+
+def _render_insurance(data: Dict[str, Any]) -> str:
+    insurance = data["insurance_and_billing"]
+    phone = data["clinic_details"]["phone"]
+    return (
+        f"We accept the following insurance providers: {_join_list(insurance['accepted_insurance'])}. "
+        f"If you don't see your plan listed, please call us at {phone} to check your coverage."
+    )
+
+
+def _render_payment(data: Dict[str, Any]) -> str:
+    insurance = data["insurance_and_billing"]
+    return (
+        f"We accept {_join_list(insurance['payment_methods'])}. "
+        f"{insurance['billing_policy']}"
+    )
+
+
+def _render_cost(data: Dict[str, Any]) -> str:
+    lines = [
+        f"- {name.replace('_', ' ').title()} ({details['duration']} minutes): {details['cost_range']}"
+        for name, details in data["appointment_types"].items()
+    ]
+    return "Here are our typical visit costs:\n" + "\n".join(lines)
+
+
+def _render_what_to_bring(data: Dict[str, Any]) -> str:
+    prep = data["visit_preparation"]
+    bring = "\n".join(f"- {item}" for item in prep["what_to_bring"])
+    first_visit = "\n".join(f"- {item}" for item in prep["first_visit_documents"])
+    return (
+        f"Please bring the following to your appointment:\n{bring}\n\n"
+        f"If this is your first visit, please also have:\n{first_visit}"
+    )
+
+
+INTENT_TEMPLATES: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "hours": _render_hours,
+    "location": _render_location,
+    "directions": lambda data: data["clinic_details"]["directions"],
+    "parking": lambda data: data["clinic_details"]["parking"],
+    "insurance": _render_insurance,
+    "payment": _render_payment,
+    "cost": _render_cost,
+    "cancellation_policy": lambda data: data["policies"]["cancellation_policy"],
+    "what_to_bring": _render_what_to_bring,
+    "arrival": lambda data: data["visit_preparation"]["arrival_time"],
+    "late_arrival": lambda data: data["policies"]["late_arrival_policy"],
+    "telehealth": lambda data: data["common_questions"]["telehealth_available"],
+    "walk_ins": lambda data: data["common_questions"]["do_you_accept_walkins"],
+    "lab_services": lambda data: data["common_questions"]["lab_services"],
+    "test_results": lambda data: data["policies"]["test_results"],
+    "prescription_refills": lambda data: data["policies"]["prescription_refills"],
+    "covid": lambda data: data["policies"]["covid19_protocols"],
+}
+
+
+class IntentRouter:
+    """Routes high-confidence, single-intent FAQ questions to templated answers.
+
+    Keywords for every intent are matched with one compiled regex, scored by
+    weight, and the confidence is the winning intent's share of the total score
+    (scaled down when only weak keywords matched). Answers are rendered from
+    ``clinic_info.json`` and re-rendered whenever the file changes.
+    """
+
+    def __init__(self, clinic_info_path: str = "data/clinic_info.json",
+                 min_confidence: Optional[float] = None):
+        self.clinic_info_path = Path(clinic_info_path)
+        self.enabled = os.getenv("FAQ_FAST_PATH_ENABLED", "true").lower() == "true"
+        self.min_confidence = min_confidence if min_confidence is not None else float(
+            os.getenv("FAQ_FAST_PATH_MIN_CONFIDENCE", "0.8")
+        )
+        self._answers: Dict[str, str] = {}
+        self._answers_mtime = None
+
+    def classify(self, message: str) -> Dict[str, Any]:
+        return classify_intents(message)
+
+    def route(self, message: str, is_first_turn: bool) -> Dict[str, Any]:
+        classification = self.classify(message)
+        decision = {
+            "route": "llm",
+            "intent": classification["intent"],
+            "confidence": classification["confidence"]
+        }
+
+        if not self.enabled:
+            decision["reason"] = "fast_path_disabled"
+        elif not is_first_turn:
+            decision["reason"] = "not_first_turn"
+        elif BOOKING_PATTERN.search(message.lower()):
+            decision["reason"] = "booking_intent"
+        elif classification["intent"] is None:
+            decision["reason"] = "no_faq_intent"
+        elif classification["confidence"] < self.min_confidence:
+            decision["reason"] = "low_confidence"
+        elif self.render_answer(classification["intent"]) is None:
+            decision["reason"] = "no_template"
+        else:
+            decision["route"] = "fast_path"
+            decision["reason"] = "single_intent"
+        return decision
+
+    def render_answer(self, intent: str) -> Optional[str]:
+        mtime = self.clinic_info_path.stat().st_mtime_ns
+        if mtime != self._answers_mtime:
+            with open(self.clinic_info_path, 'r') as f:
+                clinic_data = json.load(f)
+            answers = {}
+            for name, render in INTENT_TEMPLATES.items():
+                try:
+                    answers[name] = f"{render(clinic_data)}\n\n{CLOSING_LINE}"
+                except (KeyError, TypeError):
+                    continue
+            self._answers, self._answers_mtime = answers, mtime
+        return self._answers.get(intent)
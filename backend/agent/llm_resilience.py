@@ -0,0 +1,165 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from backend.utils.metrics import ERRORS
+
+
+# Provider errors worth retrying: rate limits, overload and transient server
+# faults. Matched by name so this module doesn't import the Google SDKs.
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+    "TooManyRequests", "GatewayTimeout", "Aborted", "ServerError"
+}
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMDeadlineExceeded(Exception):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUS_CODES
+
+
+class RequestBudget:
+    """Wall-clock budget for one chat turn, shared by all of its LLM calls."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        if seconds is None:
+            seconds = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+class RetryBudget:
+    """Caps retries to a fraction of calls so retries can't amplify an outage.
+
+    Every call deposits ``ratio`` tokens and every retry or hedge spends one.
+    The balance starts at and is capped by ``burst``.
+    """
+
+    def __init__(self, ratio: Optional[float] = None, burst: Optional[float] = None):
+        self.ratio = ratio if ratio is not None else float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))
+        self.burst = burst if burst is not None else float(os.getenv("LLM_RETRY_BUDGET_BURST", "10"))
+        self.tokens = self.burst
+
+    def record_call(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class ResilientLLMCaller:
+    """Runs ``llm.ainvoke`` with deadlines, budgeted retries and optional hedging.
+
+    Each attempt gets ``min(call_timeout, remaining request budget)``. Failed
+    or timed-out attempts are retried with full-jitter exponential backoff
+    while the retry budget and request budget allow. With hedging enabled, a
+    duplicate call is sent once the primary has run longer than the recent
+    p95 latency, and whichever answers first wins.
+    """
+
+    def __init__(self, call_timeout: Optional[float] = None, max_attempts: Optional[int] = None,
+                 base_delay: Optional[float] = None, max_delay: Optional[float] = None,
+                 hedge_enabled: Optional[bool] = None, hedge_min_samples: int = 20,
+                 retry_budget: Optional[RetryBudget] = None):
+        self.call_timeout = call_timeout if call_timeout is not None else float(
+            os.getenv("LLM_CALL_TIMEOUT_SECONDS", "15"))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+        if hedge_enabled is None:
+            hedge_enabled = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+
+        self._latencies = deque(maxlen=200)
+        self.stats: Dict[str, int] = {
+            "calls": 0, "attempts": 0, "retries": 0, "timeouts": 0,
+            "hedges": 0, "hedge_wins": 0, "retry_budget_exhausted": 0
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_enabled or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95)]
+
+    async def _attempt(self, llm: Any, messages: List[Any], timeout: float) -> Any:
+        self.stats["attempts"] += 1
+        started = time.monotonic()
+        result = await asyncio.wait_for(llm.ainvoke(messages), timeout=timeout)
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    async def _hedged_attempt(self, llm: Any, messages: List[Any], timeout: float) -> Any:
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._attempt(llm, messages, timeout)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._attempt(llm, messages, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.retry_budget.try_spend():
+            return await primary
+
+        self.stats["hedges"] += 1
+        hedge = asyncio.ensure_future(self._attempt(llm, messages, timeout - (time.monotonic() - started)))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, llm: Any, messages: List[Any], budget: Optional[RequestBudget] = None) -> Any:
+        budget = budget or RequestBudget()
+        self.stats["calls"] += 1
+        self.retry_budget.record_call()
+
+        for attempt in range(self.max_attempts):
+            timeout = min(self.call_timeout, budget.remaining())
+            if timeout <= 0:
+                raise LLMDeadlineExceeded("Request deadline exceeded before the LLM call")
+            try:
+                return await self._hedged_attempt(llm, messages, timeout)
+            except Exception as e:
+                ERRORS.labels("llm_call", type(e).__name__).inc()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                if not self.retry_budget.try_spend():
+                    self.stats["retry_budget_exhausted"] += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if delay >= budget.remaining():
+                    raise
+                self.stats["retries"] += 1
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
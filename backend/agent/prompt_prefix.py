@@ -0,0 +1,60 @@
+"""The request-independent start of every chat prompt.
+
+Every LLM call begins with the same system instruction and tool schemas,
+and per-turn content (history, FAQ context, tool results) comes after
+them. Providers that cache prompt prefixes, implicitly or through an
+explicit cached-content handle, can then reuse the prefix across turns
+and patients. To create an explicit cache, dump the prefix with
+
+    python -m backend.agent.prompt_prefix --output prefix.json
+
+and set ``LLM_CACHED_CONTENT`` to the cache's name. A changed fingerprint
+means the cache is stale and must be recreated.
+"""
+import argparse
+import hashlib
+import json
+from typing import List, Dict, Any
+
+from langchain_core.messages import SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from backend.agent.prompts import SYSTEM_PROMPT
+from backend.tools.availability_tool import availability_tool
+from backend.tools.booking_tool import booking_tool
+
+
+# Bound in this order on every request, so the serialized schemas never change
+PREFIX_TOOLS = [availability_tool, booking_tool]
+
+
+def tool_declarations() -> List[Dict[str, Any]]:
+    return [convert_to_openai_tool(tool)["function"] for tool in PREFIX_TOOLS]
+
+
+def prefix_fingerprint() -> str:
+    prefix = json.dumps({"system_instruction": SYSTEM_PROMPT, "tools": tool_declarations()}, sort_keys=True)
+    return hashlib.sha256(prefix.encode()).hexdigest()[:16]
+
+
+def prefix_messages(in_cached_content: bool) -> List[Any]:
+    """Leading messages of every prompt; empty when a cached-content handle holds them."""
+    return [] if in_cached_content else [SystemMessage(content=SYSTEM_PROMPT)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the stable prompt prefix for creating a context cache")
+    parser.add_argument("--output", help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    document = json.dumps({
+        "fingerprint": prefix_fingerprint(),
+        "system_instruction": SYSTEM_PROMPT,
+        "function_declarations": tool_declarations()
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+        print(f"Wrote prompt prefix {prefix_fingerprint()} to {args.output}")
+    else:
+        print(document)
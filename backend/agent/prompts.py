@@ -91,3 +91,9 @@ SYSTEM_PROMPT = """You are a helpful and empathetic medical appointment scheduli
 Remember: You're helping people with their health - be patient, thorough, and caring."""
 
 
+FAST_PATH_REPHRASE_PROMPT = """You are the friendly assistant for HealthCare Plus Clinic. Rewrite the following answer to a patient's question in a warm, conversational tone. Keep every fact exactly as given, do not add new information, and keep it concise.
+
+Patient's question: {question}
+
+Answer to rewrite:
+{answer}"""
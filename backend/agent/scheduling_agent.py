@@ -3,35 +3,98 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from typing import List, Dict, Any
 import os
+import re
 import json
+import time
 
-from backend.agent.prompts import SYSTEM_PROMPT
+from backend.agent.prompts import FAST_PATH_REPHRASE_PROMPT
+from backend.agent.prompt_prefix import PREFIX_TOOLS, prefix_messages
+from backend.agent.intent_router import IntentRouter, BOOKING_PATTERN
+from backend.agent.llm_resilience import ResilientLLMCaller, RequestBudget
+from backend.agent.availability_prefetch import (
+    AvailabilityPrefetch, extract_availability_query, preinjection_decision
+)
 from backend.tools.availability_tool import availability_tool
 from backend.tools.booking_tool import booking_tool
 from backend.rag.faq_rag import FAQRetrieval
+from backend.rag.semantic_cache import SemanticCache
+from backend.utils.metrics import (
+    LLM_CALL_LATENCY, TOOL_LATENCY, TOOL_CALLS, FAQ_ROUTING, CACHE_LOOKUPS, ERRORS,
+    LLM_PATH_DECISIONS, AGENT_TURN_LATENCY, LLM_TOKENS, TURN_PROMPT_TOKENS
+)
+from backend.utils.tracing import span
+
+
+FAQ_KEYWORDS = [
+    "insurance", "accepted", "billing", "payment", "cost", "price",
+    "location", "address", "directions", "parking", "where",
+    "hours", "open", "closed", "when",
+    "bring", "documents", "need", "prepare", "preparation",
+    "policy", "policies", "cancellation", "cancel", "late", "covid",
+    "what to", "how do", "do you", "can i", "is there"
+]
+
+FAQ_KEYWORD_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in FAQ_KEYWORDS))
 
 
 class SchedulingAgent:
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY environment variable is not set")
+        self.cached_content = os.getenv("LLM_CACHED_CONTENT", "")
+        self.llm = self._create_llm(os.getenv("LLM_PROVIDER", "google").lower())
         
-        model_name = os.getenv("LLM_MODEL", "gemini-2.5-flash")
-        
-        self.llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            temperature=0.7,
-            google_api_key=api_key
-        ).bind_tools([availability_tool, booking_tool])
+        self.llm_caller = ResilientLLMCaller()
         
         self.faq_retrieval = None
         
+        self.intent_router = IntentRouter()
+        self.fast_path_rephrase = os.getenv("FAQ_FAST_PATH_REPHRASE", "false").lower() == "true"
+        self.prefetch_enabled = os.getenv("AVAILABILITY_PREFETCH_ENABLED", "true").lower() == "true"
+        self.single_call_enabled = os.getenv("SINGLE_CALL_AVAILABILITY_ENABLED", "true").lower() == "true"
+        
+        self.response_cache = None
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true":
+            self.response_cache = SemanticCache()
+        
         self.tools = {
             "check_availability": availability_tool,
             "book_appointment": booking_tool
         }
     
+    def _create_llm(self, provider: str) -> Any:
+        if provider == "fake":
+            # Offline model with scripted tool calls for load tests and CI
+            from backend.agent.fake_llm import FakeChatModel
+            self.cached_content = ""
+            return FakeChatModel().bind_tools(PREFIX_TOOLS)
+        
+        if provider != "google":
+            raise ValueError(f"Unsupported LLM_PROVIDER: {provider}")
+        
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable is not set")
+        
+        model_name = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+        
+        if self.cached_content:
+            # The cache already holds the system instruction and tool schemas,
+            # and Gemini rejects requests that send them again
+            return ChatGoogleGenerativeAI(
+                model=model_name,
+                temperature=0.7,
+                google_api_key=api_key,
+                max_retries=1,
+                cached_content=self.cached_content
+            )
+        
+        return ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=0.7,
+            google_api_key=api_key,
+            # Retries, timeouts and hedging are handled by ResilientLLMCaller
+            max_retries=1
+        ).bind_tools(PREFIX_TOOLS)
+    
     def _get_faq_retrieval(self):
         if self.faq_retrieval is None:
             self.faq_retrieval = FAQRetrieval()
@@ -61,31 +124,182 @@ class SchedulingAgent:
         return str(content)
     
     def _check_if_faq_query(self, user_message: str) -> bool:
-        faq_keywords = [
-            "insurance", "accepted", "billing", "payment", "cost", "price",
-            "location", "address", "directions", "parking", "where",
-            "hours", "open", "closed", "when",
-            "bring", "documents", "need", "prepare", "preparation",
-            "policy", "policies", "cancellation", "cancel", "late", "covid",
-            "what to", "how do", "do you", "can i", "is there"
+        return FAQ_KEYWORD_PATTERN.search(user_message.lower()) is not None
+    
+    async def _invoke_llm(self, messages: List[Any], budget: RequestBudget, call: str,
+                          turn_usage: Dict[str, int] | None = None) -> Any:
+        with LLM_CALL_LATENCY.labels(call).time(), span("llm.call", call=call, messages=len(messages)) as current:
+            response = await self.llm_caller.ainvoke(self.llm, messages, budget)
+            
+            usage = getattr(response, "usage_metadata", None)
+            if isinstance(usage, dict):
+                counts = {
+                    "input": usage.get("input_tokens", 0),
+                    "output": usage.get("output_tokens", 0),
+                    "cache_read": (usage.get("input_token_details") or {}).get("cache_read", 0)
+                }
+                for kind, count in counts.items():
+                    LLM_TOKENS.labels(call, kind).inc(count)
+                    if turn_usage is not None:
+                        turn_usage[kind] = turn_usage.get(kind, 0) + count
+                if current is not None:
+                    current.set_attribute("input_tokens", counts["input"])
+                    current.set_attribute("cache_read_tokens", counts["cache_read"])
+            return response
+    
+    def _build_messages(self, conversation_history: List[Dict[str, str]], enhanced_message: str) -> List[Any]:
+        # The stable prefix (system instruction, with the bound tool schemas)
+        # leads every call and everything that varies per turn follows it
+        return (
+            prefix_messages(in_cached_content=bool(self.cached_content))
+            + self._convert_history_to_messages(conversation_history)
+            + [HumanMessage(content=enhanced_message)]
+        )
+    
+    async def _run_tool(self, tool_name: str, tool_input: Dict[str, Any],
+                        prefetch: AvailabilityPrefetch | None) -> str:
+        if prefetch is not None and tool_name == "check_availability":
+            prefetched = await prefetch.take(tool_input)
+            if prefetched is not None:
+                return prefetched
+        return await self.tools[tool_name].ainvoke(tool_input)
+    
+    async def _preinject_availability(self, messages: List[Any], query: Dict[str, Any]) -> None:
+        """Runs check_availability now and adds the call and result to ``messages``.
+
+        The exchange looks exactly like one the model requested, so it can
+        answer from it directly and the turn takes a single LLM call.
+        """
+        tool_input = {"date": query["date"], "appointment_type": query["appointment_type"]}
+        TOOL_CALLS.labels("check_availability").inc()
+        with TOOL_LATENCY.labels("check_availability").time(), span("tool.check_availability", preinjected=True):
+            tool_result = await self.tools["check_availability"].ainvoke(tool_input)
+        call_id = "preinjected_check_availability"
+        messages.append(AIMessage(content="", tool_calls=[
+            {"name": "check_availability", "args": tool_input, "id": call_id}
+        ]))
+        messages.append(ToolMessage(content=tool_result, tool_call_id=call_id))
+    
+    async def _rephrase_fast_path_answer(self, user_message: str, answer: str,
+                                         budget: RequestBudget) -> str:
+        try:
+            prompt = FAST_PATH_REPHRASE_PROMPT.format(question=user_message, answer=answer)
+            rephrased = await self._invoke_llm(self._build_messages([], prompt), budget, "rephrase")
+            return self._extract_text_content(rephrased.content) or answer
+        except Exception as e:
+            ERRORS.labels("fast_path_rephrase", type(e).__name__).inc()
+            print(f"Fast-path rephrase failed: {e}. Using template answer.")
+            return answer
+    
+    def _is_booking_in_progress(self, history: List[Dict[str, str]]) -> bool:
+        booking_keywords = [
+            "book", "schedul", "appointment", "available", "availability",
+            "slot", "confirm", "reschedul"
         ]
         
-        message_lower = user_message.lower()
-        return any(keyword in message_lower for keyword in faq_keywords)
+        for msg in history[-6:]:
+            content_lower = msg["content"].lower()
+            if any(keyword in content_lower for keyword in booking_keywords):
+                return True
+        return False
+    
+    def _build_result(self, user_message: str, conversation_history: List[Dict[str, str]],
+                      response: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "response": response,
+            "conversation_history": conversation_history + [
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": response}
+            ],
+            "metadata": metadata
+        }
     
     async def process_message(self, user_message: str, 
-                             conversation_history: List[Dict[str, str]] | None = None) -> Dict[str, Any]:
+                             conversation_history: List[Dict[str, str]] | None = None,
+                             budget: RequestBudget | None = None) -> Dict[str, Any]:
+        """Run one chat turn within ``budget``, which callers start when the request arrives
+        so time spent queued counts against it; a fresh budget is used when omitted."""
+        with span("agent.process_message", history_messages=len(conversation_history or [])) as current:
+            result = await self._process_message(user_message, conversation_history, budget)
+            if current is not None:
+                metadata = result["metadata"]
+                current.set_attribute("route", metadata.get("routing", {}).get("route"))
+                current.set_attribute("tools_used", metadata.get("tools_used"))
+                current.set_attribute("cache_hit", metadata.get("cache_hit"))
+                if "llm_path" in metadata:
+                    current.set_attribute("llm_path", metadata["llm_path"]["reason"])
+                    current.set_attribute("llm_calls", metadata["llm_path"]["llm_calls"])
+                current.set_attribute("error", "error" in metadata)
+            return result
+    
+    async def _process_message(self, user_message: str,
+                               conversation_history: List[Dict[str, str]] | None = None,
+                               budget: RequestBudget | None = None) -> Dict[str, Any]:
         if conversation_history is None:
             conversation_history = []
-        
+        if budget is None:
+            budget = RequestBudget()
+        started = time.perf_counter()
+        prefetch = None
         try:
+            routing = self.intent_router.route(user_message, is_first_turn=not conversation_history)
+            FAQ_ROUTING.labels(routing["route"], routing["reason"]).inc()
+            if routing["route"] == "fast_path":
+                response = self.intent_router.render_answer(routing["intent"])
+                if self.fast_path_rephrase:
+                    response = await self._rephrase_fast_path_answer(user_message, response, budget)
+                return self._build_result(user_message, conversation_history, response, {
+                    "used_faq": True,
+                    "tools_used": 0,
+                    "cache_hit": False,
+                    "routing": routing
+                })
+            
             additional_context = ""
+            query_embedding = None
+            kb_version = None
+            # Cached answers are only served outside of an ongoing booking and only
+            # stored from first turns, whose answers cannot depend on earlier messages.
+            # A message asking to book must start the booking flow, never get a canned answer.
+            cache_eligible = (
+                self.response_cache is not None
+                and not self._is_booking_in_progress(conversation_history)
+                and not BOOKING_PATTERN.search(user_message.lower())
+            )
+            
             if self._check_if_faq_query(user_message):
                 try:
                     faq_retrieval = self._get_faq_retrieval()
-                    faq_context = faq_retrieval.get_context_for_query(user_message)
+                    
+                    if cache_eligible:
+                        try:
+                            query_embedding = await faq_retrieval.aembed_query(user_message)
+                            kb_version = faq_retrieval.knowledge_base_version
+                            with span("agent.semantic_cache"):
+                                cached_response = self.response_cache.lookup(query_embedding, kb_version)
+                        except Exception as e:
+                            ERRORS.labels("semantic_cache", type(e).__name__).inc()
+                            print(f"Semantic cache lookup failed: {e}")
+                            query_embedding = None
+                            cached_response = None
+                        CACHE_LOOKUPS.labels("semantic", "miss" if cached_response is None else "hit").inc()
+                        
+                        if cached_response is not None:
+                            return self._build_result(user_message, conversation_history, cached_response, {
+                                "used_faq": True,
+                                "tools_used": 0,
+                                "cache_hit": True,
+                                "routing": routing
+                            })
+                    
+                    faq_context = await faq_retrieval.aget_context_for_query(
+                        user_message,
+                        query_embedding=query_embedding,
+                        conversation_history=conversation_history
+                    )
                     additional_context = f"\n\nRelevant Clinic Information:\n{faq_context}\n"
                 except Exception as e:
+                    ERRORS.labels("faq_retrieval", type(e).__name__).inc()
                     print(f"FAQ retrieval failed: {e}. Using fallback response.")
                     additional_context = "\n\nNote: For detailed clinic information, please call +1-555-123-4567.\n"
             
@@ -93,23 +307,32 @@ class SchedulingAgent:
             if additional_context:
                 enhanced_message = f"{user_message}\n{additional_context}"
             
-            chat_history = self._convert_history_to_messages(conversation_history)
+            messages = self._build_messages(conversation_history, enhanced_message)
+            turn_usage: Dict[str, int] = {}
             
-            # Build message list: first add system prompt as part of first user message, then history, then current message
-            if not chat_history:
-                # First message - include system prompt
-                messages: List[Any] = [
-                    HumanMessage(content=f"{SYSTEM_PROMPT}\n\n---\n\n{enhanced_message}")
-                ]
+            query = None
+            if self.single_call_enabled or self.prefetch_enabled:
+                query = extract_availability_query(user_message, conversation_history)
+            if self.single_call_enabled:
+                llm_path = preinjection_decision(user_message, query)
             else:
-                # Subsequent messages - just use history + current message
-                messages = chat_history + [HumanMessage(content=enhanced_message)]
-            
-            response_message = await self.llm.ainvoke(messages)
+                llm_path = {"preinject": False, "reason": "disabled"}
+            LLM_PATH_DECISIONS.labels(str(llm_path["preinject"]).lower(), llm_path["reason"]).inc()
             
             tools_used = 0
+            if llm_path["preinject"]:
+                await self._preinject_availability(messages, query)
+                tools_used = 1
+            elif self.prefetch_enabled and query is not None:
+                # Availability the model is likely to ask for is fetched while it decides
+                prefetch = AvailabilityPrefetch(query, availability_tool.ainvoke)
+            
+            response_message = await self._invoke_llm(messages, budget, "1", turn_usage)
+            llm_calls = 1
+            
             if hasattr(response_message, 'tool_calls') and response_message.tool_calls:
-                tools_used = len(response_message.tool_calls)
+                # Also the fallback when the model wants more than the pre-injected result
+                tools_used += len(response_message.tool_calls)
                 messages.append(response_message)
                 
                 for tool_call in response_message.tool_calls:
@@ -117,8 +340,9 @@ class SchedulingAgent:
                     tool_input = tool_call['args']
                     
                     if tool_name in self.tools:
-                        tool = self.tools[tool_name]
-                        tool_result = await tool.ainvoke(tool_input)
+                        TOOL_CALLS.labels(tool_name).inc()
+                        with TOOL_LATENCY.labels(tool_name).time(), span(f"tool.{tool_name}"):
+                            tool_result = await self._run_tool(tool_name, tool_input, prefetch)
                         
                         messages.append(
                             ToolMessage(
@@ -127,26 +351,40 @@ class SchedulingAgent:
                             )
                         )
                 
-                final_response = await self.llm.ainvoke(messages)
+                if prefetch is not None:
+                    prefetch.finish()
+                final_response = await self._invoke_llm(messages, budget, "2", turn_usage)
+                llm_calls = 2
                 response = self._extract_text_content(final_response.content)
             else:
                 response = self._extract_text_content(response_message.content)
             
-            updated_history = conversation_history + [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": response}
-            ]
-            
-            return {
-                "response": response,
-                "conversation_history": updated_history,
-                "metadata": {
-                    "used_faq": bool(additional_context),
-                    "tools_used": tools_used
-                }
+            llm_path["llm_calls"] = llm_calls
+            path = ("preinjected" if llm_path["preinject"] else "standard") + f"_{llm_calls}_call"
+            AGENT_TURN_LATENCY.labels(path).observe(time.perf_counter() - started)
+            metadata = {
+                "used_faq": bool(additional_context),
+                "tools_used": tools_used,
+                "cache_hit": False,
+                "routing": routing,
+                "llm_path": llm_path
             }
+            if turn_usage:
+                TURN_PROMPT_TOKENS.observe(turn_usage["input"])
+                metadata["token_usage"] = turn_usage
+            if prefetch is not None:
+                metadata["prefetch"] = prefetch.finish()
+            
+            if (cache_eligible and query_embedding is not None and tools_used == 0
+                    and not conversation_history and response):
+                self.response_cache.store(query_embedding, response, kb_version)
+            
+            return self._build_result(user_message, conversation_history, response, metadata)
         
         except Exception as e:
+            ERRORS.labels("agent", type(e).__name__).inc()
+            if prefetch is not None:
+                prefetch.finish()
             error_response = (
                 "I apologize, but I encountered an error while processing your request. "
                 "Please try again, or if you need immediate assistance, you can call our office "
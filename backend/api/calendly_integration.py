@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from datetime import datetime, timedelta, date as dt_date, time as dt_time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Tuple
+import asyncio
+import hashlib
 import json
 from pathlib import Path
 import random
 import string
 
+from backend.storage.appointment_store import get_appointment_store
+from backend.utils.tracing import span
+from backend.utils.fast_json import FastJSONResponse
+from backend.utils.http_cache import cache_headers, not_modified
 from backend.models.schemas import (
     AvailabilityRequest, 
     AvailabilityResponse, 
@@ -19,29 +25,90 @@ from backend.models.schemas import (
 router = APIRouter(prefix="/api/calendly", tags=["calendly"])
 
 DOCTOR_SCHEDULE_PATH = Path("data/doctor_schedule.json")
-APPOINTMENTS_STORAGE_PATH = Path("data/appointments.json")
 
 APPOINTMENT_DURATIONS = AppointmentDuration()
 
+MAX_RANGE_DAYS = 31
+
+# Maps the 0/1 bytes of a day grid to the characters of the compact bitstring
+_BITSTRING_TABLE = bytes.maketrans(b"\x00\x01", b"01")
+
+
+# Parsed JSON files keyed by path, reused until the file's mtime or size changes
+_file_cache: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+
+# Booked appointments grouped by date, rebuilt when the schedule or the store changes.
+# date_versions memoizes a fingerprint of each date's bookings for availability ETags.
+_appointment_index: Dict[str, Any] = {"key": None, "by_date": {}, "date_versions": {}}
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load_json_cached(path: Path) -> Any:
+    signature = _file_signature(path)
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    
+    with open(path, 'r') as f:
+        data = json.load(f)
+    _file_cache[path] = (signature, data)
+    return data
+
 
 def load_doctor_schedule() -> Dict[str, Any]:
-    with open(DOCTOR_SCHEDULE_PATH, 'r') as f:
-        return json.load(f)
+    return _load_json_cached(DOCTOR_SCHEDULE_PATH)
 
 
 def load_appointments() -> List[Dict[str, Any]]:
-    if APPOINTMENTS_STORAGE_PATH.exists():
-        with open(APPOINTMENTS_STORAGE_PATH, 'r') as f:
-            return json.load(f)
-    return []
+    return get_appointment_store().load_all()
+
+
+def get_booked_appointments_for_date(date_str: str) -> List[Dict[str, Any]]:
+    key = (_file_signature(DOCTOR_SCHEDULE_PATH), get_appointment_store().version())
+    if _appointment_index["key"] != key:
+        with span("calendly.rebuild_index"):
+            by_date: Dict[str, List[Dict[str, Any]]] = {}
+            for appt in load_doctor_schedule()['booked_appointments'] + load_appointments():
+                by_date.setdefault(appt['date'], []).append(appt)
+            _appointment_index["key"] = key
+            _appointment_index["by_date"] = by_date
+            _appointment_index["date_versions"] = {}
+    return _appointment_index["by_date"].get(date_str, [])
+
+
+def date_booking_version(date_str: str) -> str:
+    """Fingerprint of the booked intervals on one date.
+    
+    Derived from content rather than the store's global version, so a booking
+    on one date leaves every other date's ETag valid, and every worker
+    computes the same value.
+    """
+    booked = get_booked_appointments_for_date(date_str)
+    versions = _appointment_index["date_versions"]
+    version = versions.get(date_str)
+    if version is None:
+        intervals = sorted(f"{appt['start_time']}-{appt['end_time']}" for appt in booked)
+        version = hashlib.sha1(",".join(intervals).encode()).hexdigest()[:12]
+        versions[date_str] = version
+    return version
+
+
+def availability_etag(dates: List[str], appointment_type: str, payload_format: str) -> str:
+    parts = [str(_file_signature(DOCTOR_SCHEDULE_PATH)), appointment_type, payload_format]
+    parts.extend(f"{date_str}:{date_booking_version(date_str)}" for date_str in dates)
+    # Weak, because the compression middleware may re-encode the body
+    return 'W/"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:20] + '"'
 
 
 def save_appointment(appointment: Dict[str, Any]) -> None:
-    appointments = load_appointments()
-    appointments.append(appointment)
-    APPOINTMENTS_STORAGE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(APPOINTMENTS_STORAGE_PATH, 'w') as f:
-        json.dump(appointments, f, indent=2)
+    get_appointment_store().append(appointment)
 
 
 def generate_confirmation_code() -> str:
@@ -88,84 +155,142 @@ def is_slot_booked(date_str: str, start_time: str, end_time: str,
     return False
 
 
-@router.get("/availability", response_model=AvailabilityResponse)
-async def get_availability(date: str, appointment_type: AppointmentType):
+def compute_day_grid(date_str: str, duration: int) -> Optional[Dict[str, Any]]:
+    """Free/busy grid of slot start times for one day, or None if the clinic is closed.
+    
+    Slot ``i`` starts at ``start + i * step`` minutes and ``free[i]`` is 1 when a
+    ``duration``-minute appointment fits there. Rather than testing every slot
+    against every appointment, each blocked interval (lunch and bookings)
+    clears the range of starts it overlaps.
+    """
+    schedule = load_doctor_schedule()
+    work_hours = schedule['working_hours'].get(get_day_of_week(date_str))
+    if work_hours is None or date_str in schedule.get('blocked_dates', []):
+        return None
+    
+    start = time_to_minutes(work_hours['start'])
+    end = time_to_minutes(work_hours['end'])
+    step = schedule['appointment_slot_interval']
+    count = (end - duration - start) // step + 1 if end - start >= duration else 0
+    free = bytearray(b"\x01") * count
+    
+    lunch = (time_to_minutes(schedule['lunch_break']['start']), time_to_minutes(schedule['lunch_break']['end']))
+    blocked = [lunch] + [
+        (time_to_minutes(appt['start_time']), time_to_minutes(appt['end_time']))
+        for appt in get_booked_appointments_for_date(date_str)
+    ]
+    for blocked_start, blocked_end in blocked:
+        # A slot overlaps [blocked_start, blocked_end) when it starts in (blocked_start - duration, blocked_end)
+        first = max(0, (blocked_start - duration - start) // step + 1)
+        last = min(count, -(-(blocked_end - start) // step))
+        if first < last:
+            free[first:last] = bytes(last - first)
+    
+    return {"start": start, "step": step, "free": free, "lunch": lunch}
+
+
+def compact_day(grid: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if grid is None:
+        return {"start_minute": None, "slots": ""}
+    return {"start_minute": grid["start"], "slots": bytes(grid["free"]).translate(_BITSTRING_TABLE).decode()}
+
+
+def _parse_request_date(date_str: str) -> dt_date:
     try:
-        request_date = datetime.strptime(date, "%Y-%m-%d").date()
+        request_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
     if request_date < dt_date.today():
         raise HTTPException(status_code=400, detail="Cannot book appointments in the past")
+    return request_date
+
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(date: str, appointment_type: AppointmentType, request: Request, response: Response,
+                           format: Literal["full", "compact"] = "full"):
+    return availability_for_date(date, appointment_type, format, request, response)
+
+
+def availability_for_date(date: str, appointment_type: AppointmentType, format: str = "full",
+                          request: Optional[Request] = None, response: Optional[Response] = None) -> Any:
+    """Body of ``GET /availability``; callable without a request, as the tests and benchmarks do."""
+    _parse_request_date(date)
     
-    schedule = load_doctor_schedule()
-    day_of_week = get_day_of_week(date)
-    
-    if day_of_week not in schedule['working_hours'] or schedule['working_hours'][day_of_week] is None:
-        return AvailabilityResponse(
-            date=date,
-            available_slots=[],
-            appointment_type=appointment_type
-        )
-    
-    if date in schedule.get('blocked_dates', []):
-        return AvailabilityResponse(
-            date=date,
-            available_slots=[],
-            appointment_type=appointment_type
-        )
-    
-    work_hours = schedule['working_hours'][day_of_week]
-    start_time = time_to_minutes(work_hours['start'])
-    end_time = time_to_minutes(work_hours['end'])
-    
-    lunch_start = time_to_minutes(schedule['lunch_break']['start'])
-    lunch_end = time_to_minutes(schedule['lunch_break']['end'])
+    # Pollers re-asking for an unchanged date get a 304 before any slot is computed
+    etag = availability_etag([date], appointment_type.value, format)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
     
-    slot_interval = schedule['appointment_slot_interval']
     duration = getattr(APPOINTMENT_DURATIONS, appointment_type.value)
+    grid = compute_day_grid(date, duration)
     
-    all_booked = schedule['booked_appointments'] + load_appointments()
+    if format == "compact":
+        return FastJSONResponse({
+            "date": date,
+            "appointment_type": appointment_type.value,
+            "duration": duration,
+            "step": grid["step"] if grid else load_doctor_schedule()['appointment_slot_interval'],
+            **compact_day(grid)
+        }, headers=cache_headers(etag))
     
-    available_slots = []
-    current_time = start_time
+    if response is not None:
+        response.headers.update(cache_headers(etag))
     
-    while current_time + duration <= end_time:
-        slot_start = current_time
-        slot_end = current_time + duration
-        
-        is_during_lunch = not (slot_end <= lunch_start or slot_start >= lunch_end)
-        
-        if not is_during_lunch:
-            start_time_str = minutes_to_time(slot_start)
-            end_time_str = minutes_to_time(slot_end)
+    available_slots = []
+    if grid is not None:
+        lunch_start, lunch_end = grid["lunch"]
+        for index, is_free in enumerate(grid["free"]):
+            slot_start = grid["start"] + index * grid["step"]
+            slot_end = slot_start + duration
             
-            is_available = not is_slot_booked(date, start_time_str, end_time_str, all_booked)
+            # Slots overlapping lunch are not offered at all, rather than shown as taken
+            if not (slot_end <= lunch_start or slot_start >= lunch_end):
+                continue
             
-            available_slots.append(TimeSlot(
-                start_time=start_time_str,
-                end_time=end_time_str,
-                available=is_available
+            available_slots.append(TimeSlot.model_construct(
+                start_time=minutes_to_time(slot_start),
+                end_time=minutes_to_time(slot_end),
+                available=bool(is_free)
             ))
-        
-        current_time += slot_interval
     
-    return AvailabilityResponse(
+    # Built from values computed above, so pydantic validation is skipped
+    return AvailabilityResponse.model_construct(
         date=date,
         available_slots=available_slots,
         appointment_type=appointment_type
     )
 
 
+@router.get("/availability/range")
+async def get_availability_range(start_date: str, appointment_type: AppointmentType, request: Request,
+                                 days: int = 7):
+    """Compact availability for up to ``MAX_RANGE_DAYS`` consecutive days."""
+    first_date = _parse_request_date(start_date)
+    if not 1 <= days <= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_RANGE_DAYS}")
+    
+    dates = [(first_date + timedelta(days=offset)).isoformat() for offset in range(days)]
+    etag = availability_etag(dates, appointment_type.value, "range")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    
+    duration = getattr(APPOINTMENT_DURATIONS, appointment_type.value)
+    by_date = {date_str: compact_day(compute_day_grid(date_str, duration)) for date_str in dates}
+    
+    return FastJSONResponse({
+        "appointment_type": appointment_type.value,
+        "duration": duration,
+        "step": load_doctor_schedule()['appointment_slot_interval'],
+        "days": by_date
+    }, headers=cache_headers(etag))
+
+
 @router.post("/book", response_model=BookingResponse)
 async def book_appointment(booking: BookingRequest):
-    try:
-        request_date = datetime.strptime(booking.date, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-    
-    if request_date < dt_date.today():
-        raise HTTPException(status_code=400, detail="Cannot book appointments in the past")
+    _parse_request_date(booking.date)
     
     schedule = load_doctor_schedule()
     day_of_week = get_day_of_week(booking.date)
@@ -180,9 +305,9 @@ async def book_appointment(booking: BookingRequest):
     start_minutes = time_to_minutes(booking.start_time)
     end_time_str = minutes_to_time(start_minutes + duration)
     
-    all_booked = schedule['booked_appointments'] + load_appointments()
+    booked_on_date = get_booked_appointments_for_date(booking.date)
     
-    if is_slot_booked(booking.date, booking.start_time, end_time_str, all_booked):
+    if is_slot_booked(booking.date, booking.start_time, end_time_str, booked_on_date):
         raise HTTPException(status_code=409, detail="This time slot is no longer available")
     
     booking_id = generate_booking_id()
@@ -203,7 +328,20 @@ async def book_appointment(booking: BookingRequest):
         "booked_at": datetime.now().isoformat()
     }
     
-    save_appointment(appointment_record)
+    # Re-checked under the store's write lock so concurrent workers can't double-book.
+    # Waiting for that lock blocks, so it happens off the event loop.
+    schedule_booked = [
+        appt for appt in schedule['booked_appointments'] if appt['date'] == booking.date
+    ]
+    booked = await asyncio.to_thread(
+        get_appointment_store().book_if_free,
+        appointment_record,
+        lambda stored_on_date: is_slot_booked(
+            booking.date, booking.start_time, end_time_str, schedule_booked + stored_on_date
+        )
+    )
+    if not booked:
+        raise HTTPException(status_code=409, detail="This time slot is no longer available")
     
     return BookingResponse(
         booking_id=booking_id,
@@ -227,4 +365,4 @@ async def get_all_appointments():
     schedule = load_doctor_schedule()
     stored_appointments = load_appointments()
     all_appointments = schedule['booked_appointments'] + stored_appointments
-    return {"appointments": all_appointments}
+    return FastJSONResponse({"appointments": all_appointments})
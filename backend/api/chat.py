@@ -1,22 +1,66 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
-from backend.models.schemas import ChatRequest, ChatResponse, ChatMessage
-from backend.agent.scheduling_agent import SchedulingAgent
+import os
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from typing import List, Dict, TYPE_CHECKING
+from backend.models.schemas import ChatRequest, ChatResponse
+from backend.utils.warmup import readiness
+from backend.utils.admission import get_admission_controller, AdmissionRejected
+from backend.agent.llm_resilience import RequestBudget
+from backend.utils.fast_json import FastJSONResponse
+from backend.api.admin import require_admin
+
+if TYPE_CHECKING:
+    from backend.agent.scheduling_agent import SchedulingAgent
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
 agent = None
 
 
-def get_agent():
+def get_agent() -> "SchedulingAgent":
     global agent
     if agent is None:
+        # Imported here so workers that never chat don't pay for LangChain/Chroma
+        from backend.agent.scheduling_agent import SchedulingAgent
         agent = SchedulingAgent()
     return agent
 
 
+def get_client_id(http_request: Request) -> str:
+    """Rate-limit key for a chat request.
+
+    Kiosks and partner portals may identify themselves with ``X-Client-ID``,
+    but only together with an ``X-Client-Key`` matching ``CHAT_CLIENT_KEY``;
+    otherwise any caller could pick a fresh ID per request and never be
+    limited. Everyone else is keyed by peer IP.
+    """
+    client_id = http_request.headers.get("X-Client-ID")
+    client_key = os.getenv("CHAT_CLIENT_KEY", "")
+    if client_id and client_key and secrets.compare_digest(
+            http_request.headers.get("X-Client-Key", "").encode(), client_key.encode()):
+        return f"client:{client_id}"
+    return http_request.client.host if http_request.client else "unknown"
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
+    # Started before admission, so time spent queued for a slot comes out of the turn's deadline
+    budget = RequestBudget()
+    try:
+        async with get_admission_controller().admit(get_client_id(http_request)):
+            return await _run_chat(request, budget)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail="Too many requests from this client, please retry shortly" if e.status_code == 429
+            else "Server is busy, please retry shortly",
+            headers=e.headers()
+        )
+
+
+async def _run_chat(request: ChatRequest, budget: RequestBudget) -> FastJSONResponse:
     try:
         current_agent = get_agent()
         history: List[Dict[str, str]] = [
@@ -25,19 +69,17 @@ async def chat(request: ChatRequest):
         ]
         result = await current_agent.process_message(
             user_message=request.message,
-            conversation_history=history
+            conversation_history=history,
+            budget=budget
         )
         
-        conversation_history = [
-            ChatMessage(role=msg["role"], content=msg["content"])
-            for msg in result["conversation_history"]
-        ]
-        
-        return ChatResponse(
-            response=result["response"],
-            conversation_history=conversation_history,
-            metadata=result.get("metadata")
-        )
+        # The agent returns plain role/content dicts, already in ChatResponse's shape,
+        # so they are serialized directly instead of being rebuilt as ChatMessage models
+        return FastJSONResponse({
+            "response": result["response"],
+            "conversation_history": result["conversation_history"],
+            "metadata": result.get("metadata")
+        })
     
     except Exception as e:
         raise HTTPException(
@@ -53,3 +95,15 @@ async def health_check():
         "service": "Medical Appointment Scheduling Agent",
         "version": "1.0.0"
     }
+
+
+@router.get("/admission", dependencies=[Depends(require_admin)])
+async def admission_stats():
+    return get_admission_controller().stats()
+
+
+@router.get("/ready")
+async def readiness_check():
+    await readiness.retry_failed()
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
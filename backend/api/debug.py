@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.api.admin import require_admin
+from backend.utils.tracing import get_tracer
+from backend.utils.single_flight import single_flight_stats
+
+# Traces include patients' messages, so these are admin-only like /api/admin
+router = APIRouter(prefix="/api/debug", tags=["debug"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/traces")
+async def list_traces(limit: int = 20):
+    buffer = get_tracer().ring_buffer()
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="In-memory trace exporter is not enabled")
+    return {"traces": buffer.recent(limit)}
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    buffer = get_tracer().ring_buffer()
+    spans = buffer.get_trace(trace_id) if buffer is not None else None
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+
+@router.get("/single-flight")
+async def single_flight():
+    return {"flights": single_flight_stats()}
@@ -1,18 +1,35 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from backend.api import chat, calendly_integration
+from fastapi.responses import FileResponse, PlainTextResponse
+from backend.api import chat, calendly_integration, debug, admin
+from backend.tools.http_client import close_http_client
+from backend.utils.warmup import warm_up
+from backend.utils.metrics import MetricsMiddleware, REGISTRY
+from backend.utils.tracing import TracingMiddleware
+from backend.utils.profiling import ProfilingMiddleware
+from backend.utils.compression import CompressionMiddleware
+from backend.utils.http_cache import PrecompressedStaticFiles, REVALIDATE_CACHE_CONTROL, not_modified
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the agent, tool client and indexes before the worker takes traffic
+    await warm_up()
+    yield
+    await close_http_client()
+
+
 app = FastAPI(
     title="Medical Appointment Scheduling Agent",
     description="Intelligent conversational agent for scheduling medical appointments",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -23,20 +40,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so it sees the final body and headers
+app.add_middleware(CompressionMiddleware)
+
 app.include_router(chat.router)
 app.include_router(calendly_integration.router)
+app.include_router(debug.router)
+app.include_router(admin.router)
 
 # Serve static files from frontend build
 static_dir = Path(__file__).parent.parent / "frontend" / "dist"
 if static_dir.exists():
-    app.mount("/assets", StaticFiles(directory=str(static_dir / "assets")), name="assets")
+    app.mount("/assets", PrecompressedStaticFiles(directory=str(static_dir / "assets")), name="assets")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/")
-async def root():
-    # Serve the frontend index.html
+async def root(request: Request):
+    # Serve the frontend index.html; it names the hashed assets, so it is always revalidated
     index_file = static_dir / "index.html"
     if index_file.exists():
-        return FileResponse(index_file)
+        response = FileResponse(index_file, stat_result=index_file.stat(),
+                                headers={"Cache-Control": REVALIDATE_CACHE_CONTROL})
+        return not_modified(request, response.headers["etag"]) or response
     return {
         "message": "Medical Appointment Scheduling Agent API",
         "version": "1.0.0",
@@ -0,0 +1,127 @@
+import os
+import re
+from typing import List, Dict, Any, Optional, Set
+
+from backend.rag.reranker import content_terms
+
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+CONTEXT_HEADER = "Here is relevant information from our clinic knowledge base:"
+ALREADY_PROVIDED = "The relevant clinic information was already provided earlier in this conversation."
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose
+    return len(text) // 4 + 1
+
+
+def _split_units(document: str) -> List[str]:
+    """Break a knowledge-base document into independently useful pieces.
+
+    A line ending with ``:`` is kept together with the bullet list that
+    follows it; long prose lines are split into sentences.
+    """
+    units: List[str] = []
+    in_list = False
+    for line in document.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("- ") and units and (in_list or units[-1].endswith(":")):
+            units[-1] = f"{units[-1]}\n{line}"
+            in_list = True
+            continue
+        in_list = False
+        if len(line) > 200:
+            label, sep, body = line.partition(": ")
+            sentences = SENTENCE_SPLIT.split(body if sep else line)
+            prefix = f"{label}: " if sep else ""
+            units.extend(f"{prefix}{sentence}" for sentence in sentences if sentence)
+        else:
+            units.append(line)
+    return units
+
+
+class ContextBuilder:
+    """Builds a compact FAQ context block for one conversation turn.
+
+    Only the pieces of the retrieved documents whose query-term overlap is
+    close to the best piece's are kept (the whole best-ranked document when
+    nothing overlaps), pieces the assistant has already told the patient are
+    dropped, and the result is trimmed to ``max_tokens``.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, dedup_coverage: float = 0.8,
+                 min_relevance_share: float = 0.6):
+        self.max_tokens = max_tokens if max_tokens is not None else int(
+            os.getenv("FAQ_CONTEXT_MAX_TOKENS", "250")
+        )
+        self.dedup_coverage = dedup_coverage
+        self.min_relevance_share = min_relevance_share
+
+    def _already_given(self, terms: Set[str], given: List[Set[str]]) -> bool:
+        if not terms:
+            return False
+        return any(len(terms & previous) / len(terms) >= self.dedup_coverage for previous in given)
+
+    def build(self, query: str, documents: List[str],
+              conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        if not documents:
+            return "No relevant information found."
+
+        query_terms = content_terms(query)
+        given = [
+            content_terms(msg["content"]) for msg in (conversation_history or [])
+            if msg.get("role") == "assistant"
+        ]
+
+        units: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+        for rank, document in enumerate(documents):
+            for position, unit in enumerate(_split_units(document)):
+                if unit in seen:
+                    continue
+                seen.add(unit)
+                terms = content_terms(unit)
+                units.append({
+                    "text": unit,
+                    "rank": rank,
+                    "position": position,
+                    "relevance": len(query_terms & terms) / len(query_terms) if query_terms else 0.0,
+                    "given": self._already_given(terms, given)
+                })
+
+        best_relevance = max(unit["relevance"] for unit in units)
+        if best_relevance == 0:
+            # No term overlap at all: trust the reranker's best document
+            relevant = [unit for unit in units if unit["rank"] == 0]
+        else:
+            relevant = [
+                unit for unit in units
+                if unit["relevance"] >= best_relevance * self.min_relevance_share
+            ]
+        candidates = [unit for unit in relevant if not unit["given"]]
+        skipped_as_given = len(relevant) - len(candidates)
+
+        if not candidates:
+            return ALREADY_PROVIDED if skipped_as_given else "No relevant information found."
+
+        budget = self.max_tokens - estimate_tokens(CONTEXT_HEADER)
+        selected = []
+        for candidate in sorted(candidates, key=lambda c: (-c["relevance"], c["rank"], c["position"])):
+            cost = estimate_tokens(candidate["text"])
+            if cost > budget:
+                continue
+            selected.append(candidate)
+            budget -= cost
+
+        if not selected:
+            # A single piece larger than the cap is truncated rather than dropped
+            best = min(candidates, key=lambda c: (-c["relevance"], c["rank"], c["position"]))
+            best = dict(best, text=best["text"][:max(self.max_tokens * 4 - len(CONTEXT_HEADER), 0)])
+            selected = [best]
+
+        selected.sort(key=lambda c: (c["rank"], c["position"]))
+        lines = [f"{i}. {candidate['text']}" for i, candidate in enumerate(selected, 1)]
+        return CONTEXT_HEADER + "\n\n" + "\n".join(lines)
@@ -1,21 +1,128 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from typing import List
+from typing import List, Callable, Optional, Set, Tuple
+import asyncio
 import os
+import time
+
+from backend.utils.metrics import EMBEDDING_LATENCY, EMBEDDING_BATCH_SIZE, ERRORS
+from backend.utils.single_flight import SingleFlight
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into one batch call.
+
+    Requests arriving within ``window_ms`` of the first pending request (or
+    until ``max_batch_size`` requests are pending) are sent together through
+    ``embed_documents`` and the vectors are fanned back out to the callers.
+    """
+
+    def __init__(self, embed_documents: Callable[[List[str]], List[List[float]]],
+                 window_ms: Optional[float] = None, max_batch_size: Optional[int] = None):
+        self._embed_documents = embed_documents
+        self.window_ms = window_ms if window_ms is not None else float(
+            os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")
+        )
+        self.max_batch_size = max_batch_size if max_batch_size is not None else int(
+            os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")
+        )
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks, and callers wait on these
+        self._batches: Set[asyncio.Task] = set()
+
+    async def embed_text(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        started = time.perf_counter()
+        try:
+            vectors = await asyncio.to_thread(self._embed_documents, texts)
+        except Exception as e:
+            ERRORS.labels("embedding", type(e).__name__).inc()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        EMBEDDING_LATENCY.observe(time.perf_counter() - started)
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+# Model name and vector dimension per provider; vectors from different
+# models can't share an index, so these are part of the index version
+EMBEDDING_MODELS = {
+    "google": ("models/embedding-001", 768),
+    "fake": ("fake-hashed-trigrams", 256)
+}
+
+
+def embedding_provider() -> str:
+    return os.getenv("EMBEDDING_PROVIDER", os.getenv("LLM_PROVIDER", "google")).lower()
+
+
+def embedding_model_id() -> str:
+    """``provider:model:dimension`` of the configured embedding model."""
+    provider = embedding_provider()
+    model, dimensions = EMBEDDING_MODELS.get(provider, (provider, 0))
+    return f"{provider}:{model}:{dimensions}"
 
 
 class EmbeddingService:
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY environment variable is not set")
-        
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=api_key  # type: ignore
-        )
-    
+        provider = embedding_provider()
+        if provider == "fake":
+            from backend.rag.fake_embeddings import FakeEmbeddings
+            self.embeddings = FakeEmbeddings(dimensions=EMBEDDING_MODELS["fake"][1])
+        elif provider == "google":
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY environment variable is not set")
+
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            self.embeddings = GoogleGenerativeAIEmbeddings(
+                model=EMBEDDING_MODELS["google"][0],
+                google_api_key=api_key  # type: ignore
+            )
+        else:
+            raise ValueError(f"Unsupported EMBEDDING_PROVIDER: {provider}")
+        self.batcher = EmbeddingBatcher(self._embed_queries)
+        self.flight = SingleFlight("embedding")
+
     def embed_text(self, text: str) -> List[float]:
         return self.embeddings.embed_query(text)
-    
+
+    async def aembed_text(self, text: str) -> List[float]:
+        # Identical texts in flight share one slot in the batch
+        text = " ".join(text.split())
+        return await self.flight.do(text, lambda: self.batcher.embed_text(text))
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         return self.embeddings.embed_documents(texts)
+
+    def _embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Same task type as embed_query so batched vectors match single ones
+        return self.embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
@@ -0,0 +1,44 @@
+import hashlib
+import math
+import os
+import re
+import time
+from typing import List, Optional
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class FakeEmbeddings:
+    """Offline embedding model: hashed bag of words and character trigrams.
+
+    Vectors are deterministic and texts that share words land close to each
+    other, which is enough for retrieval to behave sensibly in load tests
+    and benchmarks. ``latency_ms`` simulates the per-call network round trip.
+    """
+
+    def __init__(self, dimensions: int = 256, latency_ms: Optional[float] = None):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "0"))
+
+    def _bucket(self, feature: str) -> int:
+        digest = hashlib.md5(feature.encode()).digest()
+        return int.from_bytes(digest[:4], "little") % self.dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            vector[self._bucket(token)] += 1.0
+            padded = f" {token} "
+            for i in range(len(padded) - 2):
+                vector[self._bucket(padded[i:i + 3])] += 0.25
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,154 @@
+import re
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple
+
+
+# Keyword -> weight per FAQ intent. Weak (0.5) keywords are ambiguous on their
+# own and need support from another keyword before the router trusts them.
+INTENT_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "hours": {
+        "hours": 1.0, "opening hours": 1.0, "business hours": 1.0, "are you open": 1.0,
+        "what time do you open": 1.0, "what time do you close": 1.0,
+        "open": 0.5, "close": 0.5, "closed": 0.5, "closing": 0.5
+    },
+    "location": {
+        "address": 1.0, "located": 1.0, "location": 1.0, "where are you": 1.0,
+        "where is the clinic": 1.0, "where is your": 0.5
+    },
+    "directions": {
+        "directions": 1.0, "how do i get": 1.0, "get there": 1.0, "which floor": 1.0,
+        "find you": 1.0, "elevator": 0.5
+    },
+    "parking": {
+        "park": 1.0, "parking": 1.0, "garage": 1.0, "validate": 0.5
+    },
+    "insurance": {
+        "insurance": 1.0, "insurances": 1.0, "insured": 1.0, "in network": 1.0,
+        "in-network": 1.0, "aetna": 1.0, "cigna": 1.0, "medicare": 1.0, "medicaid": 1.0,
+        "blue cross": 1.0, "humana": 1.0, "kaiser": 1.0, "unitedhealthcare": 1.0,
+        "accept": 0.5, "take": 0.5, "coverage": 0.5
+    },
+    "payment": {
+        "payment": 1.0, "payment methods": 1.0, "pay": 1.0, "credit card": 1.0,
+        "debit card": 1.0, "hsa": 1.0, "fsa": 1.0, "payment plan": 1.0, "billing": 1.0,
+        "self-pay": 1.0, "cash": 0.5, "bill": 0.5
+    },
+    "cost": {
+        "cost": 1.0, "costs": 1.0, "price": 1.0, "prices": 1.0, "how much": 1.0,
+        "charge": 0.5, "expensive": 0.5
+    },
+    "cancellation_policy": {
+        "cancellation policy": 1.0, "cancellation": 1.0, "cancel": 1.0, "no-show": 1.0,
+        "no show": 1.0, "cancellation fee": 1.0
+    },
+    "what_to_bring": {
+        "bring": 1.0, "documents": 1.0, "paperwork": 1.0, "first visit": 0.5,
+        "what do i need": 0.5, "prepare": 0.5
+    },
+    "arrival": {
+        "arrive": 1.0, "arrival": 1.0, "how early": 1.0, "get there early": 1.0, "early": 0.5
+    },
+    "late_arrival": {
+        "running late": 1.0, "late": 1.0, "late arrival": 1.0
+    },
+    "telehealth": {
+        "telehealth": 1.0, "virtual visit": 1.0, "video visit": 1.0, "online visit": 1.0,
+        "video call": 1.0, "virtual": 0.5
+    },
+    "walk_ins": {
+        "walk-in": 1.0, "walk-ins": 1.0, "walk in": 1.0, "walk ins": 1.0, "walkin": 1.0,
+        "walkins": 1.0, "same-day": 0.5, "same day": 0.5
+    },
+    "lab_services": {
+        "lab": 1.0, "labs": 1.0, "laboratory": 1.0, "blood work": 1.0, "bloodwork": 1.0,
+        "blood test": 1.0
+    },
+    "test_results": {
+        "test results": 1.0, "my results": 1.0, "results": 0.5
+    },
+    "prescription_refills": {
+        "refill": 1.0, "refills": 1.0, "prescription": 1.0, "prescriptions": 1.0
+    },
+    "covid": {
+        "covid": 1.0, "covid-19": 1.0, "mask": 1.0, "masks": 1.0
+    }
+}
+
+# Knowledge-base ``category`` metadata holding the answer for each intent
+INTENT_CATEGORIES: Dict[str, List[str]] = {
+    "hours": ["clinic_details"],
+    "location": ["clinic_details"],
+    "directions": ["clinic_details"],
+    "parking": ["clinic_details"],
+    "insurance": ["insurance_billing"],
+    "payment": ["insurance_billing"],
+    "cost": ["appointment_types", "insurance_billing"],
+    "cancellation_policy": ["policies", "insurance_billing"],
+    "what_to_bring": ["visit_preparation"],
+    "arrival": ["visit_preparation"],
+    "late_arrival": ["policies"],
+    "telehealth": ["common_questions"],
+    "walk_ins": ["common_questions"],
+    "lab_services": ["common_questions"],
+    "test_results": ["policies", "common_questions"],
+    "prescription_refills": ["policies"],
+    "covid": ["policies"],
+}
+
+
+def compile_keywords(keywords: List[str]) -> "re.Pattern[str]":
+    # Longest alternatives first so multi-word phrases win over their prefixes
+    alternatives = sorted(set(keywords), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(k) for k in alternatives) + r")\b")
+
+
+_KEYWORD_INTENTS: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+for _intent, _keywords in INTENT_KEYWORDS.items():
+    for _keyword, _weight in _keywords.items():
+        _KEYWORD_INTENTS[_keyword].append((_intent, _weight))
+
+INTENT_PATTERN = compile_keywords(list(_KEYWORD_INTENTS))
+
+
+def classify_intents(message: str) -> Dict[str, Any]:
+    """Score every FAQ intent mentioned in ``message``.
+
+    Confidence is the winning intent's share of the total score, scaled down
+    when only weak keywords matched.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for match in INTENT_PATTERN.finditer(message.lower()):
+        for intent, weight in _KEYWORD_INTENTS[match.group(0)]:
+            scores[intent] += weight
+
+    if not scores:
+        return {"intent": None, "confidence": 0.0, "scores": {}}
+
+    intent, top_score = max(scores.items(), key=lambda item: item[1])
+    confidence = (top_score / sum(scores.values())) * min(1.0, top_score)
+    return {
+        "intent": intent,
+        "confidence": round(confidence, 3),
+        "scores": dict(scores)
+    }
+
+
+def predict_categories(query: str, min_share: float = 0.5) -> List[str]:
+    """Knowledge-base categories likely to answer ``query``, best first.
+
+    Intents scoring below ``min_share`` of the top intent are ignored. An
+    empty list means the query gave no usable signal.
+    """
+    scores = classify_intents(query)["scores"]
+    if not scores:
+        return []
+
+    top_score = max(scores.values())
+    categories: List[str] = []
+    for intent, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+        if score < top_score * min_share:
+            break
+        for category in INTENT_CATEGORIES.get(intent, []):
+            if category not in categories:
+                categories.append(category)
+    return categories
@@ -1,8 +1,27 @@
+import asyncio
+import hashlib
 import json
+import os
 from pathlib import Path
-from typing import List, Dict, Any
-from backend.rag.embeddings import EmbeddingService
+from typing import List, Dict, Any, Optional, Tuple
+from backend.rag.embeddings import EmbeddingService, embedding_model_id
 from backend.rag.vector_store import VectorStore
+from backend.rag.faq_intents import predict_categories
+from backend.rag.reranker import rerank
+from backend.rag.context_builder import ContextBuilder
+from backend.storage.locking import FileLock
+from backend.utils.metrics import VECTOR_QUERY_LATENCY
+from backend.utils.tracing import span
+from backend.utils.single_flight import SingleFlight, normalize_text
+
+
+# Bump when the way documents are built from clinic_info.json changes, so
+# existing vector stores are re-indexed
+KB_FORMAT_VERSION = "2"
+
+
+def format_hours(hours: Dict[str, str]) -> str:
+    return "; ".join(f"{day.title()} {value}" for day, value in hours.items())
 
 
 class FAQRetrieval:
@@ -11,18 +30,58 @@ class FAQRetrieval:
         self.embedding_service = None
         self.vector_store = None
         self._initialized = False
+        self._kb_version = None
+        self._kb_key = None
+        self.vector_db_path = os.getenv("VECTOR_DB_PATH", "./data/vectordb")
+        self.candidate_count = int(os.getenv("RETRIEVAL_CANDIDATES", "8"))
+        self.score_gap = float(os.getenv("RETRIEVAL_SCORE_GAP", "0.08"))
+        self.context_builder = ContextBuilder()
+        self.retrieval_flight = SingleFlight("faq_retrieval")
+        self._init_flight = SingleFlight("faq_initialize")
+    
+    @property
+    def knowledge_base_version(self) -> str:
+        """Hash of the clinic info file and the embedding model, recomputed when either changes.
+
+        The model is included so an index built by one embedding provider is
+        never reused by another, whose query vectors wouldn't match it.
+        """
+        key = (self.clinic_info_path.stat().st_mtime_ns, embedding_model_id())
+        if key != self._kb_key:
+            digest = hashlib.sha256(KB_FORMAT_VERSION.encode())
+            digest.update(key[1].encode())
+            digest.update(self.clinic_info_path.read_bytes())
+            self._kb_version = digest.hexdigest()[:16]
+            self._kb_key = key
+        return self._kb_version
+    
+    def _create_vector_store(self):
+        if os.getenv("VECTOR_DB", "chromadb").lower() == "matrix":
+            from backend.rag.matrix_store import MatrixVectorStore
+            return MatrixVectorStore(self.vector_db_path)
+        return VectorStore(self.vector_db_path)
     
     def _ensure_initialized(self):
         if not self._initialized:
             self.embedding_service = EmbeddingService()
-            self.vector_store = VectorStore()
+            self.vector_store = self._create_vector_store()
             
-            if self.vector_store.count() == 0:
-                self._initialize_knowledge_base()
+            kb_version = self.knowledge_base_version
+            # Workers starting together must not all rebuild the shared index
+            with FileLock(Path(self.vector_db_path) / ".build.lock"):
+                if self.vector_store.count() == 0 or self.vector_store.get_version() != kb_version:
+                    self._initialize_knowledge_base(kb_version)
             
             self._initialized = True
     
-    def _initialize_knowledge_base(self) -> None:
+    def _initialize_knowledge_base(self, kb_version: str) -> None:
+        documents, metadatas = self.load_documents()
+        # Embedded before the old index is replaced, so it keeps serving meanwhile
+        embeddings = self.embedding_service.embed_documents(documents)
+        self.vector_store.rebuild(documents, metadatas, embeddings, kb_version)
+    
+    def load_documents(self) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Knowledge base documents and their category metadata, before embedding."""
         with open(self.clinic_info_path, 'r') as f:
             clinic_data = json.load(f)
         
@@ -35,7 +94,7 @@ class FAQRetrieval:
             f"Address: {clinic_details.get('address', '')}\n"
             f"Phone: {clinic_details.get('phone', '')}\n"
             f"Email: {clinic_details.get('email', '')}\n"
-            f"Hours: {json.dumps(clinic_details.get('hours', {}), indent=2)}"
+            f"Hours: {format_hours(clinic_details.get('hours', {}))}"
         )
         metadatas.append({"category": "clinic_details", "subcategory": "contact_and_hours"})
         
@@ -108,42 +167,96 @@ class FAQRetrieval:
             )
             metadatas.append({"category": "common_questions", "subcategory": question})
         
-        embeddings = self.embedding_service.embed_documents(documents)
-        self.vector_store.add_documents(documents, metadatas, embeddings)
+        return documents, metadatas
+    
+    def _search(self, query: str, query_embedding: List[float], top_k: int) -> List[str]:
+        n_results = max(top_k, self.candidate_count)
+        results = None
+        backend = os.getenv("VECTOR_DB", "chromadb").lower()
+        timer = VECTOR_QUERY_LATENCY.labels(backend)
+        
+        categories = predict_categories(query)
+        if categories:
+            where = (
+                {"category": categories[0]} if len(categories) == 1
+                else {"category": {"$in": categories}}
+            )
+            with timer.time(), span("rag.vector_query", backend=backend, categories=categories):
+                results = self.vector_store.query(query_embedding, n_results=n_results, where=where)
+        
+        # No category signal, or nothing filed under the predicted categories
+        if not results or not results["documents"]:
+            with timer.time(), span("rag.vector_query", backend=backend):
+                results = self.vector_store.query(query_embedding, n_results=n_results)
+        
+        ranked = rerank(query, results, max_k=top_k, score_gap=self.score_gap)
+        return [candidate["document"] for candidate in ranked]
     
     def retrieve_relevant_info(self, query: str, top_k: int = 3) -> List[str]:
         self._ensure_initialized()
         query_embedding = self.embedding_service.embed_text(query)
-        results = self.vector_store.query(query_embedding, n_results=top_k)
-        
-        return results["documents"]
+        return self._search(query, query_embedding, top_k)
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        if not self._initialized:
+            with span("rag.initialize"):
+                # Only one thread builds the store when a burst arrives on a cold worker
+                await self._init_flight.do("initialize", lambda: asyncio.to_thread(self._ensure_initialized))
+        # Concurrent callers share embedding API calls through the batcher
+        with span("rag.embed_query"):
+            return await self.embedding_service.aembed_text(query)
     
-    def get_context_for_query(self, query: str) -> str:
+    async def aretrieve_relevant_info(self, query: str, top_k: int = 3,
+                                      query_embedding: Optional[List[float]] = None) -> List[str]:
+        with span("rag.retrieve", top_k=top_k):
+            # Chroma queries are blocking; keep them off the event loop
+            if query_embedding is not None:
+                return await asyncio.to_thread(self._search, query, query_embedding, top_k)
+            
+            # Concurrent askers of the same question share one embedding and search
+            async def retrieve() -> List[str]:
+                embedding = await self.aembed_query(query)
+                return await asyncio.to_thread(self._search, query, embedding, top_k)
+            
+            return await self.retrieval_flight.do((normalize_text(query), top_k), retrieve)
+    
+    def _format_context(self, query: str, relevant_docs: List[str],
+                        conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        return self.context_builder.build(query, relevant_docs, conversation_history)
+    
+    def get_context_for_query(self, query: str,
+                              conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
         try:
             self._ensure_initialized()
             relevant_docs = self.retrieve_relevant_info(query, top_k=3)
-            
-            if not relevant_docs:
-                return "No relevant information found."
-            
-            context = "Here is relevant information from our clinic knowledge base:\n\n"
-            for i, doc in enumerate(relevant_docs, 1):
-                context += f"{i}. {doc}\n\n"
-            
-            return context.strip()
+            return self._format_context(query, relevant_docs, conversation_history)
         except Exception as e:
-            with open(self.clinic_info_path, 'r') as f:
-                clinic_data = json.load(f)
-            
-            query_lower = query.lower()
-            if "insurance" in query_lower:
-                insurance = clinic_data.get("insurance_and_billing", {})
-                return f"Accepted Insurance: {', '.join(insurance.get('accepted_insurance', []))}"
-            elif "hour" in query_lower or "open" in query_lower:
-                hours = clinic_data.get("clinic_details", {}).get("hours", {})
-                return f"Clinic Hours: {json.dumps(hours, indent=2)}"
-            elif "location" in query_lower or "address" in query_lower:
-                details = clinic_data.get("clinic_details", {})
-                return f"Location: {details.get('address', '')}. Phone: {details.get('phone', '')}"
-            
-            return "For detailed information, please call our office at +1-555-123-4567."
+            return self._fallback_context(query)
+    
+    async def aget_context_for_query(self, query: str,
+                                     query_embedding: Optional[List[float]] = None,
+                                     conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        try:
+            relevant_docs = await self.aretrieve_relevant_info(
+                query, top_k=3, query_embedding=query_embedding
+            )
+            return self._format_context(query, relevant_docs, conversation_history)
+        except Exception as e:
+            return self._fallback_context(query)
+    
+    def _fallback_context(self, query: str) -> str:
+        with open(self.clinic_info_path, 'r') as f:
+            clinic_data = json.load(f)
+        
+        query_lower = query.lower()
+        if "insurance" in query_lower:
+            insurance = clinic_data.get("insurance_and_billing", {})
+            return f"Accepted Insurance: {', '.join(insurance.get('accepted_insurance', []))}"
+        elif "hour" in query_lower or "open" in query_lower:
+            hours = clinic_data.get("clinic_details", {}).get("hours", {})
+            return f"Clinic Hours: {format_hours(hours)}"
+        elif "location" in query_lower or "address" in query_lower:
+            details = clinic_data.get("clinic_details", {})
+            return f"Location: {details.get('address', '')}. Phone: {details.get('phone', '')}"
+        
+        return "For detailed information, please call our office at +1-555-123-4567."
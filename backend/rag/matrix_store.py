@@ -0,0 +1,160 @@
+import json
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.storage.invalidation import get_invalidation_channel
+from backend.storage.locking import atomic_write_bytes
+
+
+INVALIDATION_TOPIC = "faq_index"
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma ``where`` filters the retriever uses."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _normalize(embeddings: List[List[float]]) -> np.ndarray:
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class MatrixVectorStore:
+    """FAQ vectors in a ``.npy`` matrix shared by all workers through mmap.
+
+    Every save writes a new ``vectors-<id>.npy``/``documents-<id>.json``
+    pair and then atomically replaces ``current.json``, which names the
+    pair, so a reader never sees vectors from one build and documents from
+    another. Every worker maps the same file read-only, so N workers share
+    one copy of the vectors in the page cache instead of each holding its
+    own. Writers publish on the invalidation channel and readers remap when
+    the generation changes. Distances are cosine distances, with the same
+    interface as ``VectorStore``.
+    """
+
+    def __init__(self, persist_directory: str = "./data/vectordb"):
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.pointer_path = self.persist_directory / "current.json"
+        self._channel = get_invalidation_channel()
+        self._generation = None
+        self._load()
+
+    def _paths(self, build_id: str) -> Tuple[Path, Path]:
+        return (self.persist_directory / f"vectors-{build_id}.npy",
+                self.persist_directory / f"documents-{build_id}.json")
+
+    def _load(self) -> None:
+        self._generation = self._channel.generation(INVALIDATION_TOPIC)
+        self.build_id: Optional[str] = None
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        payload: Dict[str, Any] = {}
+        try:
+            build_id = json.loads(self.pointer_path.read_bytes())["build_id"]
+            vectors_path, documents_path = self._paths(build_id)
+            vectors = np.load(vectors_path, mmap_mode="r")
+            with open(documents_path, 'r') as f:
+                payload = json.load(f)
+            self.build_id = build_id
+        except FileNotFoundError:
+            pass
+        if len(vectors) != len(payload.get("documents", [])):
+            # Treated as no index, so the next initialization rebuilds it
+            print(f"FAQ index {self.build_id} has {len(vectors)} vectors for "
+                  f"{len(payload.get('documents', []))} documents; ignoring it")
+            vectors, payload, self.build_id = np.zeros((0, 0), dtype=np.float32), {}, None
+        self.vectors = vectors
+        self.documents: List[str] = payload.get("documents", [])
+        self.metadatas: List[Dict[str, Any]] = payload.get("metadatas", [])
+        self.kb_version: Optional[str] = payload.get("kb_version")
+
+    def _refresh(self) -> None:
+        if self._channel.generation(INVALIDATION_TOPIC) != self._generation:
+            self._load()
+
+    def _save(self, vectors: np.ndarray, documents: List[str],
+              metadatas: List[Dict[str, Any]], kb_version: Optional[str]) -> None:
+        self._refresh()
+        previous_id = self.build_id
+        build_id = uuid.uuid4().hex[:12]
+        vectors_path, documents_path = self._paths(build_id)
+        tmp_vectors = self.persist_directory / f"vectors-{build_id}.tmp.npy"
+        np.save(tmp_vectors, vectors)
+        tmp_vectors.replace(vectors_path)
+        atomic_write_bytes(documents_path, json.dumps({
+            "documents": documents,
+            "metadatas": metadatas,
+            "kb_version": kb_version
+        }).encode())
+        # The pair becomes visible in one rename
+        atomic_write_bytes(self.pointer_path, json.dumps({"build_id": build_id}).encode())
+        self._channel.publish(INVALIDATION_TOPIC)
+        self._load()
+        self._remove_old_builds(keep={build_id, previous_id})
+
+    def _remove_old_builds(self, keep: Set[Optional[str]]) -> None:
+        # The previous build is kept for readers that read the old pointer just before the swap
+        for pattern in ("vectors-*.npy", "documents-*.json"):
+            for path in self.persist_directory.glob(pattern):
+                if path.stem.split("-", 1)[1].removesuffix(".tmp") not in keep:
+                    path.unlink(missing_ok=True)
+
+    def rebuild(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                embeddings: List[List[float]], version: str) -> None:
+        """Replace the whole index with one save, so readers never see it empty."""
+        self._save(_normalize(embeddings), list(texts), list(metadatas), version)
+
+    def add_documents(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                      embeddings: List[List[float]]) -> None:
+        new_vectors = _normalize(embeddings)
+        vectors = new_vectors if self.count() == 0 else np.vstack([self.vectors, new_vectors])
+        self._save(vectors, self.documents + list(texts), self.metadatas + list(metadatas), self.kb_version)
+
+    def query(self, query_embedding: List[float], n_results: int = 3,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._refresh()
+        if self.count() == 0:
+            return {"documents": [], "metadatas": [], "distances": []}
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        similarities = self.vectors @ (query / norm if norm else query)
+
+        candidates = [i for i, metadata in enumerate(self.metadatas) if matches_where(metadata, where)]
+        candidates.sort(key=lambda i: similarities[i], reverse=True)
+        top = candidates[:n_results]
+
+        return {
+            "documents": [self.documents[i] for i in top],
+            "metadatas": [self.metadatas[i] for i in top],
+            "distances": [float(1.0 - similarities[i]) for i in top]
+        }
+
+    def clear(self) -> None:
+        self._save(np.zeros((0, 0), dtype=np.float32), [], [], None)
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self.documents)
+
+    def get_version(self) -> Optional[str]:
+        self._refresh()
+        return self.kb_version
+
+    def set_version(self, version: str) -> None:
+        self._save(np.asarray(self.vectors), self.documents, self.metadatas, version)
@@ -0,0 +1,54 @@
+import re
+from typing import List, Dict, Any, Set
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "do", "does", "for", "how", "i",
+    "if", "in", "is", "it", "me", "my", "of", "on", "or", "the", "there", "to",
+    "what", "when", "where", "which", "with", "you", "your", "we", "our", "have"
+}
+
+
+def content_terms(text: str) -> Set[str]:
+    # Five-character prefixes act as a crude stemmer ("parking" ~ "parked")
+    return {token[:5] for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS}
+
+
+def rerank(query: str, results: Dict[str, Any], max_k: int = 3,
+           score_gap: float = 0.08, lexical_weight: float = 0.3) -> List[Dict[str, Any]]:
+    """Rescore vector-store candidates and keep the ones close to the best match.
+
+    The score blends vector similarity (derived from the store's distance)
+    with the fraction of query terms found in the document. Candidates are
+    kept in score order until the drop from the previous candidate exceeds
+    ``score_gap`` or ``max_k`` documents have been kept.
+    """
+    documents = results.get("documents") or []
+    metadatas = results.get("metadatas") or [{} for _ in documents]
+    distances = results.get("distances") or [None for _ in documents]
+
+    query_terms = content_terms(query)
+    candidates = []
+    for document, metadata, distance in zip(documents, metadatas, distances):
+        similarity = 1.0 / (1.0 + distance) if distance is not None else 0.0
+        lexical = (
+            len(query_terms & content_terms(document)) / len(query_terms) if query_terms else 0.0
+        )
+        candidates.append({
+            "document": document,
+            "metadata": metadata,
+            "score": (1 - lexical_weight) * similarity + lexical_weight * lexical
+        })
+
+    candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+
+    selected: List[Dict[str, Any]] = []
+    for candidate in candidates:
+        if len(selected) >= max_k:
+            break
+        if selected and selected[-1]["score"] - candidate["score"] > score_gap:
+            break
+        selected.append(candidate)
+    return selected
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+import itertools
+import os
+import time
+
+import numpy as np
+
+
+class SemanticCache:
+    """Caches final answers to standalone FAQ turns keyed by query embedding.
+
+    A cached answer is served when a new query's embedding has cosine
+    similarity of at least ``similarity_threshold`` with a stored one and
+    both were produced against the same knowledge-base version. Entries
+    expire after ``ttl_seconds`` and the least recently used entry is
+    evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, similarity_threshold: Optional[float] = None,
+                 ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self.similarity_threshold = similarity_threshold if similarity_threshold is not None else float(
+            os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600")
+        )
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512")
+        )
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items()
+                   if now - entry["created_at"] >= self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, embedding: List[float], kb_version: str) -> Optional[str]:
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        query = self._normalize(embedding)
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in self._entries.items():
+            if entry["kb_version"] != kb_version or entry["vector"].shape != query.shape:
+                continue
+            score = float(np.dot(entry["vector"], query))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key]["answer"]
+
+    def store(self, embedding: List[float], answer: str, kb_version: str) -> None:
+        self._entries[next(self._ids)] = {
+            "vector": self._normalize(embedding),
+            "answer": answer,
+            "kb_version": kb_version,
+            "created_at": time.monotonic()
+        }
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,5 +1,3 @@
-import chromadb
-from chromadb.config import Settings
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 import uuid
@@ -10,6 +8,9 @@ class VectorStore:
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         
+        import chromadb
+        from chromadb.config import Settings
+        
         self.client = chromadb.PersistentClient(
             path=str(self.persist_directory),
             settings=Settings(anonymized_telemetry=False)
@@ -31,11 +32,16 @@ class VectorStore:
             ids=ids
         )
     
-    def query(self, query_embedding: List[float], n_results: int = 3) -> Dict[str, Any]:
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+    def query(self, query_embedding: List[float], n_results: int = 3,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        query_args: Dict[str, Any] = {
+            "query_embeddings": [query_embedding],
+            "n_results": n_results
+        }
+        if where:
+            query_args["where"] = where
+        
+        results = self.collection.query(**query_args)
         
         return {
             "documents": results["documents"][0] if results["documents"] else [],
@@ -50,5 +56,21 @@ class VectorStore:
             metadata={"description": "Clinic FAQ and information"}
         )
     
+    def rebuild(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                embeddings: List[List[float]], version: str) -> None:
+        if self.count():
+            self.clear()
+        self.add_documents(texts, metadatas, embeddings)
+        self.set_version(version)
+    
     def count(self) -> int:
         return self.collection.count()
+    
+    def get_version(self) -> Optional[str]:
+        return (self.collection.metadata or {}).get("kb_version")
+    
+    def set_version(self, version: str) -> None:
+        self.collection.modify(metadata={
+            "description": "Clinic FAQ and information",
+            "kb_version": version
+        })
@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from backend.storage.locking import FileLock, atomic_write_bytes
+from backend.utils.metrics import STORAGE_LATENCY
+from backend.utils.tracing import span
+
+
+# Receives the appointments already stored for the booking's date and returns
+# True when the new booking would overlap one of them
+ConflictCheck = Callable[[List[Dict[str, Any]]], bool]
+
+
+class JsonAppointmentStore:
+    """Appointments in one JSON file, safe for several worker processes.
+
+    Bookings re-read the file, check for conflicts and write it back while
+    holding an exclusive file lock, and the write is an atomic rename, so
+    concurrent workers can neither double-book nor see a partial file.
+    """
+
+    def __init__(self, path: str = "data/appointments.json"):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+        self._cache: Optional[Tuple[Any, List[Dict[str, Any]]]] = None
+        self._timers = {op: STORAGE_LATENCY.labels("json", op) for op in ("load", "book")}
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        # Atomic writes replace the inode, so this changes even within one mtime tick
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def version(self) -> Any:
+        return self._signature()
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        with self._timers["load"].time(), span("storage.load", backend="json"):
+            signature = self._signature()
+            if signature is None:
+                return []
+            if self._cache is not None and self._cache[0] == signature:
+                return list(self._cache[1])
+
+            with open(self.path, 'r') as f:
+                appointments = json.load(f)
+            self._cache = (signature, appointments)
+            return list(appointments)
+
+    def _write(self, appointments: List[Dict[str, Any]]) -> None:
+        atomic_write_bytes(self.path, json.dumps(appointments, indent=2).encode())
+        self._cache = None
+
+    def append(self, appointment: Dict[str, Any]) -> None:
+        with FileLock(self.lock_path):
+            self._cache = None
+            appointments = self.load_all()
+            appointments.append(appointment)
+            self._write(appointments)
+
+    def book_if_free(self, appointment: Dict[str, Any], conflicts: ConflictCheck) -> bool:
+        with self._timers["book"].time(), span("storage.book", backend="json"):
+            with FileLock(self.lock_path):
+                self._cache = None
+                appointments = self.load_all()
+                on_date = [appt for appt in appointments if appt['date'] == appointment['date']]
+                if conflicts(on_date):
+                    return False
+                appointments.append(appointment)
+                self._write(appointments)
+                return True
+
+
+class SqliteAppointmentStore:
+    """Appointments in SQLite with a single writer at a time.
+
+    ``BEGIN IMMEDIATE`` takes SQLite's write lock before the conflict check,
+    so the check and the insert are atomic across processes. WAL mode lets
+    readers in other workers proceed while a booking is written.
+
+    When ``import_from`` names a JSON appointment file, its bookings are
+    copied in the first time the database is opened, so switching an
+    existing deployment to SQLite keeps the appointments already taken.
+    """
+
+    def __init__(self, path: str = "data/appointments.db", import_from: Optional[str] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._timers = {op: STORAGE_LATENCY.labels("sqlite", op) for op in ("load", "book")}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS appointments ("
+                "booking_id TEXT PRIMARY KEY, date TEXT NOT NULL, record TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        if import_from:
+            self._import_json(Path(import_from))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def version(self) -> Any:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        with self._timers["load"].time(), span("storage.load", backend="sqlite"):
+            rows = self._connect().execute("SELECT record FROM appointments ORDER BY rowid").fetchall()
+            return [json.loads(row[0]) for row in rows]
+
+    def _insert(self, conn: sqlite3.Connection, appointment: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT INTO appointments (booking_id, date, record) VALUES (?, ?, ?)",
+            (appointment['booking_id'], appointment['date'], json.dumps(appointment))
+        )
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    def _import_json(self, json_path: Path) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+            if done is None:
+                appointments = JsonAppointmentStore(str(json_path)).load_all()
+                for appointment in appointments:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO appointments (booking_id, date, record) VALUES (?, ?, ?)",
+                        (appointment['booking_id'], appointment['date'], json.dumps(appointment))
+                    )
+                if appointments:
+                    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+                    print(f"Imported {len(appointments)} appointments from {json_path} into {self.path}")
+                conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', 1)")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def append(self, appointment: Dict[str, Any]) -> None:
+        self.book_if_free(appointment, lambda on_date: False)
+
+    def book_if_free(self, appointment: Dict[str, Any], conflicts: ConflictCheck) -> bool:
+        with self._timers["book"].time(), span("storage.book", backend="sqlite"):
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT record FROM appointments WHERE date = ?", (appointment['date'],)
+                ).fetchall()
+                if conflicts([json.loads(row[0]) for row in rows]):
+                    conn.execute("ROLLBACK")
+                    return False
+                self._insert(conn, appointment)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return True
+
+
+_store = None
+
+
+def get_appointment_store():
+    """Store selected by ``APPOINTMENT_STORE`` (``json`` or ``sqlite``)."""
+    global _store
+    if _store is None:
+        backend = os.getenv("APPOINTMENT_STORE", "json").lower()
+        if backend == "sqlite":
+            _store = SqliteAppointmentStore(
+                os.getenv("APPOINTMENT_DB_PATH", "data/appointments.db"),
+                import_from=os.getenv("APPOINTMENTS_PATH", "data/appointments.json"),
+            )
+        else:
+            _store = JsonAppointmentStore(os.getenv("APPOINTMENTS_PATH", "data/appointments.json"))
+    return _store
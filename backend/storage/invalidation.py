@@ -0,0 +1,43 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+from backend.storage.locking import FileLock, atomic_write_bytes
+
+
+class InvalidationChannel:
+    """Cross-worker cache invalidation through per-topic generation counters.
+
+    Writers call ``publish(topic)`` after changing shared state; readers keep
+    the generation they built a cache from and rebuild when
+    ``generation(topic)`` differs. A read is one small file read, so it is
+    cheap enough to do on every request.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or os.getenv("INVALIDATION_DIR", "data/.generations"))
+
+    def _path(self, topic: str) -> Path:
+        return self.directory / topic
+
+    def generation(self, topic: str) -> int:
+        try:
+            return int(self._path(topic).read_bytes() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def publish(self, topic: str) -> int:
+        with FileLock(self.directory / f"{topic}.lock"):
+            generation = self.generation(topic) + 1
+            atomic_write_bytes(self._path(topic), str(generation).encode())
+        return generation
+
+
+_channel = None
+
+
+def get_invalidation_channel() -> InvalidationChannel:
+    global _channel
+    if _channel is None:
+        _channel = InvalidationChannel()
+    return _channel
@@ -1,16 +1,44 @@
 from langchain_core.tools import StructuredTool
-from typing import Dict, Any
-import httpx
+from typing import Dict, Any, List
+from backend.tools.http_client import get_http_client
+from backend.utils.single_flight import SingleFlight
 import json
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 
 
+# Chats opening at the same time often ask for the same date and type
+availability_flight = SingleFlight("availability")
+
+
 class AvailabilityInput(BaseModel):
     date: str = Field(description="Date in YYYY-MM-DD format")
     appointment_type: str = Field(default="consultation", description="One of 'consultation', 'followup', 'physical', 'specialist'")
 
 
+def _free_start_times(data: Dict[str, Any]) -> List[str]:
+    if "slots" in data:
+        # Compact format: one '1'/'0' per slot start, spaced `step` minutes from `start_minute`
+        start, step = data["start_minute"], data["step"]
+        return [
+            f"{(start + i * step) // 60:02d}:{(start + i * step) % 60:02d}"
+            for i, bit in enumerate(data["slots"]) if bit == "1"
+        ]
+    return [
+        slot["start_time"] for slot in data.get("available_slots", [])
+        if slot.get("available", False)
+    ]
+
+
+async def _fetch_availability(date: str, appointment_type: str) -> Any:
+    client = get_http_client()
+    return await client.get(
+        "/api/calendly/availability",
+        params={"date": date, "appointment_type": appointment_type, "format": "compact"},
+        timeout=10.0
+    )
+
+
 async def check_availability(date: str, appointment_type: str = "consultation") -> str:
     try:
         if not date:
@@ -25,42 +53,34 @@ async def check_availability(date: str, appointment_type: str = "consultation")
                 "suggestion": "Please specify a date. Here are some upcoming dates: " + ", ".join(suggested_dates)
             })
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "http://localhost:8000/api/calendly/availability",
-                params={"date": date, "appointment_type": appointment_type},
-                timeout=10.0
-            )
+        date, appointment_type = date.strip(), appointment_type.strip().lower()
+        response = await availability_flight.do(
+            (date, appointment_type), lambda: _fetch_availability(date, appointment_type)
+        )
+        
+        if response.status_code == 200:
+            available_slots = _free_start_times(response.json())
             
-            if response.status_code == 200:
-                data = response.json()
-                available_slots = [
-                    slot for slot in data.get("available_slots", []) 
-                    if slot.get("available", False)
-                ]
-                
-                if not available_slots:
-                    return json.dumps({
-                        "date": date,
-                        "available": False,
-                        "message": f"No available slots on {date}. Consider checking nearby dates."
-                    })
-                
-                slots_list = [slot["start_time"] for slot in available_slots[:10]]
-                
+            if not available_slots:
                 return json.dumps({
                     "date": date,
-                    "available": True,
-                    "appointment_type": appointment_type,
-                    "available_slots": slots_list,
-                    "total_available": len(available_slots)
-                })
-            else:
-                return json.dumps({
-                    "error": "Failed to fetch availability",
-                    "status_code": response.status_code,
-                    "details": response.text
+                    "available": False,
+                    "message": f"No available slots on {date}. Consider checking nearby dates."
                 })
+            
+            return json.dumps({
+                "date": date,
+                "available": True,
+                "appointment_type": appointment_type,
+                "available_slots": available_slots[:10],
+                "total_available": len(available_slots)
+            })
+        else:
+            return json.dumps({
+                "error": "Failed to fetch availability",
+                "status_code": response.status_code,
+                "details": response.text
+            })
     
     except Exception as e:
         return json.dumps({
@@ -1,6 +1,6 @@
 from langchain_core.tools import StructuredTool
 from typing import Dict, Any
-import httpx
+from backend.tools.http_client import get_http_client
 import json
 from pydantic import BaseModel, Field
 
@@ -37,30 +37,30 @@ async def book_appointment(
             "reason": reason
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "http://localhost:8000/api/calendly/book",
-                json=payload,
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return json.dumps({
-                    "success": True,
-                    "booking_id": data.get("booking_id"),
-                    "confirmation_code": data.get("confirmation_code"),
-                    "status": data.get("status"),
-                    "details": data.get("details"),
-                    "message": data.get("message")
-                })
-            else:
-                error_detail = response.json().get("detail", "Unknown error") if response.text else "Unknown error"
-                return json.dumps({
-                    "success": False,
-                    "error": error_detail,
-                    "status_code": response.status_code
-                })
+        client = get_http_client()
+        response = await client.post(
+            "/api/calendly/book",
+            json=payload,
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return json.dumps({
+                "success": True,
+                "booking_id": data.get("booking_id"),
+                "confirmation_code": data.get("confirmation_code"),
+                "status": data.get("status"),
+                "details": data.get("details"),
+                "message": data.get("message")
+            })
+        else:
+            error_detail = response.json().get("detail", "Unknown error") if response.text else "Unknown error"
+            return json.dumps({
+                "success": False,
+                "error": error_detail,
+                "status_code": response.status_code
+            })
     
     except Exception as e:
         return json.dumps({
@@ -0,0 +1,44 @@
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+
+from backend.utils.tracing import trace_headers
+
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _propagate_trace(request: httpx.Request) -> None:
+    # The calendly routes join the calling chat turn's trace
+    request.headers.update(trace_headers())
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client for the scheduling tools so connections are pooled.
+
+    A client is bound to the event loop it was created on; a new one is
+    created if called from a different loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            # Read here rather than at import, after main.py has loaded .env
+            base_url=os.getenv("CALENDLY_API_BASE_URL", "http://localhost:8000"), timeout=10.0,
+            # Loopback responses aren't worth compressing and decompressing
+            headers={"Accept-Encoding": "identity"},
+            event_hooks={"request": [_propagate_trace]}
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+from backend.utils.metrics import Counter, Histogram, GaugeCallback
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away instead of queued."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, int(self.retry_after + 0.999)))}
+
+
+# Idle clients' buckets are evicted least-recently-used beyond this many
+MAX_CLIENT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        if self.rate <= 0:
+            return 60.0
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class AdmissionController:
+    """Bounds concurrent agent turns with a semaphore and a bounded wait queue.
+
+    A request is admitted straight away while fewer than ``max_concurrency``
+    turns are running. Otherwise it waits in a queue of at most
+    ``max_queue`` requests, and only if the expected wait (queue position
+    times the recent average turn time) fits in ``max_wait_seconds``; the
+    wait itself is also capped by that deadline. Everything else fails fast
+    with 503 and a ``Retry-After`` hint, so a spike degrades into quick
+    rejections instead of every request timing out together. Per-client
+    token buckets return 429 before a client can occupy the queue.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, max_queue: Optional[int] = None,
+                 max_wait_seconds: Optional[float] = None, client_rate: Optional[float] = None,
+                 client_burst: Optional[float] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("CHAT_MAX_QUEUE", "32"))
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else float(
+            os.getenv("CHAT_MAX_QUEUE_WAIT_SECONDS", "10"))
+        self.client_rate = client_rate if client_rate is not None else float(
+            os.getenv("CHAT_CLIENT_RATE_PER_MINUTE", "30")) / 60
+        self.client_burst = client_burst if client_burst is not None else float(
+            os.getenv("CHAT_CLIENT_BURST", "10"))
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queue_seen = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "deadline": 0, "client_rate": 0}
+        self._wait_times = deque(maxlen=1024)
+        self._service_times = deque(maxlen=128)
+
+    def _bucket(self, client_id: str) -> TokenBucket:
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            # Dropping only the longest-idle bucket, so new IDs can't reset active clients' limits
+            if len(self._buckets) >= MAX_CLIENT_BUCKETS:
+                self._buckets.popitem(last=False)
+            bucket = TokenBucket(self.client_rate, self.client_burst)
+            self._buckets[client_id] = bucket
+        else:
+            self._buckets.move_to_end(client_id)
+        return bucket
+
+    def _average_service_time(self) -> float:
+        if not self._service_times:
+            return 1.0
+        return sum(self._service_times) / len(self._service_times)
+
+    def expected_wait(self) -> float:
+        return (self.queued + 1) * self._average_service_time() / self.max_concurrency
+
+    def _reject(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    async def _acquire(self, client_id: str) -> float:
+        bucket = self._bucket(client_id)
+        if not bucket.try_take():
+            raise self._reject(429, "client_rate", bucket.seconds_until_token())
+
+        started = time.monotonic()
+        if self.in_flight < self.max_concurrency and self.queued == 0:
+            await self._semaphore.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                raise self._reject(503, "queue_full", self.expected_wait())
+            if self.expected_wait() > self.max_wait_seconds:
+                raise self._reject(503, "deadline", self.expected_wait())
+
+            self.queued += 1
+            self.max_queue_seen = max(self.max_queue_seen, self.queued)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                raise self._reject(503, "deadline", self._average_service_time())
+            finally:
+                self.queued -= 1
+
+        waited = time.monotonic() - started
+        self._wait_times.append(waited)
+        ADMISSION_WAIT.observe(waited)
+        self.in_flight += 1
+        self.admitted += 1
+        return waited
+
+    @asynccontextmanager
+    async def admit(self, client_id: str):
+        """Hold one concurrency slot for the duration of the block."""
+        await self._acquire(client_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_times.append(time.monotonic() - started)
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queue_seen,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 1) if waits else 0.0
+            },
+            "avg_service_ms": round(self._average_service_time() * 1000, 1)
+        }
+
+
+_controller = None
+
+ADMISSION_REJECTIONS = Counter("chat_admission_rejections", "Chat requests shed by reason", ("reason",))
+ADMISSION_WAIT = Histogram("chat_admission_wait_seconds", "Time chat requests spent queued for a slot")
+GaugeCallback("chat_in_flight", "Chat requests currently being processed",
+              lambda: _controller.in_flight if _controller else None)
+GaugeCallback("chat_queue_depth", "Chat requests waiting for a slot",
+              lambda: _controller.queued if _controller else None)
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
@@ -0,0 +1,165 @@
+import asyncio
+import gzip
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from backend.utils.http_cache import accepted_encodings, brotli
+from backend.utils.metrics import Counter, Histogram
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/javascript", "application/xml", "image/svg+xml", "text/"
+)
+# Bodies this large are compressed off the event loop so other requests keep moving
+THREAD_OFFLOAD_BYTES = 256 * 1024
+
+COMPRESSION_DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+BODY_SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144, 1048576)
+
+
+def _compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    """Available encoders, keyed by content coding, at the configured levels."""
+    gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    compressors = {"gzip": lambda data: gzip.compress(data, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        brotli_quality = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+        compressors["br"] = lambda data: brotli.compress(data, quality=brotli_quality)
+    if zstandard is not None:
+        zstd_level = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+        compressors["zstd"] = lambda data: zstandard.ZstdCompressor(level=zstd_level).compress(data)
+    return compressors
+
+
+class CompressionMiddleware:
+    """Compresses complete response bodies above ``COMPRESSION_MIN_BYTES``.
+
+    The encoding is the first entry of ``COMPRESSION_ENCODINGS`` that the
+    client accepts and that is installed (``br`` needs brotli, ``zstd``
+    needs zstandard). Streamed bodies, small bodies, range responses,
+    already-encoded responses (such as precompressed assets) and non-text
+    content types pass through unchanged, and each bypass is counted by reason.
+    """
+
+    def __init__(self, app: Any, minimum_size: Optional[int] = None, encodings: Optional[List[str]] = None):
+        self.app = app
+        self.minimum_size = (
+            minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+        )
+        if encodings is None:
+            encodings = os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",")
+        compressors = _compressors()
+        self.compressors: List[Tuple[str, Callable[[bytes], bytes]]] = [
+            (name.strip(), compressors[name.strip()]) for name in encodings if name.strip() in compressors
+        ]
+
+    def _choose(self, scope: Dict[str, Any]) -> Optional[Tuple[str, Callable[[bytes], bytes]]]:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        for name, compress in self.compressors:
+            if name in accepted:
+                return name, compress
+        return None
+
+    def _skip_reason(self, start: Dict[str, Any], body: bytes) -> Optional[str]:
+        headers = Headers(raw=start.get("headers", []))
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return "status"
+        if start["status"] == 206 or "content-range" in headers:
+            # The range offsets refer to the identity body
+            return "range"
+        if "content-encoding" in headers:
+            return "encoded"
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return "content_type"
+        if len(body) < self.minimum_size:
+            return "too_small"
+        return None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self.compressors:
+            await self.app(scope, receive, send)
+            return
+
+        start: Dict[str, Any] = {}
+        passthrough = False
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the body is complete
+                start.update(message)
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                COMPRESSION_SKIPPED.labels("streamed").inc()
+                await send(start)
+                await send(message)
+                return
+
+            RESPONSE_BODY_SIZE.observe(len(body))
+            reason = self._skip_reason(start, body)
+            chosen = self._choose(scope) if reason is None else None
+            if chosen is None:
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                if reason is None:
+                    # Eligible, but this client accepts none of our encodings
+                    reason = "not_accepted"
+                    headers.add_vary_header("Accept-Encoding")
+                    start["headers"] = headers.raw
+                COMPRESSION_SKIPPED.labels(reason).inc()
+                await send(start)
+                await send(message)
+                return
+
+            encoding, compress = chosen
+            started = time.perf_counter()
+            if len(body) >= THREAD_OFFLOAD_BYTES:
+                compressed = await asyncio.to_thread(compress, body)
+            else:
+                compressed = compress(body)
+            COMPRESSION_DURATION.labels(encoding).observe(time.perf_counter() - started)
+            COMPRESSION_INPUT_BYTES.labels(encoding).inc(len(body))
+            COMPRESSION_OUTPUT_BYTES.labels(encoding).inc(len(compressed))
+
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ from the identity body, so the tag can only be weak
+                headers["ETag"] = f"W/{etag}"
+            start["headers"] = headers.raw
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+        if start and not passthrough:
+            # A response with no body message still needs its start sent
+            await send(start)
+
+
+COMPRESSION_INPUT_BYTES = Counter(
+    "http_compression_input_bytes", "Response bytes before compression", ("encoding",))
+COMPRESSION_OUTPUT_BYTES = Counter(
+    "http_compression_output_bytes", "Response bytes after compression", ("encoding",))
+COMPRESSION_DURATION = Histogram(
+    "http_compression_duration_seconds", "Time spent compressing one response body", ("encoding",),
+    buckets=COMPRESSION_DURATION_BUCKETS)
+COMPRESSION_SKIPPED = Counter(
+    "http_compression_skipped", "Responses sent uncompressed by reason", ("reason",))
+RESPONSE_BODY_SIZE = Histogram(
+    "http_response_body_bytes", "Size of complete response bodies seen by the compression middleware",
+    buckets=BODY_SIZE_BUCKETS)
@@ -2,17 +2,31 @@ import os
 import sys
 
 
+SUPPORTED_PROVIDERS = ("google", "fake")
+
+
 def validate_environment():
-    """Validate required environment variables for Gemini API are set."""
-    required_vars = {
-        "GOOGLE_API_KEY": "Google API key for Gemini",
-        "LLM_PROVIDER": "LLM provider (should be 'google')",
-        "LLM_MODEL": "LLM model name (should be 'gemini-2.5-flash' or similar)"
-    }
+    """Validate required environment variables for the selected LLM provider are set."""
+    provider = os.getenv("LLM_PROVIDER", "google").lower()
     
     missing_vars = []
     warnings = []
     
+    if provider not in SUPPORTED_PROVIDERS:
+        print(f"ERROR: LLM_PROVIDER '{provider}' is not supported "
+              f"(expected one of: {', '.join(SUPPORTED_PROVIDERS)})", file=sys.stderr)
+        return False
+    
+    if provider == "fake":
+        # The offline fake needs no credentials
+        required_vars = {}
+        warnings.append("  - LLM_PROVIDER is 'fake'; responses are scripted, not generated by Gemini.")
+    else:
+        required_vars = {
+            "GOOGLE_API_KEY": "Google API key for Gemini",
+            "LLM_MODEL": "LLM model name (should be 'gemini-2.5-flash' or similar)"
+        }
+    
     for var, description in required_vars.items():
         value = os.getenv(var)
         if not value:
@@ -0,0 +1,16 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered by orjson, for payloads built from plain dicts.
+
+    Skips FastAPI's ``jsonable_encoder`` pass and response-model validation,
+    so only use it for data the route produced itself.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
@@ -0,0 +1,87 @@
+import mimetypes
+import os
+from typing import Any, Dict, Optional, Set
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+# Vite content-hashes asset file names, so a name never changes content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Clients may keep the body but must check the ETag before reusing it
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    """Content codings the client accepts, ignoring any listed with ``q=0``."""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+
+
+def not_modified(request: Optional[Request], etag: str) -> Optional[Response]:
+    """A 304 response if the client already holds ``etag``, otherwise None."""
+    if request is None or not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Static files with immutable caching and build-time ``.br``/``.gz`` variants.
+
+    When the client accepts brotli or gzip and ``build.sh`` produced the
+    matching sibling file, that file is sent with ``Content-Encoding`` set,
+    so nothing is compressed per request.
+    """
+
+    def file_response(self, full_path: Any, stat_result: os.stat_result, scope: Any,
+                      status_code: int = 200) -> Response:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        response = None
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+            variant = f"{full_path}{suffix}"
+            if encoding in accepted and os.path.isfile(variant):
+                response = super().file_response(variant, os.stat(variant), scope, status_code)
+                response.headers["Content-Encoding"] = encoding
+                media_type = mimetypes.guess_type(str(full_path))[0]
+                if media_type:
+                    if media_type.startswith("text/"):
+                        media_type += "; charset=utf-8"
+                    response.headers["Content-Type"] = media_type
+                break
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
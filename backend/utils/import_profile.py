@@ -0,0 +1,87 @@
+import argparse
+import json
+import subprocess
+import sys
+from typing import List, Dict, Any
+
+
+def run_importtime(module: str) -> List[Dict[str, Any]]:
+    """Import ``module`` in a fresh interpreter under ``-X importtime``.
+
+    Returns one record per imported module with self and cumulative time in
+    microseconds and its nesting depth, in the order Python reported them.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        records.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us)
+        })
+    return records
+
+
+def summarize(records: List[Dict[str, Any]], module: str, top: int = 15) -> Dict[str, Any]:
+    total_us = next((r["cumulative_us"] for r in records if r["module"] == module), 0)
+
+    by_package: Dict[str, int] = {}
+    for record in records:
+        package = record["module"].split(".")[0]
+        by_package[package] = by_package.get(package, 0) + record["self_us"]
+
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "top_packages": [
+            {"package": package, "self_ms": round(us / 1000, 1)}
+            for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        "top_modules": [
+            {"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)}
+            for r in sorted(records, key=lambda r: r["cumulative_us"], reverse=True)[:top]
+        ]
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Report the -X importtime breakdown of a module")
+    parser.add_argument("module", nargs="?", default="backend.main")
+    parser.add_argument("--top", type=int, default=15, help="Number of entries per table")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Exit with status 1 when the total import time exceeds this")
+    args = parser.parse_args()
+
+    summary = summarize(run_importtime(args.module), args.module, args.top)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"Import time for {args.module}: {summary['total_ms']} ms\n")
+        print("Self time by top-level package:")
+        for entry in summary["top_packages"]:
+            print(f"  {entry['self_ms']:>9.1f} ms  {entry['package']}")
+        print("\nSlowest modules (cumulative):")
+        for entry in summary["top_modules"]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+    if args.budget_ms is not None and summary["total_ms"] > args.budget_ms:
+        print(f"\nOver budget: {summary['total_ms']} ms > {args.budget_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import time
+from bisect import bisect_left
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+TOKEN_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+
+def _escape_label_value(value: str) -> str:
+    # Backslash first, so the escapes added for quotes and newlines are kept
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        REGISTRY.register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """Child for these label values; callers on hot paths can keep the child."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def children(self) -> Dict[Tuple[str, ...], Any]:
+        """Children recorded so far, keyed by label values."""
+        return dict(self._children)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter. Increments are plain attribute updates, no locks.
+
+    Updates happen on the event loop thread, so nothing else writes at the
+    same time. A rare lost increment from a worker thread is acceptable
+    for metrics.
+    """
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def collect(self) -> List[str]:
+        name = f"{self.name}_total"
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} counter"]
+        for values, child in self._children.items():
+            lines.append(f"{name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                le_label = 'le="' + le + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le_label)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class GaugeCallback(_Metric):
+    """Gauge read from a callback at scrape time, for state that is tracked elsewhere."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Optional[float]]):
+        self.callback = callback
+        super().__init__(name, documentation)
+
+    def labels(self, *values: Any) -> Any:
+        raise TypeError(f"{self.name} is read from its callback and has no labelled children")
+
+    def collect(self) -> List[str]:
+        value = self.callback()
+        if value is None:
+            return []
+        return self._header() + [f"{self.name} {_format_value(value)}"]
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template.
+
+    Plain ASGI instead of ``BaseHTTPMiddleware`` so each request costs one
+    timer and one histogram observation. The route comes from the matched
+    Starlette route, which keeps label cardinality bounded.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status[0]
+            ).observe(time.perf_counter() - started)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_duration_seconds", "LLM call latency by position within the chat turn", ("call",))
+LLM_TOKENS = Counter(
+    "llm_tokens", "LLM tokens by call position and kind (input, output, cache_read)", ("call", "kind"))
+TURN_PROMPT_TOKENS = Histogram(
+    "agent_turn_prompt_tokens", "Prompt tokens sent across all LLM calls of one chat turn", buckets=TOKEN_BUCKETS)
+TOOL_LATENCY = Histogram("tool_duration_seconds", "Agent tool execution latency", ("tool",))
+TOOL_CALLS = Counter("tool_calls", "Agent tool calls", ("tool",))
+EMBEDDING_LATENCY = Histogram("embedding_duration_seconds", "Embedding API call latency per batch")
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size", "Texts per embedding API call", buckets=SIZE_BUCKETS)
+VECTOR_QUERY_LATENCY = Histogram(
+    "vector_query_duration_seconds", "Vector store query latency", ("backend",))
+STORAGE_LATENCY = Histogram(
+    "appointment_storage_duration_seconds", "Appointment store latency", ("backend", "operation"))
+LLM_PATH_DECISIONS = Counter(
+    "agent_llm_path_decisions", "Whether availability was pre-injected for a one-call turn, and why", ("preinject", "reason"))
+AGENT_TURN_LATENCY = Histogram(
+    "agent_turn_duration_seconds", "LLM chat turn latency by path and number of LLM calls", ("path",))
+FAQ_ROUTING = Counter("faq_routing_decisions", "Intent router decisions", ("route", "reason"))
+CACHE_LOOKUPS = Counter("cache_lookups", "Cache lookups by cache and result", ("cache", "result"))
+ERRORS = Counter("errors", "Handled errors by stage and exception class", ("stage", "error"))
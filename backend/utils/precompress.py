@@ -0,0 +1,42 @@
+"""Writes ``.gz`` and ``.br`` siblings next to built frontend assets.
+
+Run by ``build.sh`` after the frontend build so ``/assets`` can serve
+compressed files without compressing per request:
+
+    python -m backend.utils.precompress frontend/dist/assets
+"""
+import gzip
+import sys
+from pathlib import Path
+
+from backend.utils.http_cache import brotli
+
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml"}
+MIN_BYTES = 1024
+
+
+def precompress(directory: str) -> int:
+    written = 0
+    for path in sorted(Path(directory).rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        if len(data) < MIN_BYTES:
+            continue
+
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            # Incompressible files are served as-is
+            if len(compressed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(compressed)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "frontend/dist/assets"
+    if brotli is None:
+        print("brotli is not installed; writing gzip variants only")
+    print(f"Wrote {precompress(target)} precompressed files in {target}")
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILED_PREFIXES = ("/api/chat", "/api/calendly/")
+
+_NAME_PATTERN = re.compile(r"[0-9]{8}T[0-9]{9}-[a-z0-9_-]+-[0-9a-f]{8}\.collapsed")
+
+
+def admin_token() -> str:
+    return os.getenv("ADMIN_TOKEN", "")
+
+
+def is_admin_token(candidate: Optional[str]) -> bool:
+    token = admin_token()
+    return bool(token) and candidate is not None and secrets.compare_digest(candidate, token)
+
+
+def _frame_name(frame: Any) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_qualname}"
+
+
+class StackSampler:
+    """Samples one asyncio task's stack from a background thread.
+
+    Every ``interval`` seconds the sampler reads the event loop thread's
+    current frame and keeps it only while the profiled task is the one
+    running, so other requests sharing the loop don't pollute the profile.
+    Stacks are counted in collapsed form (``root;...;leaf``), the input
+    format of flamegraph.pl and speedscope, and cut at ``root_frame`` so the
+    server and middleware frames shared by every sample are left out.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: Optional[asyncio.Task],
+                 interval: float, root_frame: Any = None, max_depth: int = 128):
+        self.loop = loop
+        self.task = task
+        self.root_frame = root_frame
+        self.interval = interval
+        self.max_depth = max_depth
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.task is not None and asyncio.current_task(self.loop) is not self.task:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and frame is not self.root_frame and len(names) < self.max_depth:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Collapsed-stack profiles on disk, keeping only the newest ``max_profiles``."""
+
+    def __init__(self, directory: Optional[str] = None, max_profiles: Optional[int] = None):
+        self.directory = Path(directory or os.getenv("PROFILE_DIR", "data/profiles"))
+        self.max_profiles = max_profiles or int(os.getenv("PROFILE_MAX_FILES", "50"))
+        self._lock = threading.Lock()
+
+    def save(self, method: str, path: str, duration_ms: float, sampler: StackSampler) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "_", f"{method}{path}".lower()).strip("_")[:60]
+        now = time.time()
+        # Millisecond timestamps keep names in save order for eviction and listing
+        stamp = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}"
+        name = f"{stamp}-{slug}-{os.urandom(4).hex()}.collapsed"
+        header = (
+            f"# {method} {path} duration_ms={duration_ms:.1f} samples={sampler.samples} "
+            f"interval_ms={sampler.interval * 1000:g}\n"
+        )
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / name).write_text(header + sampler.collapsed())
+            for old in self._files()[self.max_profiles:]:
+                old.unlink(missing_ok=True)
+        return name
+
+    def _files(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        files = [p for p in self.directory.iterdir() if _NAME_PATTERN.fullmatch(p.name)]
+        return sorted(files, key=lambda p: p.name, reverse=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        profiles = []
+        for path in self._files():
+            with open(path) as f:
+                header = f.readline().lstrip("# ").strip()
+            profiles.append({"name": path.name, "request": header, "size_bytes": path.stat().st_size})
+        return profiles
+
+    def path_for(self, name: str) -> Optional[Path]:
+        # Names are validated, so a download can't escape the profile directory
+        if not _NAME_PATTERN.fullmatch(name):
+            return None
+        path = self.directory / name
+        return path if path.exists() else None
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        _store = ProfileStore()
+    return _store
+
+
+class ProfilingMiddleware:
+    """Profiles single ``/api/chat`` and ``/api/calendly/*`` requests on demand.
+
+    A request is profiled when it carries ``X-Profile-Token`` matching
+    ``ADMIN_TOKEN``, or when picked at ``PROFILE_SAMPLE_RATE``. Sampled
+    profiles are only kept if the request took at least
+    ``PROFILE_MIN_DURATION_MS``, so the ring fills with slow requests.
+    Everything else passes straight through.
+    """
+
+    def __init__(self, app: Any, sample_rate: Optional[float] = None,
+                 interval_ms: Optional[float] = None, min_duration_ms: Optional[float] = None):
+        self.app = app
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.interval = (interval_ms or float(os.getenv("PROFILE_INTERVAL_MS", "5"))) / 1000
+        self.min_duration_ms = (
+            min_duration_ms if min_duration_ms is not None
+            else float(os.getenv("PROFILE_MIN_DURATION_MS", "0"))
+        )
+
+    def _requested_by_admin(self, scope: Dict[str, Any]) -> bool:
+        header = PROFILE_HEADER.lower().encode()
+        for key, value in scope.get("headers", []):
+            if key.lower() == header:
+                return is_admin_token(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(PROFILED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        forced = self._requested_by_admin(scope)
+        if not forced and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(
+            asyncio.get_running_loop(), asyncio.current_task(), self.interval, root_frame=sys._getframe()
+        )
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+            if forced or duration_ms >= self.min_duration_ms:
+                name = await asyncio.to_thread(
+                    get_profile_store().save, scope["method"], scope["path"], duration_ms, sampler
+                )
+                print(f"Saved request profile {name} ({sampler.samples} samples, {duration_ms:.0f}ms)")
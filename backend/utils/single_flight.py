@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from backend.utils.metrics import Counter
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive key for free-text inputs."""
+    return " ".join(text.lower().split())
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight call.
+
+    The first caller for a key starts ``fn`` as a task, and callers that
+    arrive before it finishes await that task instead of repeating the
+    work. Nothing is kept after it finishes, so unlike a cache this only
+    absorbs stampedes of identical cold requests. The task is shielded, so
+    a cancelled caller doesn't cancel the work the others are waiting on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._leaders = SINGLE_FLIGHT_CALLS.labels(name, "leader")
+        self._shared = SINGLE_FLIGHT_CALLS.labels(name, "shared")
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        # Tasks from an event loop that has since closed can't be awaited here
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self._shared.inc()
+            return await asyncio.shield(task)
+
+        self._leaders.inc()
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Leader and shared call counts per flight name, across all instances."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for (name, result), child in SINGLE_FLIGHT_CALLS.children().items():
+        stats.setdefault(name, {"leader": 0, "shared": 0})[result] = int(child.value)
+    for counts in stats.values():
+        total = counts["leader"] + counts["shared"]
+        counts["dedup_ratio"] = round(counts["shared"] / total, 3) if total else 0.0
+    return stats
+
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls", "Coalesced calls by flight; shared callers reused another's result", ("flight", "result"))
@@ -0,0 +1,285 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from backend.utils.profiling import is_admin_token
+
+
+TRACE_HEADER = "X-Trace-Id"
+PARENT_SPAN_HEADER = "X-Parent-Span-Id"
+ADMIN_HEADER = "X-Admin-Token"
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+# Incoming IDs end up in files and responses, so only plain hex IDs are accepted
+_ID_PATTERN = re.compile(r"[0-9a-f]{8,32}")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(num_bytes: int) -> str:
+    return os.urandom(num_bytes).hex()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes",
+                 "start", "duration_ms", "error", "_collected", "_started")
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any], collected: List["Span"]):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._collected = collected
+        self._started = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        self._collected.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class RingBufferExporter:
+    """Keeps the most recent traces in memory for the debug endpoint.
+
+    Spans are grouped by trace ID, so the loopback calendly request made by a
+    tool lands in the same trace as the chat turn that issued it.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or int(os.getenv("TRACE_BUFFER_SIZE", "100"))
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for span_data in spans:
+                trace_id = span_data["trace_id"]
+                self._traces.setdefault(trace_id, []).append(span_data)
+                self._traces.move_to_end(trace_id)
+            while len(self._traces) > self.capacity:
+                self._traces.popitem(last=False)
+
+    def get_trace(self, trace_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return sorted(spans, key=lambda s: s["start"]) if spans else None
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._traces.items())[-limit:]
+        summaries = []
+        for trace_id, spans in reversed(items):
+            roots = [s for s in spans if s["parent_id"] is None] or spans
+            root = min(roots, key=lambda s: s["start"])
+            summaries.append({
+                "trace_id": trace_id,
+                "name": root["name"],
+                "start": root["start"],
+                "duration_ms": root["duration_ms"],
+                "span_count": len(spans),
+                "error": any(s["error"] for s in spans)
+            })
+        return summaries
+
+
+class JsonlExporter:
+    """Appends one JSON line per span, for offline analysis with jq or pandas."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("TRACE_JSONL_PATH", "data/traces.jsonl"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(span_data) + "\n" for span_data in spans)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+
+EXPORTERS = {
+    "memory": RingBufferExporter,
+    "jsonl": JsonlExporter
+}
+
+
+class Tracer:
+    """Samples requests and hands finished traces to the configured exporters.
+
+    Unsampled requests never create spans: ``span()`` sees no current span and
+    returns immediately, so tracing costs one context variable lookup per
+    instrumented stage.
+    """
+
+    def __init__(self, sample_rate: Optional[float] = None, exporters: Optional[List[Any]] = None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+        if exporters is None:
+            names = os.getenv("TRACE_EXPORTERS", "memory")
+            exporters = [EXPORTERS[name.strip()]() for name in names.split(",") if name.strip()]
+        self.exporters = exporters
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def ring_buffer(self) -> Optional[RingBufferExporter]:
+        for exporter in self.exporters:
+            if isinstance(exporter, RingBufferExporter):
+                return exporter
+        return None
+
+    @contextmanager
+    def start_trace(self, name: str, trace_id: Optional[str] = None,
+                    parent_id: Optional[str] = None, **attributes: Any):
+        collected: List[Span] = []
+        root = Span(trace_id or _new_id(16), name, parent_id, attributes, collected)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            self._export([s.to_dict() for s in collected])
+
+    def _export(self, spans: List[Dict[str, Any]]) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                print(f"Trace export failed ({type(exporter).__name__}): {e}")
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Child span of the current one; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace_id, name, parent.span_id, attributes, parent._collected)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers that continue the current trace in a downstream HTTP call."""
+    current = _current_span.get()
+    if current is None:
+        return {}
+    return {TRACE_HEADER: current.trace_id, PARENT_SPAN_HEADER: current.span_id}
+
+
+def _header_id(headers: List[Any], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            candidate = value.decode("latin-1").strip().lower()
+            return candidate if _ID_PATTERN.fullmatch(candidate) else None
+    return None
+
+
+def _may_force_trace(scope: Dict[str, Any], parent_id: Optional[str]) -> bool:
+    client = scope.get("client")
+    if parent_id is not None and client and client[0] in LOOPBACK_HOSTS:
+        return True
+    header = ADMIN_HEADER.lower().encode()
+    for key, value in scope.get("headers", []):
+        if key.lower() == header:
+            return is_admin_token(value.decode("latin-1"))
+    return False
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span for sampled HTTP requests.
+
+    A request carrying ``X-Trace-Id`` continues that trace when it comes
+    from a loopback address with ``X-Parent-Span-Id`` (the tools' calendly
+    calls) or carries ``X-Admin-Token``; other requests, including ones
+    with an untrusted trace ID, are sampled at ``TRACE_SAMPLE_RATE``.
+    Sampled responses echo the trace ID.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracer = get_tracer()
+        headers = scope.get("headers", [])
+        trace_id = _header_id(headers, TRACE_HEADER.lower().encode())
+        parent_id = _header_id(headers, PARENT_SPAN_HEADER.lower().encode()) if trace_id else None
+        if trace_id is not None and not _may_force_trace(scope, parent_id):
+            # Otherwise any client could bypass the sample rate
+            trace_id = parent_id = None
+        if trace_id is None and not tracer.should_sample():
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.start_trace(f"{scope['method']} {scope['path']}", trace_id, parent_id) as root:
+            async def send_wrapper(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    root.set_attribute("status", message["status"])
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (TRACE_HEADER.lower().encode(), root.trace_id.encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"{scope['method']} {route.path}"
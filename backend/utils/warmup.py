@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from backend.utils.single_flight import SingleFlight
+
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class ReadinessTracker:
+    """Per-component warm state reported by ``/api/ready``.
+
+    Failed components are retried by ``retry_failed``, at most once every
+    ``WARMUP_RETRY_SECONDS``, so a transient startup failure doesn't keep
+    the worker unready for the life of the process.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.steps: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self.requires: Dict[str, str] = {}
+        self.last_attempt = 0.0
+        # Concurrent health checks share one retry pass
+        self._retries = SingleFlight("readiness_retry")
+
+    def register(self, name: str, step: Optional[Callable[[], Awaitable[Any]]] = None,
+                 requires: Optional[str] = None) -> None:
+        self.components[name] = {"status": PENDING}
+        if step is not None:
+            self.steps[name] = step
+        if requires is not None:
+            self.requires[name] = requires
+
+    def set(self, name: str, status: str, duration_ms: Optional[float] = None,
+            error: Optional[str] = None) -> None:
+        state: Dict[str, Any] = {"status": status}
+        if duration_ms is not None:
+            state["duration_ms"] = round(duration_ms, 1)
+        if error is not None:
+            state["error"] = error
+        self.components[name] = state
+
+    def is_ready(self) -> bool:
+        return bool(self.components) and all(
+            state["status"] in (READY, SKIPPED) for state in self.components.values()
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "components": {name: dict(state) for name, state in self.components.items()}
+        }
+
+    async def retry_failed(self) -> None:
+        """Re-run failed steps in registration order once the retry interval has passed."""
+        retry_seconds = float(os.getenv("WARMUP_RETRY_SECONDS", "15"))
+        if time.monotonic() - self.last_attempt < retry_seconds:
+            return
+        await self._retries.do("failed", self._retry_failed_steps)
+
+    async def _retry_failed_steps(self) -> None:
+        for name, state in list(self.components.items()):
+            if state["status"] != FAILED or name not in self.steps:
+                continue
+            required = self.requires.get(name)
+            if required and self.components.get(required, {}).get("status") != READY:
+                continue
+            await _warm_component(name, self.steps[name])
+
+
+readiness = ReadinessTracker()
+
+
+async def _warm_component(name: str, step: Callable[[], Awaitable[Any]]) -> bool:
+    readiness.last_attempt = time.monotonic()
+    readiness.set(name, WARMING)
+    started = time.perf_counter()
+    try:
+        await step()
+    except Exception as e:
+        readiness.set(name, FAILED, (time.perf_counter() - started) * 1000, str(e))
+        print(f"Warmup of {name} failed: {e}")
+        return False
+    readiness.set(name, READY, (time.perf_counter() - started) * 1000)
+    return True
+
+
+async def _warm_schedule() -> None:
+    from backend.api.calendly_integration import get_booked_appointments_for_date, load_doctor_schedule
+
+    load_doctor_schedule()
+    get_booked_appointments_for_date("")
+
+
+async def _warm_agent() -> None:
+    from backend.api.chat import get_agent
+
+    await asyncio.to_thread(get_agent)
+
+
+async def _warm_faq_index() -> None:
+    from backend.api.chat import get_agent
+
+    faq_retrieval = get_agent()._get_faq_retrieval()
+    await asyncio.to_thread(faq_retrieval._ensure_initialized)
+
+
+async def _warm_http_client() -> None:
+    from backend.tools.http_client import get_http_client
+
+    get_http_client()
+
+
+async def _warm_prompt(prompt: str) -> None:
+    from backend.api.chat import get_agent
+
+    result = await get_agent().process_message(user_message=prompt)
+    if result["metadata"].get("error"):
+        raise RuntimeError(result["metadata"]["error"])
+
+
+async def warm_up() -> Dict[str, Any]:
+    """Build everything the first chat request would otherwise build lazily.
+
+    ``WARMUP_AGENT=false`` skips the agent and FAQ index for workers that only
+    serve the calendar API; ``WARMUP_PROMPT`` optionally runs one synthetic
+    chat turn. Failures are recorded rather than raised so the API can still
+    start and report what is not ready, and ``/api/ready`` retries them.
+    """
+    warm_agent = os.getenv("WARMUP_AGENT", "true").lower() == "true"
+    warmup_prompt = os.getenv("WARMUP_PROMPT", "")
+
+    readiness.register("schedule", _warm_schedule)
+    readiness.register("http_client", _warm_http_client)
+    readiness.register("agent", _warm_agent)
+    readiness.register("faq_index", _warm_faq_index, requires="agent")
+    readiness.register("warmup_prompt", lambda: _warm_prompt(warmup_prompt), requires="faq_index")
+
+    await _warm_component("schedule", readiness.steps["schedule"])
+    await _warm_component("http_client", readiness.steps["http_client"])
+
+    if not warm_agent:
+        for name in ("agent", "faq_index", "warmup_prompt"):
+            readiness.set(name, SKIPPED)
+        return readiness.snapshot()
+
+    if await _warm_component("agent", readiness.steps["agent"]):
+        await _warm_component("faq_index", readiness.steps["faq_index"])
+    else:
+        readiness.set("faq_index", FAILED, error="agent unavailable")
+
+    if warmup_prompt:
+        await _warm_component("warmup_prompt", readiness.steps["warmup_prompt"])
+    else:
+        readiness.set("warmup_prompt", SKIPPED)
+
+    return readiness.snapshot()
@@ -0,0 +1,440 @@
+"""End-to-end load test for the chat and calendar APIs.
+
+Starts the backend in a subprocess with the offline fake LLM and embedder
+(``LLM_PROVIDER=fake``) against a throwaway data directory, then drives
+booking conversations, FAQ questions and direct calendar sessions at
+increasing concurrency. For each level it reports throughput, p50/p95/p99
+latency per stage and error/rejection rates. Afterwards it checks that no
+two stored appointments overlap.
+
+    python -m benchmarks.loadtest --levels 1,8,32 --sessions 60
+    python -m benchmarks.loadtest --url http://localhost:8000   # existing server
+
+Results are written as JSON (``benchmarks/results/`` by default) so runs can
+be compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FAQ_QUESTIONS = [
+    "What insurance do you accept?",
+    "Where is the clinic located and is there parking?",
+    "What are your hours on Saturday?",
+    "What should I bring to my first appointment?",
+    "What is your cancellation policy?",
+    "Do you accept Medicare, and what are your hours?",
+    "How early should I arrive before my visit?",
+    "Do I need to wear a mask because of covid?"
+]
+APPOINTMENT_TYPES = ["consultation", "followup", "physical", "specialist"]
+FIRST_NAMES = ["Jane", "John", "Maria", "Wei", "Amir", "Priya", "Lucas", "Emma"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Chen", "Khan", "Patel", "Silva", "Brown"]
+SLOT_PATTERN = re.compile(r"\b\d{2}:\d{2}\b")
+
+DEFAULT_MIX = {"booking": 0.5, "faq": 0.3, "calendar": 0.2}
+# Lets each virtual user have its own rate-limit bucket although all share one IP;
+# a remote target must be started with the same CHAT_CLIENT_KEY
+CLIENT_KEY = os.getenv("CHAT_CLIENT_KEY", "loadtest-client-key")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def find_double_bookings(appointments: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """Pairs of booking ids (or times) whose intervals overlap on the same date."""
+    by_date: Dict[str, List[Dict[str, Any]]] = {}
+    for appt in appointments:
+        if appt.get("status", "confirmed") != "cancelled":
+            by_date.setdefault(appt["date"], []).append(appt)
+
+    overlaps = []
+    for appts in by_date.values():
+        appts.sort(key=lambda a: _minutes(a["start_time"]))
+        for previous, current in zip(appts, appts[1:]):
+            if _minutes(current["start_time"]) < _minutes(previous["end_time"]):
+                overlaps.append((
+                    previous.get("booking_id", previous["start_time"]),
+                    current.get("booking_id", current["start_time"])
+                ))
+    return overlaps
+
+
+def upcoming_weekdays(count: int, start: Optional[date] = None) -> List[str]:
+    day = (start or date.today()) + timedelta(days=1)
+    dates = []
+    while len(dates) < count:
+        if day.weekday() < 5:
+            dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
+
+
+class StageRecorder:
+    """Latency samples and outcomes per stage (one stage per request kind)."""
+
+    OUTCOMES = ("ok", "conflict", "rejected", "error")
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, stage: str, seconds: float, outcome: str) -> None:
+        self.samples.setdefault(stage, []).append(seconds)
+        counts = self.outcomes.setdefault(stage, {name: 0 for name in self.OUTCOMES})
+        counts[outcome] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        stages = {}
+        for stage, samples in sorted(self.samples.items()):
+            counts = self.outcomes[stage]
+            stages[stage] = {
+                **percentiles(samples),
+                "outcomes": counts,
+                "error_rate": round(counts["error"] / len(samples), 4),
+                "rejection_rate": round(counts["rejected"] / len(samples), 4)
+            }
+        return stages
+
+    def total_requests(self) -> int:
+        return sum(len(samples) for samples in self.samples.values())
+
+
+class LoadSession:
+    def __init__(self, client: httpx.AsyncClient, recorder: StageRecorder, rng: random.Random,
+                 user_id: int, dates: List[str]):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.user_id = user_id
+        self.dates = dates
+        self.confirmed: List[str] = []
+
+    def _patient(self) -> Dict[str, str]:
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        return {
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{self.user_id}@example.com",
+            "phone": f"555-{self.rng.randint(200, 999)}-{self.rng.randint(1000, 9999)}"
+        }
+
+    async def _chat(self, stage: str, message: str,
+                    history: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(
+                "/api/chat",
+                json={"message": message, "conversation_history": history},
+                headers={"X-Client-ID": f"loadtest-{self.user_id}", "X-Client-Key": CLIENT_KEY}
+            )
+        except httpx.HTTPError:
+            self.recorder.record(stage, time.perf_counter() - started, "error")
+            return "error", None
+        elapsed = time.perf_counter() - started
+
+        if response.status_code in (429, 503):
+            outcome, body = "rejected", None
+        elif response.status_code != 200:
+            outcome, body = "error", None
+        else:
+            body = response.json()
+            if (body.get("metadata") or {}).get("error"):
+                outcome = "error"
+            elif "no longer available" in body["response"].lower():
+                # A lost race for a slot is correct behaviour, not an error
+                outcome = "conflict"
+            else:
+                outcome = "ok"
+        self.recorder.record(stage, elapsed, outcome)
+        return outcome, body
+
+    async def booking_conversation(self) -> None:
+        booking_date = self.rng.choice(self.dates)
+        appointment_type = self.rng.choice(APPOINTMENT_TYPES)
+        outcome, body = await self._chat(
+            "chat_availability", f"Do you have any openings on {booking_date} for a {appointment_type}?", []
+        )
+        if outcome != "ok":
+            return
+        slots = SLOT_PATTERN.findall(body["response"])
+        if not slots:
+            return
+
+        # Pick among the first few slots so concurrent sessions contend for them
+        patient = self._patient()
+        outcome, body = await self._chat(
+            "chat_booking",
+            f"I'll take {self.rng.choice(slots[:3])}. My name is {patient['name']}, "
+            f"{patient['email']}, {patient['phone']}. Reason for visit: routine {appointment_type}.",
+            body["conversation_history"]
+        )
+        if outcome == "ok" and "confirmation code" in body["response"].lower():
+            self.confirmed.append(body["response"].rsplit(" ", 1)[-1].strip("."))
+
+    async def faq_conversation(self) -> None:
+        await self._chat("chat_faq", self.rng.choice(FAQ_QUESTIONS), [])
+
+    async def calendar_session(self) -> None:
+        booking_date = self.rng.choice(self.dates)
+        appointment_type = self.rng.choice(APPOINTMENT_TYPES)
+
+        started = time.perf_counter()
+        response = await self.client.get(
+            "/api/calendly/availability",
+            params={"date": booking_date, "appointment_type": appointment_type}
+        )
+        ok = response.status_code == 200
+        self.recorder.record("calendly_availability", time.perf_counter() - started, "ok" if ok else "error")
+        if not ok:
+            return
+        free = [slot["start_time"] for slot in response.json()["available_slots"] if slot["available"]]
+        if not free:
+            return
+
+        started = time.perf_counter()
+        response = await self.client.post("/api/calendly/book", json={
+            "appointment_type": appointment_type,
+            "date": booking_date,
+            "start_time": self.rng.choice(free[:3]),
+            "patient": self._patient(),
+            "reason": f"Routine {appointment_type} visit"
+        })
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            self.confirmed.append(response.json()["confirmation_code"])
+            self.recorder.record("calendly_book", elapsed, "ok")
+        elif response.status_code == 409:
+            self.recorder.record("calendly_book", elapsed, "conflict")
+        else:
+            self.recorder.record("calendly_book", elapsed, "error")
+
+
+async def run_level(base_url: str, concurrency: int, sessions: int, mix: Dict[str, float],
+                    dates: List[str], seed: int) -> Dict[str, Any]:
+    recorder = StageRecorder()
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=sessions)
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, kind in enumerate(kinds):
+        queue.put_nowait((i, kind))
+    confirmed: List[str] = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        async def worker(worker_id: int) -> None:
+            while not queue.empty():
+                session_id, kind = queue.get_nowait()
+                session = LoadSession(client, recorder, random.Random(seed * 100003 + session_id),
+                                      session_id, dates)
+                await getattr(session, {
+                    "booking": "booking_conversation",
+                    "faq": "faq_conversation",
+                    "calendar": "calendar_session"
+                }[kind])()
+                confirmed.extend(session.confirmed)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "duration_s": round(elapsed, 3),
+        "sessions_per_s": round(sessions / elapsed, 2),
+        "requests_per_s": round(recorder.total_requests() / elapsed, 2),
+        "confirmed_bookings": len(confirmed),
+        "stages": recorder.summary()
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """The backend in a subprocess, with fake providers and a temporary data directory."""
+
+    def __init__(self, workers: int = 1, store: str = "json", llm_latency_ms: float = 50,
+                 extra_env: Optional[Dict[str, str]] = None):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        self.data_dir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+        self.env = {
+            **os.environ,
+            "LLM_PROVIDER": "fake",
+            "FAKE_LLM_LATENCY_MS": str(llm_latency_ms),
+            "CALENDLY_API_BASE_URL": self.url,
+            "APPOINTMENT_STORE": store,
+            "APPOINTMENTS_PATH": str(self.data_dir / "appointments.json"),
+            "APPOINTMENT_DB_PATH": str(self.data_dir / "appointments.db"),
+            "VECTOR_DB": "matrix",
+            "VECTOR_DB_PATH": str(self.data_dir / "vectordb"),
+            "INVALIDATION_DIR": str(self.data_dir / "generations"),
+            "CHAT_CLIENT_KEY": CLIENT_KEY,
+            **(extra_env or {})
+        }
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "LocalServer":
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=ROOT, env=self.env
+        )
+        deadline = time.monotonic() + 90
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                if httpx.get(f"{self.url}/api/ready", timeout=2).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.__exit__(None, None, None)
+        raise RuntimeError("Server did not become ready within 90s")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def check_bookings(base_url: str, confirmed: int) -> Dict[str, Any]:
+    appointments = httpx.get(f"{base_url}/api/calendly/appointments", timeout=30).json()["appointments"]
+    stored = [appt for appt in appointments if "booking_id" in appt]
+    overlaps = find_double_bookings(appointments)
+    return {
+        "stored_bookings": len(stored),
+        "confirmed_bookings": confirmed,
+        "double_bookings": len(overlaps),
+        "overlapping_pairs": overlaps[:20],
+        "passed": not overlaps and len(stored) >= confirmed
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for level in report["levels"]:
+        print(f"\nconcurrency={level['concurrency']}  {level['sessions_per_s']} sessions/s  "
+              f"{level['requests_per_s']} req/s  ({level['duration_s']}s)")
+        print(f"  {'stage':<22}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'err%':>8}{'rej%':>8}")
+        for stage, stats in level["stages"].items():
+            print(f"  {stage:<22}{stats['count']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+                  f"{stats['p99_ms']:>10}{stats['error_rate'] * 100:>8.1f}{stats['rejection_rate'] * 100:>8.1f}")
+    correctness = report["booking_correctness"]
+    print(f"\nBookings: {correctness['confirmed_bookings']} confirmed, "
+          f"{correctness['stored_bookings']} stored, {correctness['double_bookings']} double-booked "
+          f"-> {'PASS' if correctness['passed'] else 'FAIL'}")
+
+
+async def run(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {kind: float(weight) for kind, weight in (part.split("=") for part in args.mix.split(","))}
+    dates = upcoming_weekdays(args.days)
+
+    levels = []
+    for index, concurrency in enumerate(int(c) for c in args.levels.split(",")):
+        sessions = max(args.sessions, concurrency * 2)
+        levels.append(await run_level(base_url, concurrency, sessions, mix, dates, args.seed + index))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "target": args.url or "local",
+            "workers": args.workers,
+            "store": args.store,
+            "llm_latency_ms": args.llm_latency_ms,
+            "mix": mix
+        },
+        "levels": levels,
+        "booking_correctness": check_bookings(base_url, sum(level["confirmed_bookings"] for level in levels))
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test /api/chat and /api/calendly/* with a fake LLM")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--levels", default="1,4,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, default=40, help="Sessions per level (at least 2x concurrency)")
+    parser.add_argument("--mix", help="Session mix, e.g. booking=0.5,faq=0.3,calendar=0.2")
+    parser.add_argument("--days", type=int, default=10, help="Number of upcoming weekdays to book into")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers for the local server")
+    parser.add_argument("--store", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON output path (default: benchmarks/results/loadtest-<time>.json)")
+    args = parser.parse_args()
+
+    if args.url:
+        report = asyncio.run(run(args, args.url))
+    else:
+        with LocalServer(args.workers, args.store, args.llm_latency_ms) as server:
+            report = asyncio.run(run(args, server.url))
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print_report(report)
+    print(f"\nResults written to {output}")
+    return 0 if report["booking_correctness"]["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""Retrieval quality and latency benchmark for the FAQ knowledge base.
+
+Builds the index from ``data/clinic_info.json`` with a pluggable embedder
+and runs a labeled set of paraphrased patient questions
+(``benchmarks/rag_queries.json``). Each question lists the ``subcategory``
+metadata of the documents that answer it. For every backend it reports:
+
+- recall@1/3/5 and MRR@10
+- index build time (embedding and indexing, separately)
+- Python heap and on-disk size
+- per-query latency
+
+Backends:
+
+- ``chroma``, ``matrix``: raw nearest-neighbour search in each vector store
+- ``chroma+pipeline``, ``matrix+pipeline``: ``FAQRetrieval._search``, with the
+  category filter and reranker the app uses on top of the store
+- ``bm25``: lexical baseline, no embeddings
+
+    python -m benchmarks.rag_bench                      # offline fake embedder
+    python -m benchmarks.rag_bench --embedder google --embedding-cache benchmarks/results/embeddings.json
+    python -m benchmarks.rag_bench --embedder cached --embedding-cache benchmarks/results/embeddings.json
+
+``--embedding-cache`` stores every vector it computes, so one run against
+the real embedding API can be replayed offline with ``--embedder cached``.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_QUERIES = ROOT / "benchmarks" / "rag_queries.json"
+BACKENDS = ["chroma", "chroma+pipeline", "matrix", "matrix+pipeline", "bm25"]
+RECALL_AT = (1, 3, 5)
+RANK_DEPTH = 10
+
+
+class CachingEmbedder:
+    """Wraps an embedder and persists its vectors keyed by text and task.
+
+    With ``inner=None`` it only replays the cache and fails on a miss, so
+    benchmark runs stay offline and deterministic.
+    """
+
+    def __init__(self, inner: Any, cache_path: Optional[Path]):
+        self.inner = inner
+        self.cache_path = cache_path
+        self.cache: Dict[str, List[float]] = {}
+        if cache_path and cache_path.exists():
+            self.cache = json.loads(cache_path.read_text())
+        self.misses = 0
+
+    def _key(self, task: str, text: str) -> str:
+        return hashlib.sha1(f"{task}\0{text}".encode()).hexdigest()
+
+    def _embed(self, task: str, texts: List[str], compute: Optional[Callable]) -> List[List[float]]:
+        missing = [text for text in texts if self._key(task, text) not in self.cache]
+        if missing:
+            if compute is None:
+                raise KeyError(f"{len(missing)} texts are not in the embedding cache, e.g. {missing[0]!r}")
+            self.misses += len(missing)
+            for text, vector in zip(missing, compute(missing)):
+                self.cache[self._key(task, text)] = list(vector)
+        return [self.cache[self._key(task, text)] for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("document", texts, self.inner.embed_documents if self.inner else None)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("query", texts, self.inner._embed_queries if self.inner else None)
+
+    def save(self) -> None:
+        if self.cache_path and self.misses:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(self.cache))
+
+
+class BM25Index:
+    """Okapi BM25 over the same stopwords and prefix stemming as the reranker."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.term_counts: List[Counter] = []
+        self.document_frequency: Counter = Counter()
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        from backend.rag.reranker import TOKEN_PATTERN, STOPWORDS
+        return [token[:5] for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+    def add_documents(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        for text, metadata in zip(texts, metadatas):
+            counts = Counter(self.tokenize(text))
+            self.documents.append(text)
+            self.metadatas.append(metadata)
+            self.term_counts.append(counts)
+            self.document_frequency.update(counts.keys())
+        self.average_length = sum(sum(c.values()) for c in self.term_counts) / max(len(self.term_counts), 1)
+
+    def query(self, text: str, n_results: int) -> Dict[str, Any]:
+        total = len(self.documents)
+        scores = []
+        for index, counts in enumerate(self.term_counts):
+            length = sum(counts.values())
+            score = 0.0
+            for term in set(self.tokenize(text)):
+                frequency = counts.get(term, 0)
+                if not frequency:
+                    continue
+                df = self.document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                score += idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * (1 - self.b + self.b * length / self.average_length))
+            scores.append((score, index))
+        top = [index for score, index in sorted(scores, reverse=True)[:n_results]]
+        return {"documents": [self.documents[i] for i in top], "metadatas": [self.metadatas[i] for i in top]}
+
+
+def rank_metrics(rankings: List[List[str]], expected: List[List[str]]) -> Dict[str, float]:
+    """recall@k and MRR, where a query counts as answered by any expected subcategory."""
+    metrics: Dict[str, float] = {}
+    for k in RECALL_AT:
+        hits = sum(1 for ranked, wanted in zip(rankings, expected) if set(ranked[:k]) & set(wanted))
+        metrics[f"recall@{k}"] = round(hits / len(rankings), 4)
+    reciprocal = []
+    for ranked, wanted in zip(rankings, expected):
+        rank = next((i + 1 for i, sub in enumerate(ranked[:RANK_DEPTH]) if sub in wanted), None)
+        reciprocal.append(1 / rank if rank else 0.0)
+    metrics["mrr"] = round(sum(reciprocal) / len(reciprocal), 4)
+    return metrics
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 1),
+        "p95_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6, 1),
+        "mean_us": round(sum(ordered) / len(ordered) * 1e6, 1)
+    }
+
+
+def _directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _create_store(kind: str, directory: Path) -> Any:
+    if kind == "chroma":
+        from backend.rag.vector_store import VectorStore
+        return VectorStore(str(directory))
+    from backend.rag.matrix_store import MatrixVectorStore
+    return MatrixVectorStore(str(directory))
+
+
+def benchmark_backend(backend: str, documents: List[str], metadatas: List[Dict[str, Any]],
+                      document_vectors: List[List[float]], queries: List[Dict[str, Any]],
+                      query_vectors: List[List[float]], work_dir: Path, repeats: int) -> Dict[str, Any]:
+    from backend.rag.faq_rag import FAQRetrieval
+
+    store_kind, _, mode = backend.partition("+")
+    subcategory_of = {document: metadata["subcategory"] for document, metadata in zip(documents, metadatas)}
+    directory = work_dir / backend.replace("+", "_")
+
+    # Opening the store (and importing its client library) is not part of the build
+    index: Any = BM25Index() if store_kind == "bm25" else _create_store(store_kind, directory)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    if store_kind == "bm25":
+        index.add_documents(documents, metadatas)
+    else:
+        index.add_documents(documents, metadatas, document_vectors)
+    index_s = time.perf_counter() - started
+    heap_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    retrieval = None
+    if mode == "pipeline":
+        retrieval = FAQRetrieval()
+        retrieval.vector_store = index
+        retrieval._initialized = True
+
+    def search(query: str, vector: List[float]) -> List[str]:
+        if store_kind == "bm25":
+            return [m["subcategory"] for m in index.query(query, RANK_DEPTH)["metadatas"]]
+        if retrieval is not None:
+            return [subcategory_of[doc] for doc in retrieval._search(query, vector, max(RECALL_AT))]
+        return [m["subcategory"] for m in index.query(vector, n_results=RANK_DEPTH)["metadatas"]]
+
+    rankings = []
+    samples = []
+    for _ in range(repeats):
+        rankings = []
+        for item, vector in zip(queries, query_vectors):
+            started = time.perf_counter()
+            rankings.append(search(item["query"], vector))
+            samples.append(time.perf_counter() - started)
+
+    misses = [
+        {"query": item["query"], "expected": item["expected"], "got": ranked[:3]}
+        for item, ranked in zip(queries, rankings) if not set(ranked[:3]) & set(item["expected"])
+    ]
+    return {
+        "backend": backend,
+        **rank_metrics(rankings, [item["expected"] for item in queries]),
+        "index_build_s": round(index_s, 4),
+        "python_heap_bytes": heap_bytes,
+        "disk_bytes": _directory_bytes(directory) if directory.exists() else 0,
+        "query_latency": latency_summary(samples),
+        "misses_at_3": misses
+    }
+
+
+def create_embedder(kind: str, cache_path: Optional[Path]) -> CachingEmbedder:
+    if kind == "cached":
+        if not cache_path:
+            raise SystemExit("--embedder cached needs --embedding-cache")
+        return CachingEmbedder(None, cache_path)
+    os.environ["EMBEDDING_PROVIDER"] = kind
+    from backend.rag.embeddings import EmbeddingService
+    return CachingEmbedder(EmbeddingService(), cache_path)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from backend.rag.faq_rag import FAQRetrieval
+
+    queries = json.loads(Path(args.queries).read_text())
+    documents, metadatas = FAQRetrieval(args.clinic_info).load_documents()
+    embedder = create_embedder(args.embedder, Path(args.embedding_cache) if args.embedding_cache else None)
+
+    started = time.perf_counter()
+    document_vectors = embedder.embed_documents(documents)
+    embed_documents_s = time.perf_counter() - started
+
+    query_embed_samples = []
+    query_vectors = []
+    for item in queries:
+        started = time.perf_counter()
+        query_vectors.append(embedder.embed_queries([item["query"]])[0])
+        query_embed_samples.append(time.perf_counter() - started)
+    embedder.save()
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        os.environ["INVALIDATION_DIR"] = str(Path(tmp) / "generations")
+        results = [
+            benchmark_backend(backend, documents, metadatas, document_vectors, queries,
+                              query_vectors, Path(tmp), args.repeats)
+            for backend in args.backends.split(",")
+        ]
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "embedder": args.embedder,
+            "documents": len(documents),
+            "queries": len(queries),
+            "dimensions": len(document_vectors[0]) if document_vectors else 0,
+            "embed_documents_s": round(embed_documents_s, 4),
+            "embed_query_latency": latency_summary(query_embed_samples)
+        },
+        "backends": results
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    meta = report["meta"]
+    print(f"{meta['documents']} documents, {meta['queries']} queries, embedder={meta['embedder']} "
+          f"(docs embedded in {meta['embed_documents_s']}s, query embed p50 "
+          f"{meta['embed_query_latency']['p50_us']} us)\n")
+    print(f"{'backend':<18}{'R@1':>7}{'R@3':>7}{'R@5':>7}{'MRR':>7}{'build ms':>10}{'heap KB':>9}"
+          f"{'p50 us':>9}{'p95 us':>9}")
+    for result in report["backends"]:
+        print(f"{result['backend']:<18}{result['recall@1']:>7.2f}{result['recall@3']:>7.2f}"
+              f"{result['recall@5']:>7.2f}{result['mrr']:>7.2f}{result['index_build_s'] * 1000:>10.1f}"
+              f"{result['python_heap_bytes'] / 1024:>9.0f}{result['query_latency']['p50_us']:>9.0f}"
+              f"{result['query_latency']['p95_us']:>9.0f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark FAQ retrieval quality and latency per backend")
+    parser.add_argument("--embedder", default="fake", choices=["fake", "google", "cached"])
+    parser.add_argument("--embedding-cache", help="JSON file of cached vectors (read and extended)")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--queries", default=str(DEFAULT_QUERIES))
+    parser.add_argument("--clinic-info", default="data/clinic_info.json")
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the query set for latency")
+    parser.add_argument("--output", help="JSON output path")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    report = run(args)
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"rag-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print_report(report)
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
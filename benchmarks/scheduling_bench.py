@@ -0,0 +1,342 @@
+"""Micro-benchmarks for the scheduling core on synthetic calendars.
+
+Generates calendars of one or more years, one or more providers and a
+given booking density, loads them into the configured appointment store,
+and times:
+
+- single-day availability, with a warm index and with a cold one
+- 30-day range availability
+- booking conflict checks
+- booking writes
+- listing all appointments
+
+It also measures the memory the parsed appointments take per 10k records.
+
+    python -m benchmarks.scheduling_bench
+    python -m benchmarks.scheduling_bench --scenarios 1y-1p-0.5,5y-3p-0.8 --store sqlite
+    python -m benchmarks.scheduling_bench --save-baseline benchmarks/scheduling_baseline.json
+    python -m benchmarks.scheduling_bench --baseline benchmarks/scheduling_baseline.json --threshold 0.25
+
+With ``--baseline`` the run exits with status 1 when any median is more than
+``--threshold`` slower than the baseline.
+
+The engine keeps one calendar, so providers are modelled as extra
+appointments tagged with ``provider_id`` in that calendar. This is the
+load a multi-provider clinic would put on today's storage and conflict checks.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Awaitable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIO_DEFAULTS = "1y-1p-0.5,3y-1p-0.8,1y-5p-0.5"
+DURATIONS = {"consultation": 30, "followup": 15, "physical": 45, "specialist": 60}
+
+
+def parse_scenario(spec: str) -> Dict[str, Any]:
+    years, providers, density = spec.split("-")
+    return {"name": spec, "years": int(years.rstrip("y")), "providers": int(providers.rstrip("p")),
+            "density": float(density)}
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def generate_calendar(schedule: Dict[str, Any], years: int, providers: int, density: float,
+                      start: date, seed: int = 0) -> List[Dict[str, Any]]:
+    """Non-overlapping appointments per provider on every working day.
+
+    Walks each day's slot grid and, with probability ``density``, books an
+    appointment of a random type at the current slot.
+    """
+    rng = random.Random(seed)
+    interval = schedule["appointment_slot_interval"]
+    lunch_start = _minutes(schedule["lunch_break"]["start"])
+    lunch_end = _minutes(schedule["lunch_break"]["end"])
+    types = list(DURATIONS)
+
+    appointments = []
+    day = start
+    while day < start + timedelta(days=365 * years):
+        hours = schedule["working_hours"].get(day.strftime("%A").lower())
+        if hours:
+            for provider in range(providers):
+                current, end = _minutes(hours["start"]), _minutes(hours["end"])
+                while current + interval <= end:
+                    appointment_type = rng.choice(types)
+                    slot_end = current + DURATIONS[appointment_type]
+                    overlaps_lunch = not (slot_end <= lunch_start or current >= lunch_end)
+                    if rng.random() < density and slot_end <= end and not overlaps_lunch:
+                        appointments.append({
+                            "booking_id": f"SYN-{day:%Y%m%d}-{provider}-{current}",
+                            "provider_id": provider,
+                            "date": day.isoformat(),
+                            "start_time": _hhmm(current),
+                            "end_time": _hhmm(slot_end),
+                            "appointment_type": appointment_type,
+                            "patient_name": f"Patient {len(appointments)}",
+                            "patient_email": f"patient{len(appointments)}@example.com",
+                            "patient_phone": "555-123-4567",
+                            "reason": "Synthetic benchmark booking",
+                            "confirmation_code": "SYN000",
+                            "status": "confirmed",
+                            "booked_at": "2024-01-01T00:00:00"
+                        })
+                        current = slot_end
+                    else:
+                        current += interval
+        day += timedelta(days=1)
+    return appointments
+
+
+def summarize_timings(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "iterations": len(ordered),
+        "median_us": round(ordered[len(ordered) // 2] * 1e6, 1),
+        "p95_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6, 1),
+        "min_us": round(ordered[0] * 1e6, 1)
+    }
+
+
+async def measure(step: Callable[[int], Awaitable[Any]], iterations: int,
+                  before: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    samples = []
+    for i in range(iterations):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        await step(i)
+        samples.append(time.perf_counter() - started)
+    return summarize_timings(samples)
+
+
+def measure_memory_per_10k(path: Path, count: int) -> Dict[str, Any]:
+    """Bytes held by the parsed appointment list, scaled to 10k records."""
+    raw = path.read_bytes()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    appointments = json.loads(raw)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del appointments
+    return {
+        "file_bytes_per_10k": round(len(raw) * 10000 / max(count, 1)),
+        "parsed_bytes_per_10k": round(held * 10000 / max(count, 1))
+    }
+
+
+class SchedulingBench:
+    """Loads one synthetic calendar into a fresh store and times the engine against it."""
+
+    def __init__(self, scenario: Dict[str, Any], store: str, data_dir: Path, quick: bool = False):
+        self.scenario = scenario
+        self.store_kind = store
+        self.data_dir = data_dir
+        self.iterations = 20 if quick else 200
+        self.write_iterations = 5 if quick else 20
+
+    def _install(self, appointments: List[Dict[str, Any]]) -> None:
+        from backend.storage import appointment_store
+        from backend.api import calendly_integration
+
+        appointments_path = self.data_dir / f"{self.scenario['name']}.json"
+        appointments_path.write_text(json.dumps(appointments, indent=2))
+        os.environ["APPOINTMENTS_PATH"] = str(appointments_path)
+        os.environ["APPOINTMENT_DB_PATH"] = str(self.data_dir / f"{self.scenario['name']}.db")
+        os.environ["APPOINTMENT_STORE"] = self.store_kind
+        appointment_store._store = None
+        calendly_integration._appointment_index["key"] = None
+
+        # A fresh SQLite database imports the JSON calendar on first open
+        appointment_store.get_appointment_store()
+        self.appointments_path = appointments_path
+
+    def _invalidate(self) -> None:
+        from backend.api import calendly_integration
+        from backend.storage import appointment_store
+
+        calendly_integration._appointment_index["key"] = None
+        store = appointment_store.get_appointment_store()
+        if hasattr(store, "_cache"):
+            store._cache = None
+
+    async def run(self) -> Dict[str, Any]:
+        from backend.api import calendly_integration as engine
+        from backend.models.schemas import AppointmentType, BookingRequest, PatientInfo
+
+        schedule = engine.load_doctor_schedule()
+        start = date.today() + timedelta(days=1)
+        generated_at = time.perf_counter()
+        appointments = generate_calendar(schedule, self.scenario["years"], self.scenario["providers"],
+                                         self.scenario["density"], start)
+        generate_s = time.perf_counter() - generated_at
+        self._install(appointments)
+
+        rng = random.Random(1)
+        busy_dates = sorted({appt["date"] for appt in appointments}) or [start.isoformat()]
+        sample_dates = [rng.choice(busy_dates) for _ in range(self.iterations)]
+        consultation = AppointmentType("consultation")
+
+        results: Dict[str, Any] = {}
+        engine.availability_for_date(sample_dates[0], consultation)
+
+        async def availability(i: int) -> None:
+            engine.availability_for_date(sample_dates[i], consultation)
+
+        results["availability_day_warm"] = await measure(availability, self.iterations)
+        results["availability_day_cold"] = await measure(
+            availability, max(3, self.iterations // 20), before=self._invalidate
+        )
+
+        range_starts = [datetime.strptime(d, "%Y-%m-%d").date() for d in sample_dates]
+
+        async def availability_range(i: int) -> None:
+            for offset in range(30):
+                engine.availability_for_date((range_starts[i] + timedelta(days=offset)).isoformat(), consultation)
+
+        results["availability_range_30d"] = await measure(availability_range, max(3, self.iterations // 10))
+
+        by_date: Dict[str, List[Dict[str, Any]]] = {}
+        for appt in appointments:
+            by_date.setdefault(appt["date"], []).append(appt)
+
+        async def conflict_check(i: int) -> None:
+            booked = by_date.get(sample_dates[i], [])
+            for minute in range(8 * 60, 18 * 60, 15):
+                engine.is_slot_booked(sample_dates[i], _hhmm(minute), _hhmm(minute + 30), booked)
+
+        results["conflict_check_day"] = await measure(conflict_check, self.iterations)
+
+        # Far enough out that the synthetic calendar never occupies these slots
+        free_day = start + timedelta(days=365 * self.scenario["years"] + 1)
+        while free_day.weekday() >= 5:
+            free_day += timedelta(days=1)
+
+        async def book(i: int) -> None:
+            day = free_day + timedelta(days=7 * (i // 16))
+            await engine.book_appointment(BookingRequest(
+                appointment_type=AppointmentType("followup"),
+                date=day.isoformat(),
+                start_time=_hhmm(8 * 60 + 15 * (i % 16)),
+                patient=PatientInfo(name="Bench Patient", email="bench@example.com", phone="555-123-4567"),
+                reason="Benchmark booking"
+            ))
+
+        results["book"] = await measure(book, self.write_iterations)
+
+        async def list_appointments(i: int) -> None:
+            await engine.get_all_appointments()
+
+        results["list_appointments"] = await measure(
+            list_appointments, max(3, self.iterations // 20), before=self._invalidate
+        )
+
+        return {
+            "scenario": self.scenario,
+            "store": self.store_kind,
+            "appointments": len(appointments),
+            "generate_s": round(generate_s, 3),
+            "memory": measure_memory_per_10k(self.appointments_path, len(appointments)),
+            "timings": results
+        }
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+                        min_delta_us: float = 20.0) -> List[Dict[str, Any]]:
+    """Benchmarks whose median got slower than ``threshold`` (relative) and ``min_delta_us``."""
+    previous = {
+        (run["scenario"]["name"], run["store"], name): timing["median_us"]
+        for run in baseline.get("runs", []) for name, timing in run["timings"].items()
+    }
+    regressions = []
+    for run in report["runs"]:
+        for name, timing in run["timings"].items():
+            before = previous.get((run["scenario"]["name"], run["store"], name))
+            if before is None or timing["iterations"] < 3:
+                continue
+            after = timing["median_us"]
+            if after > before * (1 + threshold) and after - before > min_delta_us:
+                regressions.append({
+                    "scenario": run["scenario"]["name"],
+                    "store": run["store"],
+                    "benchmark": name,
+                    "baseline_us": before,
+                    "current_us": after,
+                    "ratio": round(after / before, 2) if before else None
+                })
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for run in report["runs"]:
+        memory = run["memory"]
+        print(f"\n{run['scenario']['name']} ({run['store']}): {run['appointments']} appointments, "
+              f"{memory['parsed_bytes_per_10k'] / 1e6:.1f} MB parsed / "
+              f"{memory['file_bytes_per_10k'] / 1e6:.1f} MB on disk per 10k")
+        for name, timing in run["timings"].items():
+            print(f"  {name:<30}{timing['median_us']:>12.1f} us  (p95 {timing['p95_us']:.1f})")
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression['scenario']}/{regression['benchmark']}: "
+              f"{regression['baseline_us']} -> {regression['current_us']} us")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark availability and booking on synthetic calendars")
+    parser.add_argument("--scenarios", default=SCENARIO_DEFAULTS,
+                        help="Comma-separated <years>y-<providers>p-<density> specs")
+    parser.add_argument("--store", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations, for CI smoke runs")
+    parser.add_argument("--output", help="JSON output path")
+    parser.add_argument("--baseline", help="Baseline JSON to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--save-baseline", help="Also write this run as a baseline file")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    with tempfile.TemporaryDirectory(prefix="scheduling-bench-") as tmp:
+        os.environ["INVALIDATION_DIR"] = str(Path(tmp) / "generations")
+        runs = [
+            asyncio.run(SchedulingBench(parse_scenario(spec), args.store, Path(tmp), args.quick).run())
+            for spec in args.scenarios.split(",")
+        ]
+
+    report: Dict[str, Any] = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "quick": args.quick},
+        "runs": runs
+    }
+    if args.baseline:
+        report["regressions"] = compare_to_baseline(report, json.loads(Path(args.baseline).read_text()),
+                                                    args.threshold)
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"scheduling-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+
+    print_report(report)
+    print(f"\nResults written to {output}")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
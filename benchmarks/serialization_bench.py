@@ -0,0 +1,236 @@
+"""Serialization cost of the hot API responses.
+
+Times building and encoding one response body for:
+
+- ``/api/chat`` with long conversation histories
+- ``/api/calendly/availability`` with large slot lists, in the full and
+  compact formats
+
+Each payload is encoded three ways: validated pydantic models through
+FastAPI's generic ``jsonable_encoder`` + ``json.dumps`` path, models
+dumped by pydantic's Rust serializer, and plain dicts through orjson (what
+the routes do now). With ``--http`` the real routes are also timed
+in-process through the ASGI app, with the agent stubbed out.
+
+    python -m benchmarks.serialization_bench
+    python -m benchmarks.serialization_bench --histories 20,200,1000 --slots 40,288,1440 --http
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from backend.models.schemas import (
+    ChatResponse, ChatMessage, AvailabilityResponse, TimeSlot, AppointmentType
+)
+
+MESSAGE_TEXT = (
+    "I'd like to book a follow-up for next Tuesday afternoon if anything is open, "
+    "and could you remind me whether my insurance covers the visit? "
+)
+
+
+def make_chat_result(messages: int) -> Dict[str, Any]:
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{MESSAGE_TEXT}({i})"}
+        for i in range(messages)
+    ]
+    return {
+        "response": history[-1]["content"],
+        "conversation_history": history,
+        "metadata": {"used_faq": False, "tools_used": 1, "cache_hit": False,
+                     "routing": {"route": "llm", "intent": None, "confidence": 0.0, "reason": "booking_intent"}}
+    }
+
+
+def make_slots(count: int) -> List[Dict[str, Any]]:
+    step = max(1, (24 * 60) // count)
+    return [
+        {"start_time": f"{(i * step) // 60:02d}:{(i * step) % 60:02d}",
+         "end_time": f"{(i * step + 15) // 60 % 24:02d}:{(i * step + 15) % 60:02d}",
+         "available": i % 3 != 0}
+        for i in range(count)
+    ]
+
+
+def chat_strategies(result: Dict[str, Any]) -> Dict[str, Callable[[], bytes]]:
+    def fastapi_generic() -> bytes:
+        model = ChatResponse(
+            response=result["response"],
+            conversation_history=[ChatMessage(**msg) for msg in result["conversation_history"]],
+            metadata=result["metadata"]
+        )
+        return json.dumps(jsonable_encoder(model)).encode()
+
+    def pydantic_json() -> bytes:
+        model = ChatResponse(
+            response=result["response"],
+            conversation_history=[ChatMessage(**msg) for msg in result["conversation_history"]],
+            metadata=result["metadata"]
+        )
+        return model.model_dump_json().encode()
+
+    def orjson_dicts() -> bytes:
+        return orjson.dumps({
+            "response": result["response"],
+            "conversation_history": result["conversation_history"],
+            "metadata": result["metadata"]
+        })
+
+    return {"fastapi_generic": fastapi_generic, "pydantic_json": pydantic_json, "orjson_dicts": orjson_dicts}
+
+
+def availability_strategies(slots: List[Dict[str, Any]]) -> Dict[str, Callable[[], bytes]]:
+    day = "2030-01-07"
+
+    def fastapi_generic() -> bytes:
+        model = AvailabilityResponse(date=day, available_slots=[TimeSlot(**slot) for slot in slots],
+                                     appointment_type=AppointmentType.FOLLOWUP)
+        return json.dumps(jsonable_encoder(model)).encode()
+
+    def pydantic_json() -> bytes:
+        model = AvailabilityResponse.model_construct(
+            date=day, available_slots=[TimeSlot.model_construct(**slot) for slot in slots],
+            appointment_type=AppointmentType.FOLLOWUP
+        )
+        return model.model_dump_json().encode()
+
+    def compact_orjson() -> bytes:
+        bits = "".join("1" if slot["available"] else "0" for slot in slots)
+        return orjson.dumps({"date": day, "appointment_type": "followup", "duration": 15,
+                             "step": max(1, (24 * 60) // len(slots)), "start_minute": 0, "slots": bits})
+
+    return {"fastapi_generic": fastapi_generic, "pydantic_json": pydantic_json, "compact_orjson": compact_orjson}
+
+
+def time_strategy(fn: Callable[[], bytes], min_seconds: float) -> Dict[str, float]:
+    body = fn()
+    samples = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or len(samples) < 5:
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return {"median_us": round(samples[len(samples) // 2] * 1e6, 1), "bytes": len(body),
+            "iterations": len(samples)}
+
+
+def run_micro(histories: List[int], slot_counts: List[int], min_seconds: float) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"chat": {}, "availability": {}}
+    for messages in histories:
+        report["chat"][str(messages)] = {
+            name: time_strategy(fn, min_seconds) for name, fn in chat_strategies(make_chat_result(messages)).items()
+        }
+    for count in slot_counts:
+        report["availability"][str(count)] = {
+            name: time_strategy(fn, min_seconds) for name, fn in availability_strategies(make_slots(count)).items()
+        }
+    return report
+
+
+async def run_http(histories: List[int], requests: int) -> Dict[str, Any]:
+    """Times the real routes in-process, with the agent replaced by a canned result."""
+    import httpx
+    from unittest.mock import patch
+    os.environ.setdefault("WARMUP_AGENT", "false")
+    os.environ.setdefault("CHAT_CLIENT_KEY", "bench-client-key")
+    from backend.main import app
+    from backend.api import chat
+
+    class CannedAgent:
+        def __init__(self, result: Dict[str, Any]):
+            self.result = result
+
+        async def process_message(self, user_message: str, conversation_history=None,
+                                  budget=None) -> Dict[str, Any]:
+            return self.result
+
+    async def timed(client: httpx.AsyncClient, method: str, url: str, **kwargs: Any) -> Dict[str, float]:
+        samples = []
+        for i in range(requests):
+            # A fresh client ID per request keeps the per-client chat rate limit out of the numbers
+            t = time.perf_counter()
+            response = await client.request(method, url, headers={
+                "X-Client-ID": f"bench-{i}", "X-Client-Key": os.environ["CHAT_CLIENT_KEY"]
+            }, **kwargs)
+            samples.append(time.perf_counter() - t)
+            response.raise_for_status()
+        samples.sort()
+        return {"median_us": round(samples[len(samples) // 2] * 1e6, 1), "bytes": len(response.content)}
+
+    today = date.today()
+    monday = (today + timedelta(days=(7 - today.weekday()) % 7 + 7)).isoformat()
+    report: Dict[str, Any] = {"chat": {}, "availability": {}}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for messages in histories:
+            result = make_chat_result(messages)
+            with patch.object(chat, "agent", CannedAgent(result)):
+                report["chat"][str(messages)] = await timed(client, "POST", "/api/chat", json={
+                    "message": "hi", "conversation_history": result["conversation_history"][:-2]
+                })
+        for fmt in ("full", "compact"):
+            report["availability"][fmt] = await timed(client, "GET", "/api/calendly/availability", params={
+                "date": monday, "appointment_type": "followup", "format": fmt
+            })
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for route, cases in report["micro"].items():
+        print(f"\n{route} (per response)")
+        for size, strategies in cases.items():
+            cells = "  ".join(
+                f"{name}={result['median_us']:.0f}us/{result['bytes']}B" for name, result in strategies.items()
+            )
+            print(f"  {size:>6}  {cells}")
+    if "http" in report:
+        print("\nin-process HTTP (route + middleware + serialization)")
+        for route, cases in report["http"].items():
+            for size, result in cases.items():
+                print(f"  {route:<12} {size:>8}  {result['median_us']:.0f}us  {result['bytes']}B")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark response serialization for hot routes")
+    parser.add_argument("--histories", default="20,200,1000", help="Chat history lengths in messages")
+    parser.add_argument("--slots", default="40,288,1440", help="Availability slot list sizes")
+    parser.add_argument("--min-seconds", type=float, default=0.3, help="Minimum timing per case")
+    parser.add_argument("--http", action="store_true", help="Also time the real routes in-process")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per HTTP case")
+    parser.add_argument("--output", help="JSON output path")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    histories = [int(n) for n in args.histories.split(",")]
+    report: Dict[str, Any] = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds")},
+        "micro": run_micro(histories, [int(n) for n in args.slots.split(",")], args.min_seconds)
+    }
+    if args.http:
+        report["http"] = asyncio.run(run_http(histories, args.requests))
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"serialization-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print_report(report)
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
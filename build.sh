@@ -21,6 +21,10 @@ echo "Installing Python dependencies..."
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Precompress hashed assets so they are served without per-request compression
+echo "Precompressing frontend assets..."
+python -m backend.utils.precompress frontend/dist/assets
+
 echo "========================================="
 echo "Build Complete!"
 echo "========================================="
@@ -27,6 +27,12 @@ def clean_test_appointments():
         json.dump(original_content, f, indent=2)
 
 
+@pytest.fixture(scope="function", autouse=True)
+def isolated_vector_db(tmp_path, monkeypatch):
+    """Keep FAQ indexes built by tests (often with fake embeddings) out of data/vectordb"""
+    monkeypatch.setenv("VECTOR_DB_PATH", str(tmp_path / "vectordb"))
+
+
 class TestSchedulingLogic:
     """
     Direct tests for scheduling logic functions without external dependencies.
@@ -140,13 +146,13 @@ class TestCalendlyAPILogic:
     
     async def test_availability_on_working_day(self):
         """Test availability calculation for a normal working day"""
-        from backend.api.calendly_integration import get_availability
+        from backend.api.calendly_integration import availability_for_date
         from backend.models.schemas import AppointmentType
         
         # Use a future Monday (working day)
         future_monday = (datetime.now() + timedelta(days=(7 - datetime.now().weekday()) % 7 + 7)).strftime("%Y-%m-%d")
         
-        response = await get_availability(future_monday, AppointmentType.CONSULTATION)
+        response = availability_for_date(future_monday, AppointmentType.CONSULTATION)
         
         assert response.date == future_monday
         assert response.appointment_type == AppointmentType.CONSULTATION
@@ -164,9 +170,57 @@ class TestCalendlyAPILogic:
             assert ":" in slot.start_time
             assert ":" in slot.end_time
     
+    async def test_compact_availability_matches_full_format(self):
+        """Test that the compact bitstring marks exactly the free slots of the full format"""
+        from backend.api.calendly_integration import availability_for_date, book_appointment, minutes_to_time
+        from backend.models.schemas import AppointmentType, BookingRequest, PatientInfo
+        
+        future_monday = (datetime.now() + timedelta(days=(7 - datetime.now().weekday()) % 7 + 7)).strftime("%Y-%m-%d")
+        await book_appointment(BookingRequest(
+            appointment_type=AppointmentType.CONSULTATION,
+            date=future_monday,
+            start_time="09:15",
+            patient=PatientInfo(name="Jane Doe", email="jane@example.com", phone="555-123-4567"),
+            reason="Annual checkup"
+        ))
+        
+        full = availability_for_date(future_monday, AppointmentType.FOLLOWUP)
+        compact = json.loads(availability_for_date(future_monday, AppointmentType.FOLLOWUP, "compact").body)
+        
+        free_from_full = [slot.start_time for slot in full.available_slots if slot.available]
+        free_from_compact = [
+            minutes_to_time(compact["start_minute"] + i * compact["step"])
+            for i, bit in enumerate(compact["slots"]) if bit == "1"
+        ]
+        assert free_from_compact == free_from_full
+        assert "09:15" not in free_from_compact and "09:30" not in free_from_compact
+        assert "09:00" in free_from_compact and "09:45" in free_from_compact
+    
+    async def test_availability_range_returns_compact_days(self):
+        """Test that the range endpoint returns one compact entry per day, empty when closed"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        
+        future_monday = (datetime.now() + timedelta(days=(7 - datetime.now().weekday()) % 7 + 7)).strftime("%Y-%m-%d")
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false'}):
+            with TestClient(app) as client:
+                response = client.get("/api/calendly/availability/range", params={
+                    "start_date": future_monday, "appointment_type": "consultation", "days": 7
+                })
+                too_long = client.get("/api/calendly/availability/range", params={
+                    "start_date": future_monday, "appointment_type": "consultation", "days": 90
+                })
+        
+        days = response.json()["days"]
+        assert len(days) == 7
+        assert "1" in days[future_monday]["slots"]
+        sunday = (datetime.strptime(future_monday, "%Y-%m-%d") + timedelta(days=6)).strftime("%Y-%m-%d")
+        assert days[sunday] == {"start_minute": None, "slots": ""}
+        assert too_long.status_code == 400
+    
     async def test_availability_on_sunday(self):
         """Test that Sunday returns no availability (clinic closed)"""
-        from backend.api.calendly_integration import get_availability
+        from backend.api.calendly_integration import availability_for_date
         from backend.models.schemas import AppointmentType
         
         # Find next Sunday
@@ -175,19 +229,19 @@ class TestCalendlyAPILogic:
             days_until_sunday = 7
         next_sunday = (datetime.now() + timedelta(days=days_until_sunday)).strftime("%Y-%m-%d")
         
-        response = await get_availability(next_sunday, AppointmentType.CONSULTATION)
+        response = availability_for_date(next_sunday, AppointmentType.CONSULTATION)
         
         assert response.date == next_sunday
         assert response.available_slots == []
     
     async def test_availability_excludes_lunch_break(self):
         """Test that lunch break times are not included in available slots"""
-        from backend.api.calendly_integration import get_availability
+        from backend.api.calendly_integration import availability_for_date
         from backend.models.schemas import AppointmentType
         
         future_monday = (datetime.now() + timedelta(days=(7 - datetime.now().weekday()) % 7 + 7)).strftime("%Y-%m-%d")
         
-        response = await get_availability(future_monday, AppointmentType.CONSULTATION)
+        response = availability_for_date(future_monday, AppointmentType.CONSULTATION)
         
         # Check that no slots overlap with lunch (12:00-13:00)
         for slot in response.available_slots:
@@ -310,6 +364,55 @@ class TestAvailabilityTool:
             assert data["available_slots"][0] == "09:00"
             assert data["available_slots"][1] == "10:00"
     
+    async def test_check_availability_decodes_compact_format(self):
+        """Test that the tool asks for the compact format and decodes the bitstring"""
+        from backend.tools.availability_tool import check_availability
+        
+        mock_response = {
+            "date": "2025-11-30",
+            "appointment_type": "consultation",
+            "duration": 30,
+            "step": 15,
+            "start_minute": 480,
+            "slots": "0110001"
+        }
+        
+        with patch('httpx.AsyncClient.get') as mock_get:
+            mock_get.return_value = AsyncMock(
+                status_code=200,
+                json=Mock(return_value=mock_response)
+            )
+            
+            result = await check_availability(date="2025-11-30", appointment_type="consultation")
+            data = json.loads(result)
+            
+            assert mock_get.call_args.kwargs["params"]["format"] == "compact"
+            assert data["available_slots"] == ["08:15", "08:30", "09:30"]
+            assert data["total_available"] == 3
+    
+    async def test_concurrent_identical_checks_share_one_request(self):
+        """Test that simultaneous checks for the same date and type make a single HTTP call"""
+        import asyncio
+        from backend.tools.availability_tool import check_availability
+        
+        mock_response = {"date": "2025-11-30", "appointment_type": "consultation",
+                         "duration": 30, "step": 15, "start_minute": 480, "slots": "1101"}
+        
+        async def slow_get(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return Mock(status_code=200, json=Mock(return_value=mock_response))
+        
+        with patch('httpx.AsyncClient.get', side_effect=slow_get) as mock_get:
+            results = await asyncio.gather(
+                *[check_availability(date="2025-11-30", appointment_type="consultation") for _ in range(5)],
+                check_availability(date="2025-11-30", appointment_type=" Consultation "),
+                check_availability(date="2025-11-30", appointment_type="followup")
+            )
+        
+        assert mock_get.call_count == 2
+        assert len(set(results[:6])) == 1
+        assert json.loads(results[0])["available_slots"] == ["08:00", "08:15", "08:45"]
+    
     async def test_check_availability_no_slots(self):
         """Test availability when no slots are available"""
         from backend.tools.availability_tool import check_availability
@@ -332,6 +435,18 @@ class TestAvailabilityTool:
             assert data["available"] is False
             assert "message" in data
 
+    async def test_http_client_reads_base_url_when_created(self):
+        """Test that CALENDLY_API_BASE_URL set after import (e.g. from .env) is honored"""
+        from backend.tools.http_client import get_http_client, close_http_client
+
+        await close_http_client()
+        with patch.dict(os.environ, {'CALENDLY_API_BASE_URL': 'http://calendar.internal:9000'}):
+            client = get_http_client()
+        try:
+            assert str(client.base_url) == "http://calendar.internal:9000"
+        finally:
+            await close_http_client()
+
 
 @pytest.mark.asyncio
 class TestBookingTool:
@@ -509,6 +624,178 @@ class TestRAGSystem:
             assert "clinic" in context.lower() or "Clinic" in context
             assert "1." in context or "2." in context  # Numbered list
 
+    async def test_faq_retrieval_filters_by_predicted_category(self):
+        """Test that retrieval searches only the categories predicted from the query"""
+
+        mock_embedding_service = Mock()
+        mock_embedding_service.embed_text.return_value = [0.1] * 768
+
+        mock_vector_store = Mock()
+        mock_vector_store.count.return_value = 10
+        mock_vector_store.query.return_value = {
+            "documents": [
+                "Parking Information: Free parking is available in the Medical Plaza garage.",
+                "Directions: We are located in the Medical Plaza building."
+            ],
+            "metadatas": [{"category": "clinic_details"}, {"category": "clinic_details"}],
+            "distances": [0.3, 0.35]
+        }
+
+        with patch('backend.rag.faq_rag.EmbeddingService', return_value=mock_embedding_service), \
+             patch('backend.rag.faq_rag.VectorStore', return_value=mock_vector_store):
+
+            from backend.rag.faq_rag import FAQRetrieval
+
+            faq = FAQRetrieval()
+            docs = faq.retrieve_relevant_info("Where do I park?", top_k=3)
+
+            _, kwargs = mock_vector_store.query.call_args
+            assert kwargs["where"] == {"category": "clinic_details"}
+            assert docs[0].startswith("Parking Information")
+
+            # Queries without a category signal search the whole collection
+            mock_vector_store.query.reset_mock()
+            faq.retrieve_relevant_info("Tell me about Dr. Mitchell", top_k=3)
+            _, kwargs = mock_vector_store.query.call_args
+            assert "where" not in kwargs
+
+    async def test_rerank_adapts_top_k_to_score_gap(self):
+        """Test that reranking drops candidates far below the best match"""
+        from backend.rag.reranker import rerank
+
+        results = {
+            "documents": [
+                "Payment Methods: Cash, Credit Card",
+                "Accepted Insurance Providers: Aetna, Cigna, Medicare",
+                "Cancellation Fee: $50"
+            ],
+            "metadatas": [{}, {}, {}],
+            "distances": [0.30, 0.32, 1.5]
+        }
+
+        ranked = rerank("Do you take Medicare insurance?", results, max_k=3, score_gap=0.08)
+
+        assert ranked[0]["document"].startswith("Accepted Insurance")
+        assert len(ranked) < 3
+
+    async def test_context_builder_keeps_only_relevant_fields(self):
+        """Test that the context builder extracts the fields relevant to the query"""
+        from backend.rag.context_builder import ContextBuilder
+
+        documents = [
+            "Clinic Name: HealthCare Plus Clinic\n"
+            "Address: 456 Medical Center Drive, Suite 200, New York, NY 10001\n"
+            "Phone: +1-555-123-4567\n"
+            "Hours: Monday 8:00 AM - 6:00 PM; Saturday 9:00 AM - 1:00 PM; Sunday Closed",
+            "Cancellation Fee: Appointments cancelled with less than 24 hours notice may be subject to a $50 fee."
+        ]
+
+        context = ContextBuilder(max_tokens=250).build("What are your hours on Sunday?", documents)
+
+        assert "Sunday Closed" in context
+        assert "Address" not in context
+        assert "Cancellation Fee" not in context
+
+    async def test_context_builder_dedups_and_caps_tokens(self):
+        """Test that already-answered facts are skipped and the token cap is enforced"""
+        from backend.rag.context_builder import ContextBuilder, ALREADY_PROVIDED, estimate_tokens
+
+        documents = ["Parking Information: Free parking is available in the Medical Plaza garage."]
+        history = [
+            {"role": "user", "content": "Where do I park?"},
+            {"role": "assistant", "content": "Free parking is available in the Medical Plaza garage!"}
+        ]
+
+        assert ContextBuilder().build("Is parking free?", documents, history) == ALREADY_PROVIDED
+
+        long_documents = [
+            "Policy: " + " ".join(f"Cancellation rule number {i} applies to every visit." for i in range(40))
+        ]
+        context = ContextBuilder(max_tokens=60).build("cancellation rules", long_documents)
+        assert estimate_tokens(context) <= 60
+
+    async def test_embedding_batcher_coalesces_concurrent_requests(self):
+        """Test that concurrent embed_text calls are sent as one batch"""
+        import asyncio
+        from backend.rag.embeddings import EmbeddingBatcher
+        from backend.utils.metrics import EMBEDDING_BATCH_SIZE
+
+        calls = []
+
+        def embed_documents(texts):
+            calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+
+        batch_sizes = EMBEDDING_BATCH_SIZE.labels()
+        count_before, sum_before = batch_sizes.count, batch_sizes.sum
+        batcher = EmbeddingBatcher(embed_documents, window_ms=20, max_batch_size=16)
+        results = await asyncio.gather(*[batcher.embed_text("q" * n) for n in range(1, 6)])
+
+        assert len(calls) == 1
+        assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert (batch_sizes.count - count_before, batch_sizes.sum - sum_before) == (1, 5)
+
+    async def test_embedding_batcher_respects_max_batch_size(self):
+        """Test that a full batch is dispatched without waiting for the window"""
+        import asyncio
+        from backend.rag.embeddings import EmbeddingBatcher
+
+        calls = []
+
+        def embed_documents(texts):
+            calls.append(list(texts))
+            return [[0.0] for _ in texts]
+
+        batcher = EmbeddingBatcher(embed_documents, window_ms=50, max_batch_size=2)
+        await asyncio.gather(*[batcher.embed_text(f"q{i}") for i in range(5)])
+
+        assert [len(batch) for batch in calls] == [2, 2, 1]
+
+    async def test_embedding_batcher_propagates_errors(self):
+        """Test that a failed batch call fails every waiting request"""
+        import asyncio
+        from backend.rag.embeddings import EmbeddingBatcher
+
+        def embed_documents(texts):
+            raise RuntimeError("rate limited")
+
+        batcher = EmbeddingBatcher(embed_documents, window_ms=5, max_batch_size=8)
+        results = await asyncio.gather(
+            batcher.embed_text("a"), batcher.embed_text("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def test_semantic_cache_threshold_and_version(self):
+        """Test that the semantic cache matches by similarity and knowledge-base version"""
+        from backend.rag.semantic_cache import SemanticCache
+
+        cache = SemanticCache(similarity_threshold=0.95, ttl_seconds=60, max_entries=8)
+        cache.store([1.0, 0.0], "We are open 8 AM to 6 PM.", "v1")
+
+        assert cache.lookup([0.99, 0.05], "v1") == "We are open 8 AM to 6 PM."
+        assert cache.lookup([0.0, 1.0], "v1") is None
+        assert cache.lookup([1.0, 0.0], "v2") is None
+        assert cache.hits == 1
+        assert cache.misses == 2
+
+    async def test_semantic_cache_ttl_and_size_bound(self):
+        """Test that expired entries are dropped and size stays bounded"""
+        from backend.rag.semantic_cache import SemanticCache
+
+        cache = SemanticCache(similarity_threshold=0.99, ttl_seconds=0, max_entries=8)
+        cache.store([1.0, 0.0], "stale", "v1")
+        assert cache.lookup([1.0, 0.0], "v1") is None
+
+        cache = SemanticCache(similarity_threshold=0.99, ttl_seconds=60, max_entries=2)
+        cache.store([1.0, 0.0, 0.0], "a", "v1")
+        cache.store([0.0, 1.0, 0.0], "b", "v1")
+        cache.store([0.0, 0.0, 1.0], "c", "v1")
+
+        assert len(cache) == 2
+        assert cache.lookup([1.0, 0.0, 0.0], "v1") is None
+        assert cache.lookup([0.0, 0.0, 1.0], "v1") == "c"
+
 
 @pytest.mark.asyncio
 class TestSchedulingAgent:
@@ -586,6 +873,9 @@ class TestSchedulingAgent:
             # Mock FAQ retrieval
             mock_faq = Mock()
             mock_faq.get_context_for_query.return_value = "Accepted Insurance: Blue Cross Blue Shield, Aetna, Cigna"
+            mock_faq.aget_context_for_query = AsyncMock(
+                return_value="Accepted Insurance: Blue Cross Blue Shield, Aetna, Cigna"
+            )
             
             with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI') as mock_llm_class:
                 mock_llm_instance = Mock()
@@ -650,6 +940,1349 @@ class TestSchedulingAgent:
                 assert "response" in result
                 mock_tool.ainvoke.assert_called_once()
 
+    async def test_availability_prefetch_serves_matching_tool_call(self):
+        """Test that availability fetched during the first LLM call answers the model's tool call"""
+        import asyncio
+        
+        def tool_call(appointment_type):
+            response = Mock(content="")
+            response.tool_calls = [{"name": "check_availability", "id": "call_1",
+                                    "args": {"date": "2030-01-08", "appointment_type": appointment_type}}]
+            return response
+        
+        async def slow_get(*args, **kwargs):
+            await asyncio.sleep(0.02)
+            return Mock(status_code=200, json=Mock(return_value={
+                "date": "2030-01-08", "duration": 45, "step": 15, "start_minute": 540, "slots": "101"
+            }))
+        
+        env = {'GOOGLE_API_KEY': 'fake-key-for-testing', 'SINGLE_CALL_AVAILABILITY_ENABLED': 'false'}
+        with patch.dict(os.environ, env):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'), \
+                 patch('httpx.AsyncClient.get', side_effect=slow_get) as mock_get:
+                from backend.agent.scheduling_agent import SchedulingAgent
+                
+                agent = SchedulingAgent()
+                final = Mock(content="I have 9:00 and 9:30 open on January 8th.", tool_calls=None)
+                agent.llm = Mock(ainvoke=AsyncMock(side_effect=[tool_call("physical"), final]))
+                hit = await agent.process_message("Can I come in on 2030-01-08 for a physical?")
+                
+                assert hit["metadata"]["prefetch"] == "hit"
+                assert hit["metadata"]["tools_used"] == 1
+                assert mock_get.call_count == 1
+                tool_message = agent.llm.ainvoke.await_args_list[1].args[0][-1]
+                assert json.loads(tool_message.content)["available_slots"] == ["09:00", "09:30"]
+                
+                agent.llm = Mock(ainvoke=AsyncMock(side_effect=[tool_call("followup"), final]))
+                miss = await agent.process_message("Can I come in on 2030-01-08 for a physical?")
+                
+                assert miss["metadata"]["prefetch"] == "miss"
+                assert mock_get.call_count == 3
+                requested = [call.kwargs["params"]["appointment_type"] for call in mock_get.call_args_list[1:]]
+                assert sorted(requested) == ["followup", "physical"]
+    
+    async def test_unambiguous_availability_question_takes_one_llm_call(self):
+        """Test that availability is pre-injected for clear questions, with the two-call flow as fallback"""
+        from langchain_core.messages import ToolMessage
+        
+        availability = json.dumps({"date": "2030-01-08", "available": True, "available_slots": ["09:00"]})
+        with patch.dict(os.environ, {'GOOGLE_API_KEY': 'fake-key-for-testing'}):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'):
+                from backend.agent.scheduling_agent import SchedulingAgent
+                
+                agent = SchedulingAgent()
+                mock_tool = Mock(ainvoke=AsyncMock(return_value=availability))
+                agent.tools["check_availability"] = mock_tool
+                answer = Mock(content="9:00 is open on January 8th.", tool_calls=None)
+                agent.llm = Mock(ainvoke=AsyncMock(return_value=answer))
+                
+                single = await agent.process_message("Is anything open on 2030-01-08 for a physical?")
+                
+                assert single["response"] == "9:00 is open on January 8th."
+                assert single["metadata"]["llm_path"] == {
+                    "preinject": True, "reason": "unambiguous_availability", "llm_calls": 1
+                }
+                assert agent.llm.ainvoke.await_count == 1
+                sent = agent.llm.ainvoke.await_args.args[0]
+                assert isinstance(sent[-1], ToolMessage) and sent[-1].content == availability
+                mock_tool.ainvoke.assert_awaited_once_with({"date": "2030-01-08", "appointment_type": "physical"})
+                
+                # The model may still ask for another day; that turn falls back to a second call
+                other_day = Mock(content="", tool_calls=[{"name": "check_availability", "id": "call_2",
+                                                          "args": {"date": "2030-01-09", "appointment_type": "physical"}}])
+                agent.llm = Mock(ainvoke=AsyncMock(side_effect=[other_day, answer]))
+                fallback = await agent.process_message("Is anything open on 2030-01-08 for a physical?")
+                
+                assert fallback["metadata"]["llm_path"]["llm_calls"] == 2
+                assert fallback["metadata"]["tools_used"] == 2
+                
+                agent.llm = Mock(ainvoke=AsyncMock(return_value=answer))
+                vague = await agent.process_message("Is anything open on 2030-01-08?")
+                assert vague["metadata"]["llm_path"]["reason"] == "type_not_stated"
+    
+    async def test_date_and_type_extraction_for_prefetch(self):
+        """Test the rule-based date and appointment type extractor"""
+        from datetime import date
+        from backend.agent.availability_prefetch import find_date, extract_availability_query
+        
+        monday = date(2026, 10, 19)
+        assert find_date("Can I come in Tuesday afternoon?", monday) == "2026-10-20"
+        assert find_date("next Tuesday works", monday) == "2026-10-27"
+        assert find_date("How about Nov 25th?", monday) == "2026-11-25"
+        assert find_date("the 3rd of March", monday) == "2027-03-03"
+        assert find_date("is 11/30 open", monday) == "2026-11-30"
+        assert find_date("book 1/2/2027 please", monday) == "2027-01-02"
+        assert find_date("I need a 1/2 hour appointment", monday) is None
+        assert find_date("it took 1 1/2 hours last time", monday) is None
+        assert find_date("tomorrow morning", monday) == "2026-10-20"
+        assert find_date("that decision 3 is final", monday) is None
+        assert find_date("may I come in at 3pm", monday) is None
+        
+        history = [{"role": "user", "content": "I need a follow-up visit"},
+                   {"role": "assistant", "content": "Sure, which day?"}]
+        query = extract_availability_query("Friday please", history, monday)
+        assert query == {"date": "2026-10-23", "appointment_type": "followup", "type_source": "history"}
+        assert extract_availability_query("What are your hours?", [], monday) is None
+
+    async def test_every_call_starts_with_the_same_system_prefix(self):
+        """Test that the system instruction leads every turn and token usage is summed per turn"""
+        from langchain_core.messages import SystemMessage, HumanMessage
+        from backend.agent.prompts import SYSTEM_PROMPT
+        
+        env = {'GOOGLE_API_KEY': 'fake-key-for-testing', 'SEMANTIC_CACHE_ENABLED': 'false'}
+        with patch.dict(os.environ, env):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'):
+                from backend.agent.scheduling_agent import SchedulingAgent
+                
+                agent = SchedulingAgent()
+                reply = Mock(content="Happy to help. Which appointment type do you need?", tool_calls=None)
+                reply.usage_metadata = {"input_tokens": 1200, "output_tokens": 12, "total_tokens": 1212,
+                                        "input_token_details": {"cache_read": 1024}}
+                agent.llm = Mock(ainvoke=AsyncMock(return_value=reply))
+                
+                first = await agent.process_message("Hello, I'd like to see the doctor")
+                await agent.process_message("Something for my back pain", first["conversation_history"])
+                
+                first_call, second_call = [call.args[0] for call in agent.llm.ainvoke.await_args_list]
+                for sent in (first_call, second_call):
+                    assert isinstance(sent[0], SystemMessage) and sent[0].content == SYSTEM_PROMPT
+                    assert all(SYSTEM_PROMPT not in m.content for m in sent[1:])
+                assert isinstance(second_call[-1], HumanMessage) and len(second_call) == 4
+                assert first["metadata"]["token_usage"] == {"input": 1200, "output": 12, "cache_read": 1024}
+    
+    async def test_fast_path_rephrase_shares_the_system_prefix(self):
+        """Test that the rephrase call leads with the same prefix as the chat calls"""
+        from langchain_core.messages import SystemMessage, HumanMessage
+        from backend.agent.llm_resilience import RequestBudget
+        from backend.agent.prompts import SYSTEM_PROMPT
+        
+        with patch.dict(os.environ, {'GOOGLE_API_KEY': 'fake-key-for-testing'}):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'):
+                from backend.agent.scheduling_agent import SchedulingAgent
+                
+                agent = SchedulingAgent()
+                agent.llm = Mock(ainvoke=AsyncMock(return_value=Mock(content="We're open 8 to 6!", tool_calls=None)))
+                
+                answer = await agent._rephrase_fast_path_answer("When are you open?", "Hours: 8-6", RequestBudget())
+                
+                sent = agent.llm.ainvoke.await_args.args[0]
+                assert answer == "We're open 8 to 6!"
+                assert isinstance(sent[0], SystemMessage) and sent[0].content == SYSTEM_PROMPT
+                assert isinstance(sent[1], HumanMessage) and "Hours: 8-6" in sent[1].content
+    
+    async def test_cached_content_handle_replaces_the_sent_prefix(self):
+        """Test that with a cached-content handle the prefix is neither bound nor sent"""
+        from langchain_core.messages import SystemMessage
+        from backend.agent.prompt_prefix import prefix_fingerprint, tool_declarations
+        
+        env = {'GOOGLE_API_KEY': 'fake-key-for-testing', 'LLM_CACHED_CONTENT': 'cachedContents/clinic-prefix'}
+        with patch.dict(os.environ, env):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI') as mock_llm_class:
+                from backend.agent.scheduling_agent import SchedulingAgent
+                
+                agent = SchedulingAgent()
+                
+                assert mock_llm_class.call_args.kwargs["cached_content"] == "cachedContents/clinic-prefix"
+                mock_llm_class.return_value.bind_tools.assert_not_called()
+                agent.llm = Mock(ainvoke=AsyncMock(return_value=Mock(content="Hi!", tool_calls=None)))
+                await agent.process_message("Hello")
+                sent = agent.llm.ainvoke.await_args.args[0]
+                assert not any(isinstance(m, SystemMessage) for m in sent)
+        
+        assert [d["name"] for d in tool_declarations()] == ["check_availability", "book_appointment"]
+        assert prefix_fingerprint() == prefix_fingerprint() and len(prefix_fingerprint()) == 16
+
+    async def test_semantic_cache_serves_repeated_faq(self):
+        """Test that a repeated standalone FAQ turn is answered without the LLM"""
+
+        env = {'GOOGLE_API_KEY': 'fake-key-for-testing', 'FAQ_FAST_PATH_ENABLED': 'false'}
+        with patch.dict(os.environ, env):
+            mock_response = Mock()
+            mock_response.content = "Free parking is available in the Medical Plaza garage."
+            mock_response.tool_calls = None
+            mock_llm = Mock()
+            mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+
+            mock_faq = Mock()
+            mock_faq.knowledge_base_version = "v1"
+            mock_faq.aembed_query = AsyncMock(return_value=[0.6, 0.8])
+            mock_faq.aget_context_for_query = AsyncMock(return_value="Parking Information: Free parking")
+
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'), \
+                 patch('backend.agent.scheduling_agent.FAQRetrieval', return_value=mock_faq):
+                from backend.agent.scheduling_agent import SchedulingAgent
+
+                agent = SchedulingAgent()
+                agent.llm = mock_llm
+
+                first = await agent.process_message("Where do I park?")
+                second = await agent.process_message("Where do I park?")
+
+                assert first["metadata"]["cache_hit"] is False
+                assert second["metadata"]["cache_hit"] is True
+                assert second["response"] == first["response"]
+                assert mock_llm.ainvoke.await_count == 1
+
+                # Conversations already mid-booking bypass the cache
+                booking_history = [
+                    {"role": "user", "content": "I want to book a physical"},
+                    {"role": "assistant", "content": "Sure, which date works for your appointment?"}
+                ]
+                third = await agent.process_message("Where do I park?", booking_history)
+
+                assert third["metadata"]["cache_hit"] is False
+
+    async def test_semantic_cache_skips_first_turn_booking_requests(self):
+        """Test that a first message asking to book is neither stored in nor served from the cache"""
+        env = {'GOOGLE_API_KEY': 'fake-key-for-testing', 'FAQ_FAST_PATH_ENABLED': 'false'}
+        with patch.dict(os.environ, env):
+            mock_llm = Mock(ainvoke=AsyncMock(return_value=Mock(
+                content="Yes, we accept Aetna. Which appointment type would you like?", tool_calls=None)))
+            mock_faq = Mock()
+            mock_faq.knowledge_base_version = "v1"
+            mock_faq.aembed_query = AsyncMock(return_value=[0.6, 0.8])
+            mock_faq.aget_context_for_query = AsyncMock(return_value="Accepted Insurance Providers: Aetna")
+
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'), \
+                 patch('backend.agent.scheduling_agent.FAQRetrieval', return_value=mock_faq):
+                from backend.agent.scheduling_agent import SchedulingAgent
+
+                agent = SchedulingAgent()
+                agent.llm = mock_llm
+
+                message = "Can I book a consultation if I have Aetna insurance?"
+                first = await agent.process_message(message)
+                second = await agent.process_message(message)
+
+                assert first["metadata"]["cache_hit"] is False
+                assert second["metadata"]["cache_hit"] is False
+                assert mock_llm.ainvoke.await_count == 2
+                mock_faq.aembed_query.assert_not_awaited()
+                assert mock_llm.ainvoke.await_count == 2
+
+    async def test_fast_path_answers_single_intent_faq_without_llm(self):
+        """Test that a high-confidence first-turn FAQ is answered from the template"""
+
+        with patch.dict(os.environ, {'GOOGLE_API_KEY': 'fake-key-for-testing'}):
+            mock_llm = Mock()
+            mock_llm.ainvoke = AsyncMock()
+
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'):
+                from backend.agent.scheduling_agent import SchedulingAgent
+
+                agent = SchedulingAgent()
+                agent.llm = mock_llm
+
+                result = await agent.process_message("What are your hours?")
+
+                routing = result["metadata"]["routing"]
+                assert routing["route"] == "fast_path"
+                assert routing["intent"] == "hours"
+                assert routing["confidence"] >= 0.8
+                assert "Saturday: 9:00 AM - 1:00 PM" in result["response"]
+                mock_llm.ainvoke.assert_not_awaited()
+
+    async def test_intent_router_decisions(self):
+        """Test routing of single-intent, multi-intent, booking and follow-up turns"""
+        from backend.agent.intent_router import IntentRouter
+
+        router = IntentRouter(min_confidence=0.8)
+
+        assert router.route("Where do I park?", is_first_turn=True)["route"] == "fast_path"
+        assert router.route("What insurance do you accept?", is_first_turn=True)["intent"] == "insurance"
+
+        multi = router.route("Where are you located and do you take Aetna?", is_first_turn=True)
+        assert multi["route"] == "llm"
+        assert multi["reason"] == "low_confidence"
+
+        booking = router.route("Can I book a physical tomorrow?", is_first_turn=True)
+        assert booking["route"] == "llm"
+        assert booking["reason"] == "booking_intent"
+
+        follow_up = router.route("What are your hours?", is_first_turn=False)
+        assert follow_up["route"] == "llm"
+        assert follow_up["reason"] == "not_first_turn"
+
+
+class ScriptedLLM:
+    """Local fake LLM: each call sleeps and then returns or raises the next scripted step"""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        import asyncio
+        delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+class ResourceExhausted(Exception):
+    """Stand-in for the provider's 429 error"""
+
+
+@pytest.mark.asyncio
+class TestLLMResilience:
+    """Test suite for LLM deadlines, retries and hedging"""
+
+    async def test_retries_transient_errors_with_backoff(self):
+        """Test that rate-limit errors are retried and other errors are not"""
+        from backend.agent.llm_resilience import ResilientLLMCaller, RetryBudget
+
+        caller = ResilientLLMCaller(call_timeout=1, max_attempts=3, base_delay=0.001, max_delay=0.01,
+                                    hedge_enabled=False, retry_budget=RetryBudget(ratio=0.2, burst=10))
+        llm = ScriptedLLM([(0, ResourceExhausted("quota")), (0, ResourceExhausted("quota")), (0, "ok")])
+        assert await caller.ainvoke(llm, []) == "ok"
+        assert llm.calls == 3
+        assert caller.stats["retries"] == 2
+
+        llm = ScriptedLLM([(0, ValueError("bad request")), (0, "ok")])
+        with pytest.raises(ValueError):
+            await caller.ainvoke(llm, [])
+        assert llm.calls == 1
+
+    async def test_deadline_and_retry_budget_bound_attempts(self):
+        """Test that calls respect the request deadline and stop when the retry budget is spent"""
+        import asyncio
+        import time
+        from backend.agent.llm_resilience import (
+            ResilientLLMCaller, RetryBudget, RequestBudget, LLMDeadlineExceeded
+        )
+
+        caller = ResilientLLMCaller(call_timeout=5, max_attempts=5, base_delay=0.001, max_delay=0.001,
+                                    hedge_enabled=False, retry_budget=RetryBudget(ratio=0.2, burst=10))
+        started = time.monotonic()
+        with pytest.raises((asyncio.TimeoutError, LLMDeadlineExceeded)):
+            await caller.ainvoke(ScriptedLLM([(1.0, "late")]), [], RequestBudget(0.1))
+        assert time.monotonic() - started < 0.5
+        assert caller.stats["timeouts"] >= 1
+
+        caller = ResilientLLMCaller(call_timeout=1, max_attempts=5, base_delay=0.001, max_delay=0.001,
+                                    hedge_enabled=False, retry_budget=RetryBudget(ratio=0, burst=1))
+        llm = ScriptedLLM([(0, ResourceExhausted("quota"))])
+        with pytest.raises(ResourceExhausted):
+            await caller.ainvoke(llm, [])
+        assert llm.calls == 2
+        assert caller.stats["retry_budget_exhausted"] == 1
+
+    async def test_hedged_request_takes_first_response(self):
+        """Test that a slow call is hedged after the p95 latency and the faster copy wins"""
+        import time
+        from backend.agent.llm_resilience import ResilientLLMCaller, RetryBudget
+
+        caller = ResilientLLMCaller(call_timeout=5, max_attempts=1, hedge_enabled=True, hedge_min_samples=5,
+                                    retry_budget=RetryBudget(ratio=0.2, burst=10))
+        warm = ScriptedLLM([(0.01, "ok")])
+        for _ in range(5):
+            await caller.ainvoke(warm, [])
+
+        llm = ScriptedLLM([(2.0, "slow primary"), (0.01, "hedge")])
+        started = time.monotonic()
+        assert await caller.ainvoke(llm, []) == "hedge"
+        assert time.monotonic() - started < 0.5
+        assert caller.stats["hedges"] == 1
+        assert caller.stats["hedge_wins"] == 1
+
+    async def test_agent_recovers_from_transient_llm_failure(self):
+        """Test that a rate-limited first call no longer ends in the fallback apology"""
+        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test_key", "LLM_RETRY_BASE_DELAY": "0.001",
+                                     "FAQ_FAST_PATH_ENABLED": "false"}):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'):
+                from backend.agent.scheduling_agent import SchedulingAgent
+
+                agent = SchedulingAgent()
+                agent.llm = ScriptedLLM([(0, ResourceExhausted("quota")), (0, Mock(content="Hello!", tool_calls=[]))])
+                result = await agent.process_message("Hi there")
+
+                assert result["response"] == "Hello!"
+                assert "error" not in result["metadata"]
+
+    async def test_agent_honors_budget_started_on_arrival(self):
+        """Test that time spent before the turn counts against the caller's budget"""
+        from backend.agent.llm_resilience import RequestBudget
+
+        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test_key", "FAQ_FAST_PATH_ENABLED": "false"}):
+            with patch('backend.agent.scheduling_agent.ChatGoogleGenerativeAI'):
+                from backend.agent.scheduling_agent import SchedulingAgent
+
+                agent = SchedulingAgent()
+                agent.llm = ScriptedLLM([(0, Mock(content="Hello!", tool_calls=[]))])
+                result = await agent.process_message("Hi there", budget=RequestBudget(0))
+
+                assert agent.llm.calls == 0
+                assert "error" in result["metadata"]
+
+
+@pytest.mark.asyncio
+class TestFakeProvider:
+    """Test suite for the offline LLM and embedding providers"""
+
+    async def test_fake_chat_model_drives_booking_tool_calls(self):
+        """Test that the fake model asks for availability, then books, then replies to results"""
+        from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+        from backend.agent.fake_llm import FakeChatModel
+        from backend.tools.availability_tool import availability_tool
+        from backend.tools.booking_tool import booking_tool
+
+        llm = FakeChatModel(latency_ms=0, tokens_per_second=1e6, jitter=0).bind_tools([availability_tool, booking_tool])
+
+        response = await llm.ainvoke([HumanMessage(content="Any openings on 2024-01-16 for a physical?")])
+        assert response.tool_calls[0]["name"] == "check_availability"
+        assert response.tool_calls[0]["args"] == {"date": "2024-01-16", "appointment_type": "physical"}
+        assert response.usage_metadata["input_tokens"] > 0
+
+        history = [
+            HumanMessage(content="I need a physical on 2024-01-16. My name is Jane Doe, jane@example.com, 555-123-4567"),
+            AIMessage(content="Which time?"),
+            HumanMessage(content="10:30 works")
+        ]
+        response = await llm.ainvoke(history)
+        args = response.tool_calls[0]["args"]
+        assert response.tool_calls[0]["name"] == "book_appointment"
+        assert (args["date"], args["start_time"], args["patient_name"]) == ("2024-01-16", "10:30", "Jane Doe")
+        assert args["patient_email"] == "jane@example.com"
+
+        tool_result = ToolMessage(content=json.dumps({"success": True, "confirmation_code": "ABC123"}),
+                                  tool_call_id="call_1")
+        response = await llm.ainvoke(history + [response, tool_result])
+        assert "ABC123" in response.content
+
+    async def test_fake_chat_model_simulates_latency_and_failures(self):
+        """Test that latency follows the token rate and injected failures are retryable"""
+        import time
+        from langchain_core.messages import HumanMessage
+        from backend.agent.fake_llm import FakeChatModel
+        from backend.agent.llm_resilience import is_retryable
+
+        llm = FakeChatModel(latency_ms=50, tokens_per_second=1000, jitter=0)
+        started = time.monotonic()
+        response = await llm.ainvoke([HumanMessage(content="Hello")])
+        elapsed = time.monotonic() - started
+        expected = 0.05 + response.usage_metadata["output_tokens"] / 1000
+        assert expected * 0.9 <= elapsed < expected + 0.1
+
+        failing = FakeChatModel(latency_ms=0, jitter=0, error_rate=1.0)
+        with pytest.raises(Exception) as exc_info:
+            await failing.ainvoke([HumanMessage(content="Hello")])
+        assert is_retryable(exc_info.value)
+
+    async def test_agent_runs_offline_with_fake_provider(self, tmp_path):
+        """Test that LLM_PROVIDER=fake needs no API key and completes a tool-using turn"""
+        env = {"LLM_PROVIDER": "fake", "FAKE_LLM_LATENCY_MS": "0", "FAQ_FAST_PATH_ENABLED": "false",
+               "VECTOR_DB_PATH": str(tmp_path / "vectordb")}
+        with patch.dict(os.environ, env):
+            os.environ.pop("GOOGLE_API_KEY", None)
+            from backend.agent.scheduling_agent import SchedulingAgent
+            from backend.rag.embeddings import EmbeddingService
+            from backend.rag.fake_embeddings import FakeEmbeddings
+
+            agent = SchedulingAgent()
+            mock_response = Mock(status_code=200)
+            mock_response.json.return_value = {
+                "date": "2024-01-16",
+                "available_slots": [{"start_time": "09:00", "end_time": "09:30", "available": True}]
+            }
+            with patch('httpx.AsyncClient.get', new=AsyncMock(return_value=mock_response)):
+                result = await agent.process_message("Can I come in on 2024-01-16?")
+
+            assert result["metadata"]["tools_used"] == 1
+            assert "09:00" in result["response"]
+            assert isinstance(EmbeddingService().embeddings, FakeEmbeddings)
+
+    async def test_index_version_depends_on_embedding_model(self):
+        """Test that an index built with fake embeddings is never reused by Gemini embeddings"""
+        from backend.rag.faq_rag import FAQRetrieval
+
+        with patch.dict(os.environ, {"LLM_PROVIDER": "fake", "EMBEDDING_PROVIDER": "fake"}):
+            fake_version = FAQRetrieval().knowledge_base_version
+        with patch.dict(os.environ, {"LLM_PROVIDER": "google", "EMBEDDING_PROVIDER": "google"}):
+            google_version = FAQRetrieval().knowledge_base_version
+
+        assert fake_version != google_version
+
+    async def test_fake_embeddings_are_deterministic_and_lexical(self):
+        """Test that fake embeddings repeat exactly and rank overlapping texts closer"""
+        from backend.rag.fake_embeddings import FakeEmbeddings
+
+        embeddings = FakeEmbeddings()
+        query, related, unrelated = embeddings.embed_documents([
+            "What insurance plans do you accept?",
+            "Accepted insurance plans: Aetna, Cigna",
+            "Parking is available behind the building"
+        ])
+        dot = lambda a, b: sum(x * y for x, y in zip(a, b))
+
+        assert embeddings.embed_query("What insurance plans do you accept?") == query
+        assert dot(query, related) > dot(query, unrelated)
+
+
+class TestSharedState:
+    """Tests for multi-worker safe appointment storage and shared indexes"""
+
+    def _book_concurrently(self, store, workers=8):
+        from concurrent.futures import ThreadPoolExecutor
+        from backend.api.calendly_integration import is_slot_booked
+
+        def attempt(i):
+            record = {
+                "booking_id": f"APPT-TEST-{i}",
+                "date": "2030-01-07",
+                "start_time": "10:00",
+                "end_time": "10:30"
+            }
+            return store.book_if_free(
+                record,
+                lambda on_date: is_slot_booked("2030-01-07", "10:00", "10:30", on_date)
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(attempt, range(workers)))
+
+    def test_json_store_prevents_concurrent_double_booking(self, tmp_path):
+        """Test that concurrent bookings of one slot in the JSON store admit exactly one"""
+        from backend.storage.appointment_store import JsonAppointmentStore
+
+        store = JsonAppointmentStore(str(tmp_path / "appointments.json"))
+        results = self._book_concurrently(store)
+
+        assert results.count(True) == 1
+        assert len(store.load_all()) == 1
+        # Another worker's view of the same file sees the booking
+        assert len(JsonAppointmentStore(str(tmp_path / "appointments.json")).load_all()) == 1
+
+    def test_sqlite_store_prevents_concurrent_double_booking(self, tmp_path):
+        """Test that concurrent bookings of one slot in the SQLite store admit exactly one"""
+        from backend.storage.appointment_store import SqliteAppointmentStore
+
+        store = SqliteAppointmentStore(str(tmp_path / "appointments.db"))
+        version_before = store.version()
+        results = self._book_concurrently(store)
+
+        assert results.count(True) == 1
+        assert len(store.load_all()) == 1
+        assert store.version() == version_before + 1
+
+    def test_sqlite_store_imports_existing_json_appointments_once(self, tmp_path):
+        """Test that switching to SQLite keeps the bookings already in the JSON file"""
+        from backend.storage.appointment_store import JsonAppointmentStore, SqliteAppointmentStore
+
+        json_path = tmp_path / "appointments.json"
+        legacy = JsonAppointmentStore(str(json_path))
+        legacy.append({"booking_id": "APPT-1", "date": "2024-01-15", "start_time": "09:00", "end_time": "09:30"})
+
+        store = SqliteAppointmentStore(str(tmp_path / "appointments.db"), import_from=str(json_path))
+        assert [appt["booking_id"] for appt in store.load_all()] == ["APPT-1"]
+
+        # Later JSON writes are not replayed into an already-migrated database
+        legacy.append({"booking_id": "APPT-2", "date": "2024-01-15", "start_time": "10:00", "end_time": "10:30"})
+        store = SqliteAppointmentStore(str(tmp_path / "appointments.db"), import_from=str(json_path))
+        assert [appt["booking_id"] for appt in store.load_all()] == ["APPT-1"]
+
+    def test_matrix_store_shared_between_workers(self, tmp_path):
+        """Test that a second worker's mmap view picks up a rebuilt index"""
+        from backend.rag.matrix_store import MatrixVectorStore
+        from backend.storage import invalidation
+
+        with patch.object(invalidation, '_channel', invalidation.InvalidationChannel(str(tmp_path / "gen"))):
+            writer = MatrixVectorStore(str(tmp_path / "index"))
+            reader = MatrixVectorStore(str(tmp_path / "index"))
+            assert reader.count() == 0
+
+            writer.add_documents(
+                ["Parking info", "Insurance info", "Hours info"],
+                [{"category": "clinic_details"}, {"category": "insurance_billing"},
+                 {"category": "clinic_details"}],
+                [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]
+            )
+            writer.set_version("v1")
+
+            assert reader.count() == 3
+            assert reader.get_version() == "v1"
+            results = reader.query([1.0, 0.1], n_results=2, where={"category": "clinic_details"})
+            assert results["documents"] == ["Parking info", "Hours info"]
+
+    def test_matrix_store_rebuild_publishes_one_consistent_swap(self, tmp_path):
+        """Test that a rebuild is one publish and a vectors/documents mismatch is never served"""
+        import json as json_module
+        from backend.rag.matrix_store import MatrixVectorStore, INVALIDATION_TOPIC
+        from backend.storage import invalidation
+
+        channel = invalidation.InvalidationChannel(str(tmp_path / "gen"))
+        with patch.object(invalidation, '_channel', channel):
+            writer = MatrixVectorStore(str(tmp_path / "index"))
+            writer.rebuild(["Parking info"], [{"category": "clinic_details"}], [[1.0, 0.0]], "v1")
+            generation = channel.generation(INVALIDATION_TOPIC)
+            writer.rebuild(["Parking info", "Hours info"], [{"category": "clinic_details"}] * 2,
+                           [[1.0, 0.0], [0.7, 0.7]], "v2")
+
+            assert channel.generation(INVALIDATION_TOPIC) == generation + 1
+            assert len(list((tmp_path / "index").glob("vectors-*.npy"))) == 2
+
+            _, documents_path = writer._paths(writer.build_id)
+            documents_path.write_text(json_module.dumps({"documents": ["Parking info"], "metadatas": [{}]}))
+            channel.publish(INVALIDATION_TOPIC)
+            reader = MatrixVectorStore(str(tmp_path / "index"))
+            assert reader.count() == 0
+            assert reader.query([1.0, 0.0])["documents"] == []
+
+
+class TestStartupWarmup:
+    """Tests for lifespan warmup and the readiness endpoint"""
+
+    def test_ready_after_warmup_without_agent(self):
+        """Test that a calendar-only worker reports ready once the schedule is warm"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false'}):
+            with TestClient(app) as client:
+                response = client.get("/api/ready")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ready"] is True
+        assert body["components"]["schedule"]["status"] == "ready"
+        assert body["components"]["agent"]["status"] == "skipped"
+
+    def test_not_ready_when_agent_cannot_start(self):
+        """Test that a failed component is reported and readiness is refused"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+
+        env = {k: v for k, v in os.environ.items() if k != 'GOOGLE_API_KEY'}
+        env['WARMUP_AGENT'] = 'true'
+        with patch.dict(os.environ, env, clear=True):
+            with TestClient(app) as client:
+                ready = client.get("/api/ready")
+                health = client.get("/api/health")
+
+        assert ready.status_code == 503
+        assert ready.json()["components"]["agent"]["status"] == "failed"
+        assert health.status_code == 200
+
+    def test_failed_component_recovers_on_readiness_retry(self, tmp_path):
+        """Test that /api/ready re-runs a failed step and reports ready once it succeeds"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        from backend.api import chat
+
+        real_get_agent = chat.get_agent
+        failures = [RuntimeError("embedding backend down")]
+
+        def flaky_get_agent():
+            if failures:
+                raise failures.pop()
+            return real_get_agent()
+
+        env = {'WARMUP_AGENT': 'true', 'WARMUP_RETRY_SECONDS': '0', 'LLM_PROVIDER': 'fake',
+               'FAKE_EMBEDDING_LATENCY_MS': '0', 'VECTOR_DB_PATH': str(tmp_path / "vectordb")}
+        with patch.dict(os.environ, env), patch.object(chat, 'agent', None), \
+                patch('backend.api.chat.get_agent', side_effect=flaky_get_agent):
+            with TestClient(app) as client:
+                ready = client.get("/api/ready")
+
+        assert not failures
+        assert ready.status_code == 200
+        assert ready.json()["components"]["agent"]["status"] == "ready"
+        assert ready.json()["components"]["faq_index"]["status"] == "ready"
+
+
+class TestStartupImports:
+    """Guards against slow process startup from eager heavy imports"""
+
+    def test_main_does_not_import_heavy_modules(self):
+        """Test that LangChain, Chroma and numpy are only imported when needed"""
+        import subprocess
+
+        heavy = ["langchain_google_genai", "langchain_core", "chromadb", "numpy"]
+        code = (
+            "import sys, backend.main; "
+            f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
+
+    def test_main_import_time_within_budget(self):
+        """Test that importing backend.main stays within the import-time budget"""
+        from backend.utils.import_profile import run_importtime, summarize
+
+        budget_ms = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+        summary = summarize(run_importtime("backend.main"), "backend.main")
+
+        assert summary["total_ms"] <= budget_ms, summary["top_modules"]
+
+
+@pytest.mark.asyncio
+class TestAdmissionControl:
+    """Test suite for concurrency limits and backpressure on chat turns"""
+
+    async def test_admission_bounds_concurrency_and_fails_fast(self):
+        """Test that excess requests queue up to the limit and the rest get 503"""
+        import asyncio
+        from backend.utils.admission import AdmissionController, AdmissionRejected
+
+        controller = AdmissionController(max_concurrency=2, max_queue=1, max_wait_seconds=5,
+                                         client_rate=100, client_burst=100)
+        release = asyncio.Event()
+        peak = 0
+
+        async def turn(client_id):
+            nonlocal peak
+            async with controller.admit(client_id):
+                peak = max(peak, controller.in_flight)
+                await release.wait()
+
+        tasks = [asyncio.create_task(turn(f"kiosk-{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert controller.stats()["queue_depth"] == 1
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await turn("kiosk-3")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers()["Retry-After"] == "1"
+
+        release.set()
+        await asyncio.gather(*tasks)
+        stats = controller.stats()
+        assert peak == 2
+        assert stats["admitted"] == 3
+        assert stats["rejected"]["queue_full"] == 1
+        assert stats["in_flight"] == 0
+
+    async def test_admission_rejects_when_deadline_cannot_be_met(self):
+        """Test that a queued request gives up with 503 once its wait deadline passes"""
+        import asyncio
+        from backend.utils.admission import AdmissionController, AdmissionRejected
+
+        controller = AdmissionController(max_concurrency=1, max_queue=5, max_wait_seconds=0.05,
+                                         client_rate=100, client_burst=100)
+        release = asyncio.Event()
+
+        async def turn():
+            async with controller.admit("kiosk"):
+                await release.wait()
+
+        holder = asyncio.create_task(turn())
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await turn()
+        assert exc_info.value.reason == "deadline"
+
+        release.set()
+        await holder
+
+    async def test_per_client_rate_limit_returns_429(self):
+        """Test that one noisy client is limited without affecting others"""
+        from backend.utils.admission import AdmissionController, AdmissionRejected
+
+        controller = AdmissionController(max_concurrency=4, max_queue=4, max_wait_seconds=1,
+                                         client_rate=0.01, client_burst=2)
+        for _ in range(2):
+            async with controller.admit("kiosk-a"):
+                pass
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            async with controller.admit("kiosk-a"):
+                pass
+        assert exc_info.value.status_code == 429
+        assert int(exc_info.value.headers()["Retry-After"]) >= 1
+
+        async with controller.admit("kiosk-b"):
+            pass
+        assert controller.stats()["rejected"]["client_rate"] == 1
+
+    async def test_new_client_ids_evict_idle_buckets_not_active_limits(self):
+        """Test that rotating client IDs can't reset a limited client's bucket"""
+        import backend.utils.admission as admission
+        from backend.utils.admission import AdmissionController, AdmissionRejected
+
+        controller = AdmissionController(max_concurrency=4, max_queue=4, max_wait_seconds=1,
+                                         client_rate=0.01, client_burst=1)
+        with patch.object(admission, "MAX_CLIENT_BUCKETS", 3):
+            async with controller.admit("kiosk-a"):
+                pass
+            for client_id in ["rotating-1", "kiosk-a", "rotating-2", "rotating-3"]:
+                try:
+                    async with controller.admit(client_id):
+                        pass
+                except AdmissionRejected:
+                    pass
+
+            assert list(controller._buckets) == ["kiosk-a", "rotating-2", "rotating-3"]
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit("kiosk-a"):
+                    pass
+
+    async def test_client_id_header_needs_the_client_key(self):
+        """Test that X-Client-ID only picks the rate-limit bucket with a valid X-Client-Key"""
+        from starlette.requests import Request
+        from backend.api.chat import get_client_id
+
+        def request(headers):
+            return Request({"type": "http", "client": ("203.0.113.7", 5000),
+                            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+        with patch.dict(os.environ, {"CHAT_CLIENT_KEY": "kiosk-secret"}):
+            assert get_client_id(request({"X-Client-ID": "kiosk-1"})) == "203.0.113.7"
+            assert get_client_id(request({"X-Client-ID": "kiosk-1", "X-Client-Key": "guess"})) == "203.0.113.7"
+            assert get_client_id(request({"X-Client-ID": "kiosk-1", "X-Client-Key": "kiosk-secret"})) == "client:kiosk-1"
+        with patch.dict(os.environ, {"CHAT_CLIENT_KEY": ""}):
+            assert get_client_id(request({"X-Client-ID": "kiosk-1", "X-Client-Key": ""})) == "203.0.113.7"
+
+    async def test_admission_stats_require_admin(self):
+        """Test that queue stats are only served with the admin token"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false', 'ADMIN_TOKEN': 'secret'}):
+            with TestClient(app) as client:
+                anonymous = client.get("/api/admission")
+                admin = client.get("/api/admission", headers={"X-Admin-Token": "secret"})
+
+        assert anonymous.status_code == 401
+        assert admin.json()["max_concurrency"] >= 1
+
+
+class TestMetrics:
+    """Test suite for the Prometheus /metrics endpoint"""
+
+    def test_histogram_and_counter_render_prometheus_text(self):
+        """Test cumulative buckets, sum/count and counter samples in the exposition format"""
+        from backend.utils.metrics import Registry, Counter, Histogram
+        import backend.utils.metrics as metrics
+
+        registry = Registry()
+        with patch.object(metrics, "REGISTRY", registry):
+            latency = Histogram("stage_seconds", "Stage latency", ("stage",), buckets=(0.1, 1.0))
+            calls = Counter("stage_calls", "Stage calls", ("stage",))
+
+        for value in (0.05, 0.5, 2.0):
+            latency.labels("llm").observe(value)
+        calls.labels("llm").inc()
+        calls.labels("llm").inc()
+
+        lines = registry.render().splitlines()
+        assert "# TYPE stage_seconds histogram" in lines
+        assert 'stage_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+        assert 'stage_seconds_bucket{stage="llm",le="1"} 2' in lines
+        assert 'stage_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+        assert 'stage_seconds_sum{stage="llm"} 2.55' in lines
+        assert 'stage_seconds_count{stage="llm"} 3' in lines
+        assert "# TYPE stage_calls_total counter" in lines
+        assert 'stage_calls_total{stage="llm"} 2' in lines
+
+    def test_label_values_are_escaped_and_gauges_reject_labels(self):
+        """Test that quotes, backslashes and newlines in label values keep the exposition valid"""
+        from backend.utils.metrics import Registry, Counter, GaugeCallback
+        import backend.utils.metrics as metrics
+
+        registry = Registry()
+        with patch.object(metrics, "REGISTRY", registry):
+            errors = Counter("stage_errors", "Stage errors", ("error",))
+            gauge = GaugeCallback("queue_depth", "Queue depth", lambda: 3)
+
+        errors.labels('Bad "quote" \\ path\nnext').inc()
+
+        assert 'stage_errors_total{error="Bad \\"quote\\" \\\\ path\\nnext"} 1' in registry.render().splitlines()
+        with pytest.raises(TypeError):
+            gauge.labels()
+
+    def test_metrics_endpoint_reports_route_templates(self):
+        """Test that request latency is labelled by route template, not the raw path"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false'}):
+            with TestClient(app) as client:
+                client.get("/api/calendly/availability", params={"date": "2025-01-01"})
+                body = client.get("/metrics").text
+
+        assert 'route="/api/calendly/availability"' in body
+        assert "2025-01-01" not in body
+        assert "# TYPE llm_call_duration_seconds histogram" in body
+
+
+class TestTracing:
+    """Test suite for request tracing spans and trace propagation"""
+
+    @pytest.mark.asyncio
+    async def test_spans_nest_only_inside_sampled_trace(self):
+        """Test that spans are no-ops outside a trace and form a tree inside one"""
+        import asyncio
+        from backend.utils.tracing import Tracer, RingBufferExporter, span, trace_headers
+
+        buffer = RingBufferExporter(capacity=5)
+        tracer = Tracer(sample_rate=0, exporters=[buffer])
+
+        with span("outside") as unsampled:
+            assert unsampled is None
+            assert trace_headers() == {}
+
+        async def tool_call():
+            with span("tool.check_availability"):
+                return trace_headers()
+
+        with tracer.start_trace("POST /api/chat") as root:
+            with span("agent.process_message") as agent_span:
+                headers = await asyncio.create_task(tool_call())
+
+        spans = {s["name"]: s for s in buffer.get_trace(root.trace_id)}
+        assert set(spans) == {"POST /api/chat", "agent.process_message", "tool.check_availability"}
+        assert spans["agent.process_message"]["parent_id"] == root.span_id
+        assert spans["tool.check_availability"]["parent_id"] == agent_span.span_id
+        assert headers["X-Trace-Id"] == root.trace_id
+        assert headers["X-Parent-Span-Id"] == spans["tool.check_availability"]["span_id"]
+
+    def test_incoming_trace_id_joins_trace_and_debug_endpoint_shows_it(self):
+        """Test that a loopback tool request continues the caller's trace"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        from backend.utils.tracing import Tracer, RingBufferExporter
+        import backend.utils.tracing as tracing
+
+        tracer = Tracer(sample_rate=0, exporters=[RingBufferExporter(capacity=5)])
+        trace_id = "0123456789abcdef0123456789abcdef"
+        admin = {"X-Admin-Token": "secret"}
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false', 'ADMIN_TOKEN': 'secret'}), \
+                patch.object(tracing, "_tracer", tracer):
+            with TestClient(app, client=("127.0.0.1", 50000)) as client:
+                untraced = client.get("/api/health")
+                response = client.get("/api/health", headers={
+                    "X-Trace-Id": trace_id, "X-Parent-Span-Id": "00000000deadbeef"
+                })
+                unauthorized = client.get("/api/debug/traces")
+                listing = client.get("/api/debug/traces", headers=admin).json()
+                detail = client.get(f"/api/debug/traces/{trace_id}", headers=admin).json()
+
+        assert "x-trace-id" not in untraced.headers
+        assert response.headers["x-trace-id"] == trace_id
+        assert unauthorized.status_code == 401
+        assert [t["trace_id"] for t in listing["traces"]] == [trace_id]
+        assert detail["spans"][0]["name"] == "GET /api/health"
+        assert detail["spans"][0]["parent_id"] == "00000000deadbeef"
+
+    def test_external_trace_id_does_not_force_sampling(self):
+        """Test that only loopback tool calls or admins can force a trace with X-Trace-Id"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        from backend.utils.tracing import Tracer, RingBufferExporter
+        import backend.utils.tracing as tracing
+
+        tracer = Tracer(sample_rate=0, exporters=[RingBufferExporter(capacity=5)])
+        trace_id = "0123456789abcdef0123456789abcdef"
+        forged = {"X-Trace-Id": trace_id, "X-Parent-Span-Id": "00000000deadbeef"}
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false', 'ADMIN_TOKEN': 'secret'}), \
+                patch.object(tracing, "_tracer", tracer):
+            with TestClient(app, client=("203.0.113.7", 50000)) as client:
+                external = client.get("/api/health", headers=forged)
+                by_admin = client.get("/api/health", headers={**forged, "X-Admin-Token": "secret"})
+
+        assert "x-trace-id" not in external.headers
+        assert by_admin.headers["x-trace-id"] == trace_id
+
+
+class TestProfiling:
+    """Test suite for on-demand request profiling"""
+
+    def test_admin_header_profiles_request_and_admin_endpoints_serve_it(self, tmp_path):
+        """Test that a token-triggered request is profiled and only admins can fetch it"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        from backend.utils.profiling import ProfileStore
+        import backend.utils.profiling as profiling
+
+        store = ProfileStore(directory=str(tmp_path), max_profiles=5)
+        env = {'WARMUP_AGENT': 'false', 'ADMIN_TOKEN': 'test-admin-token'}
+        with patch.dict(os.environ, env), patch.object(profiling, "_store", store):
+            with TestClient(app) as client:
+                client.get("/api/calendly/appointments")
+                client.get("/api/calendly/appointments", headers={"X-Profile-Token": "wrong"})
+                client.get("/api/calendly/appointments", headers={"X-Profile-Token": "test-admin-token"})
+                unauthorized = client.get("/api/admin/profiles")
+                listing = client.get("/api/admin/profiles", headers={"X-Admin-Token": "test-admin-token"})
+                name = listing.json()["profiles"][0]["name"]
+                download = client.get(f"/api/admin/profiles/{name}",
+                                      headers={"X-Admin-Token": "test-admin-token"})
+
+        assert unauthorized.status_code == 401
+        assert len(listing.json()["profiles"]) == 1
+        assert listing.json()["profiles"][0]["request"].startswith("GET /api/calendly/appointments")
+        assert download.status_code == 200
+        assert download.text.startswith("# GET /api/calendly/appointments")
+
+    def test_profile_store_is_bounded_and_rejects_unknown_names(self, tmp_path):
+        """Test that old profiles are evicted and downloads can't leave the directory"""
+        import asyncio
+        import time
+        from backend.utils.profiling import ProfileStore, StackSampler
+
+        store = ProfileStore(directory=str(tmp_path), max_profiles=2)
+        loop = asyncio.new_event_loop()
+        try:
+            sampler = StackSampler(loop, None, interval=0.001)
+            sampler.stacks["backend.api.chat:chat;backend.agent.scheduling_agent:SchedulingAgent.process_message"] = 3
+            names = []
+            for _ in range(3):
+                names.append(store.save("POST", "/api/chat", 12.5, sampler))
+                time.sleep(0.002)
+        finally:
+            loop.close()
+
+        assert [p["name"] for p in store.list()] == [names[2], names[1]]
+        assert store.path_for(names[0]) is None
+        assert store.path_for("../appointments.json") is None
+        assert "process_message 3" in store.path_for(names[2]).read_text()
+
+
+class TestHttpCaching:
+    """Tests for availability ETags and static asset caching"""
+    
+    def test_availability_etag_revalidates_and_changes_only_for_booked_date(self):
+        """Test that If-None-Match gets a 304 until a booking lands on that date"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        
+        future_monday = (datetime.now() + timedelta(days=(7 - datetime.now().weekday()) % 7 + 7)).strftime("%Y-%m-%d")
+        tuesday = (datetime.strptime(future_monday, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        url = "/api/calendly/availability"
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false'}):
+            with TestClient(app) as client:
+                first = client.get(url, params={"date": future_monday, "appointment_type": "followup"})
+                etag = first.headers["etag"]
+                revalidated = client.get(url, params={"date": future_monday, "appointment_type": "followup"},
+                                         headers={"If-None-Match": etag})
+                other_day = client.get(url, params={"date": tuesday, "appointment_type": "followup"}).headers["etag"]
+                
+                booking = client.post("/api/calendly/book", json={
+                    "appointment_type": "followup", "date": future_monday, "start_time": "10:00",
+                    "patient": {"name": "Jane Doe", "email": "jane@example.com", "phone": "555-123-4567"},
+                    "reason": "Follow-up"
+                })
+                after_booking = client.get(url, params={"date": future_monday, "appointment_type": "followup"},
+                                           headers={"If-None-Match": etag})
+                other_day_after = client.get(url, params={"date": tuesday, "appointment_type": "followup"},
+                                             headers={"If-None-Match": other_day})
+        
+        assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+        assert revalidated.status_code == 304 and revalidated.content == b""
+        assert booking.status_code == 200
+        assert after_booking.status_code == 200 and after_booking.headers["etag"] != etag
+        assert other_day_after.status_code == 304
+    
+    def test_precompressed_static_files_serve_variant_with_immutable_caching(self, tmp_path):
+        """Test that a build-time .gz variant is served when the client accepts gzip"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from backend.utils.http_cache import PrecompressedStaticFiles, IMMUTABLE_CACHE_CONTROL
+        from backend.utils.precompress import precompress
+        
+        script = "console.log('appointment scheduler');\n" * 100
+        (tmp_path / "app-abc123.js").write_text(script)
+        assert precompress(str(tmp_path)) >= 1
+        
+        app = FastAPI()
+        app.mount("/assets", PrecompressedStaticFiles(directory=str(tmp_path)), name="assets")
+        client = TestClient(app)
+        compressed = client.get("/assets/app-abc123.js", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/assets/app-abc123.js", headers={"Accept-Encoding": "identity"})
+        
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert compressed.headers["content-type"].startswith(("text/javascript", "application/javascript"))
+        assert int(compressed.headers["content-length"]) < len(script)
+        assert compressed.text == script
+        assert "content-encoding" not in identity.headers and identity.text == script
+        for response in (compressed, identity):
+            assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+            assert response.headers["vary"] == "Accept-Encoding"
+
+
+class TestCompression:
+    """Tests for the response compression middleware"""
+    
+    def _app(self):
+        from fastapi import FastAPI
+        from fastapi.responses import JSONResponse, Response, StreamingResponse
+        from backend.utils.compression import CompressionMiddleware
+        
+        app = FastAPI()
+        app.add_middleware(CompressionMiddleware, minimum_size=1024, encodings=["gzip"])
+        history = [{"role": "user", "content": f"Do you have anything open on Tuesday? ({i})"} for i in range(100)]
+        
+        @app.get("/history")
+        async def large():
+            return JSONResponse({"conversation_history": history}, headers={"ETag": '"v1"'})
+        
+        @app.get("/small")
+        async def small():
+            return {"status": "ok"}
+        
+        @app.get("/partial")
+        async def partial():
+            body = b"y" * 2048
+            return Response(body, status_code=206, media_type="text/plain",
+                            headers={"Content-Range": f"bytes 0-{len(body) - 1}/8192"})
+        
+        @app.get("/stream")
+        async def stream():
+            async def chunks():
+                for _ in range(3):
+                    yield b"x" * 2048
+            return StreamingResponse(chunks(), media_type="text/plain")
+        
+        return app, history
+    
+    def test_large_json_is_gzipped_with_weak_etag_and_vary(self):
+        """Test that a body over the threshold is compressed and its headers adjusted"""
+        from fastapi.testclient import TestClient
+        
+        app, history = self._app()
+        client = TestClient(app)
+        response = client.get("/history", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/history", headers={"Accept-Encoding": "identity"})
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(identity.content)
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"v1"'
+        assert response.json()["conversation_history"] == history
+        assert "content-encoding" not in identity.headers
+        assert identity.headers["vary"] == "Accept-Encoding" and identity.headers["etag"] == '"v1"'
+    
+    def test_small_and_streamed_responses_bypass_compression(self):
+        """Test that small and streamed bodies are sent as-is and counted by skip reason"""
+        from fastapi.testclient import TestClient
+        from backend.utils.compression import COMPRESSION_SKIPPED
+        
+        app, _ = self._app()
+        client = TestClient(app)
+        too_small = COMPRESSION_SKIPPED.labels("too_small").value
+        streamed = COMPRESSION_SKIPPED.labels("streamed").value
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        stream = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        
+        assert "content-encoding" not in small.headers and small.json() == {"status": "ok"}
+        assert "content-encoding" not in stream.headers and stream.content == b"x" * 6144
+        assert COMPRESSION_SKIPPED.labels("too_small").value == too_small + 1
+        assert COMPRESSION_SKIPPED.labels("streamed").value == streamed + 1
+    
+    def test_range_responses_bypass_compression(self):
+        """Test that a 206 body keeps its identity bytes so Content-Range stays valid"""
+        from fastapi.testclient import TestClient
+        from backend.utils.compression import COMPRESSION_SKIPPED
+        
+        app, _ = self._app()
+        skipped = COMPRESSION_SKIPPED.labels("range").value
+        response = TestClient(app).get("/partial", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.status_code == 206
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-range"] == "bytes 0-2047/8192"
+        assert response.content == b"y" * 2048
+        assert COMPRESSION_SKIPPED.labels("range").value == skipped + 1
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical concurrent work"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_result_errors_and_survive_leader_cancel(self):
+        """Test that one call runs per key, errors are shared, and a cancelled leader doesn't cancel followers"""
+        import asyncio
+        from backend.utils.single_flight import SingleFlight, single_flight_stats
+        
+        flight = SingleFlight("test_flight")
+        runs = []
+        
+        async def work(value):
+            runs.append(value)
+            await asyncio.sleep(0.02)
+            if value == "bad":
+                raise ValueError("upstream failed")
+            return [value]
+        
+        shared = await asyncio.gather(*[flight.do("a", lambda: work("a")) for _ in range(4)],
+                                      flight.do("b", lambda: work("b")))
+        assert runs == ["a", "b"]
+        assert shared[:4] == [["a"]] * 4 and shared[4] == ["b"]
+        assert flight.in_flight() == 0
+        
+        errors = await asyncio.gather(*[flight.do("bad", lambda: work("bad")) for _ in range(3)],
+                                      return_exceptions=True)
+        assert all(isinstance(e, ValueError) for e in errors) and runs.count("bad") == 1
+        
+        leader = asyncio.ensure_future(flight.do("c", lambda: work("c")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("c", lambda: work("c")))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == ["c"] and runs.count("c") == 1
+        
+        stats = single_flight_stats()["test_flight"]
+        assert stats["leader"] == 4 and stats["shared"] == 6
+        assert stats["dedup_ratio"] == 0.6
+
+
+class TestBenchmarks:
+    """Test suite for the correctness checks in the benchmark harnesses"""
+
+    def test_find_double_bookings_detects_overlaps_per_date(self):
+        """Test that overlapping intervals on the same date are reported and others are not"""
+        from benchmarks.loadtest import find_double_bookings
+
+        appointments = [
+            {"booking_id": "A", "date": "2024-01-15", "start_time": "09:00", "end_time": "09:30"},
+            {"booking_id": "B", "date": "2024-01-15", "start_time": "09:30", "end_time": "10:00"},
+            {"booking_id": "C", "date": "2024-01-15", "start_time": "09:45", "end_time": "10:30"},
+            {"booking_id": "D", "date": "2024-01-16", "start_time": "09:00", "end_time": "09:30"}
+        ]
+
+        assert find_double_bookings(appointments) == [("B", "C")]
+
+    def test_stage_recorder_reports_percentiles_and_rates(self):
+        """Test that per-stage summaries carry latency percentiles and outcome rates"""
+        from benchmarks.loadtest import StageRecorder
+
+        recorder = StageRecorder()
+        for i in range(100):
+            recorder.record("chat_booking", (i + 1) / 1000, "error" if i < 5 else "ok")
+        recorder.record("calendly_book", 0.01, "conflict")
+
+        summary = recorder.summary()
+        assert summary["chat_booking"]["p50_ms"] == 51.0
+        assert summary["chat_booking"]["p99_ms"] == 100.0
+        assert summary["chat_booking"]["error_rate"] == 0.05
+        assert summary["calendly_book"]["outcomes"]["conflict"] == 1
+        assert summary["calendly_book"]["error_rate"] == 0
+
+    def test_synthetic_calendar_has_no_overlaps_per_provider(self):
+        """Test that generated calendars respect working hours, lunch and provider separation"""
+        from datetime import date
+        from benchmarks.loadtest import find_double_bookings
+        from benchmarks.scheduling_bench import generate_calendar
+
+        with open("data/doctor_schedule.json") as f:
+            schedule = json.load(f)
+        appointments = generate_calendar(schedule, years=1, providers=2, density=0.7, start=date(2030, 1, 7))
+
+        assert appointments
+        assert {appt["provider_id"] for appt in appointments} == {0, 1}
+        assert all("08:00" <= appt["start_time"] and appt["end_time"] <= "18:00" for appt in appointments)
+        assert not any("12:00" <= appt["start_time"] < "13:00" for appt in appointments)
+        for provider in (0, 1):
+            assert find_double_bookings([a for a in appointments if a["provider_id"] == provider]) == []
+
+    def test_scheduling_bench_flags_regressions_over_threshold(self):
+        """Test that only slowdowns beyond the relative threshold are reported"""
+        from benchmarks.scheduling_bench import compare_to_baseline
+
+        def report(book_us, availability_us):
+            return {"runs": [{
+                "scenario": {"name": "1y-1p-0.5"},
+                "store": "json",
+                "timings": {
+                    "book": {"median_us": book_us, "iterations": 20},
+                    "availability_day_warm": {"median_us": availability_us, "iterations": 200}
+                }
+            }]}
+
+        regressions = compare_to_baseline(report(2000.0, 110.0), report(1000.0, 100.0), threshold=0.25)
+
+        assert [r["benchmark"] for r in regressions] == ["book"]
+        assert regressions[0]["ratio"] == 2.0
+
+    def test_rag_bench_rank_metrics_and_bm25_baseline(self):
+        """Test recall@k/MRR scoring and that the BM25 baseline ranks the matching document first"""
+        from benchmarks.rag_bench import rank_metrics, BM25Index
+
+        metrics = rank_metrics(
+            [["parking", "insurance"], ["payment", "insurance", "arrival"], ["arrival"]],
+            [["insurance"], ["insurance"], ["lab_services"]]
+        )
+        assert metrics["recall@1"] == 0.0
+        assert metrics["recall@3"] == round(2 / 3, 4)
+        assert metrics["mrr"] == 0.3333
+
+        index = BM25Index()
+        index.add_documents(
+            ["Free parking is available in the garage", "We accept Aetna and Cigna insurance"],
+            [{"subcategory": "parking"}, {"subcategory": "insurance"}]
+        )
+        assert index.query("Is my insurance accepted?", 2)["metadatas"][0]["subcategory"] == "insurance"
+
+    def test_rag_bench_embedding_cache_replays_offline(self, tmp_path):
+        """Test that cached vectors are persisted and replayed without the embedder"""
+        from benchmarks.rag_bench import CachingEmbedder
+        from backend.rag.fake_embeddings import FakeEmbeddings
+
+        cache_path = tmp_path / "embeddings.json"
+        recording = CachingEmbedder(FakeEmbeddings(), cache_path)
+        vectors = recording.embed_documents(["Parking is free"])
+        recording.save()
+
+        replay = CachingEmbedder(None, cache_path)
+        assert replay.embed_documents(["Parking is free"]) == vectors
+        with pytest.raises(KeyError):
+            replay.embed_documents(["Not cached"])
+
+
+    def test_serialization_strategies_encode_the_same_payload(self):
+        """Test that the orjson fast path produces the same JSON as the pydantic models"""
+        from benchmarks.serialization_bench import (
+            make_chat_result, make_slots, chat_strategies, availability_strategies
+        )
+
+        chat = {name: json.loads(fn()) for name, fn in chat_strategies(make_chat_result(30)).items()}
+        availability = availability_strategies(make_slots(96))
+
+        assert chat["orjson_dicts"] == chat["pydantic_json"] == chat["fastapi_generic"]
+        assert json.loads(availability["pydantic_json"]()) == json.loads(availability["fastapi_generic"]())
+        assert len(availability["compact_orjson"]()) * 10 < len(availability["fastapi_generic"]())
+
+    def test_chat_fast_path_matches_chat_response_schema(self):
+        """Test that /api/chat still returns a body valid against ChatResponse"""
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        from backend.api import chat
+        from backend.models.schemas import ChatResponse
+        from benchmarks.serialization_bench import make_chat_result
+
+        agent = Mock()
+        agent.process_message = AsyncMock(return_value=make_chat_result(6))
+        with patch.dict(os.environ, {'WARMUP_AGENT': 'false'}), patch.object(chat, "agent", agent):
+            with TestClient(app) as client:
+                response = client.post("/api/chat", json={"message": "Hello"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        body = ChatResponse.model_validate(response.json())
+        assert len(body.conversation_history) == 6
+        assert body.metadata["routing"]["reason"] == "booking_intent"
 
 class TestDataIntegrity:
     """Tests for data files and configuration"""